@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+from utils import metrics, profiling
+from .engine import _calculate_cost
+
+def normalize_portfolios(portfolios) -> dict:
+    """
+    :param portfolios: {组合名称: {标的: 权重}}，或权重字典的列表
+    :return: {组合名称: {标的: 权重}}，列表中的组合依次命名为 Portfolio_1, Portfolio_2, ...
+    """
+    if isinstance(portfolios, dict):
+        return dict(portfolios)
+    return {f'Portfolio_{i + 1}': weights for i, weights in enumerate(portfolios)}
+
+def portfolio_tickers(portfolios) -> list:
+    """所有组合用到的标的 (去重，保持首次出现的顺序)。"""
+    return list(dict.fromkeys(t for weights in normalize_portfolios(portfolios).values() for t in weights))
+
+def run_batch(config, prices_df, signals, portfolios, verbose=True):
+    """
+    用同一份价格、信号、基准和交易成本一次回测多个投资组合，结果与逐个调用 run_backtest 一致。
+
+    所有账户共用一个“单位投入持股”数组 U (天数 x 标的)：每个买入日每个标的买入 1/价格 股。
+    账户在标的上每次的净投入 (扣除交易成本) 固定，所以持股是 U 的对应列乘以净投入，
+    全部账户的每日市值就是 U * 价格 与净投入矩阵 (账户 x 标的) 的一次矩阵乘法。
+    每个基准只是矩阵中的一行，不论有多少个组合都只计算一次。
+
+    :param config: 配置，使用其中的 BENCHMARKS / INVESTMENT_AMOUNT / TRANSACTION_COST (忽略 PORTFOLIO)
+    :param prices_df: 价格数据，需包含所有组合和基准的标的
+    :param signals: 买入信号 (所有组合共用)
+    :param portfolios: {组合名称: {标的: 权重}}，或权重字典的列表
+    :return: 每日结果 DataFrame: 每个组合一列 {名称}_Value，Total_Invested，每个基准一列 {bm}_Value
+    """
+    portfolios = normalize_portfolios(portfolios)
+    benchmarks = list(config.BENCHMARKS)
+    clashes = set(portfolios) & (set(benchmarks) | {'Total'})
+    if clashes:
+        raise ValueError(f"组合名称与基准或结果列重名: {sorted(clashes)}")
+    if verbose:
+        print(f"批量回测启动: {len(portfolios)} 个组合, {len(benchmarks)} 个基准...")
+
+    account_names = list(portfolios) + benchmarks
+    tickers = list(dict.fromkeys(portfolio_tickers(portfolios) + benchmarks))
+    net_investment = _net_investment_matrix(config, [*portfolios.values(), *({bm: 1.0} for bm in benchmarks)], tickers)
+
+    with profiling.span('batch.values', portfolios=len(portfolios), tickers=len(tickers)):
+        prices = prices_df[tickers].to_numpy(dtype=float)
+        buy_days = signals.reindex(prices_df.index).fillna(0).to_numpy() == 1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            unit_shares = np.cumsum(np.where(buy_days[:, None] & (prices > 0), 1.0 / prices, 0.0), axis=0)
+        # 与引擎一致: 只计算持股为正的部分；净投入不为正的账户-标的组合持股永远不为正
+        unit_values = np.where(unit_shares > 0, unit_shares * prices, 0.0)
+        weights = np.maximum(net_investment, 0.0)
+
+        missing = np.isnan(unit_values)
+        account_values = np.where(missing, 0.0, unit_values) @ weights.T
+        # 缺失价格只影响实际持有该标的的账户 (不能让 NaN * 0 污染其他账户)
+        account_values[(missing.astype(float) @ (weights > 0).T) > 0] = np.nan
+
+    profiling.count('engine.rows', len(prices_df.index))
+    results_df = pd.DataFrame(index=pd.Index(prices_df.index, name='Date'))
+    for i, name in enumerate(portfolios):
+        results_df[f'{name}_Value'] = account_values[:, i]
+    results_df['Total_Invested'] = np.cumsum(buy_days) * float(config.INVESTMENT_AMOUNT)
+    for i, bm in enumerate(benchmarks):
+        results_df[f'{bm}_Value'] = account_values[:, len(portfolios) + i]
+
+    if verbose:
+        print("批量回测完成。")
+    return results_df
+
+def build_batch_metrics(results_df, portfolio_names, benchmarks, risk_free_rate=0.0) -> pd.DataFrame:
+    """
+    计算批量回测中所有组合和基准的指标。
+
+    :return: DataFrame (账户 x 指标)，组合在前、基准在后，列顺序见 metrics.METRIC_ORDER
+    """
+    names = list(portfolio_names) + list(benchmarks)
+    values = results_df[[f'{name}_Value' for name in names]]
+    values.columns = names
+    return metrics.calculate_metrics_table(values, results_df['Total_Invested'], risk_free_rate=risk_free_rate)
+
+def _net_investment_matrix(config, weight_dicts, tickers) -> np.ndarray:
+    """
+    :return: (账户数 x 标的数) 的矩阵，每个买入日在每个标的上扣除交易成本后的净投入，未持有为 0
+    """
+    investment_amount = config.INVESTMENT_AMOUNT
+    columns = {ticker: i for i, ticker in enumerate(tickers)}
+    matrix = np.zeros((len(weight_dicts), len(tickers)))
+    for row, weights in enumerate(weight_dicts):
+        for ticker, weight in weights.items():
+            amount = investment_amount * weight
+            matrix[row, columns[ticker]] = amount - _calculate_cost(amount, config.TRANSACTION_COST)
+    return matrix
@@ -1,29 +1,59 @@
+import numpy as np
 import pandas as pd
-from .portfolio import Account
+from utils import profiling
+from .portfolio import AccountBook
 
-def run_backtest(config, prices_df, signals):
+ENGINE_MODES = ('loop', 'vectorized')
+
+def run_backtest(config, prices_df, signals, mode=None, verbose=True, initial_state=None, return_state=False,
+                 amounts=None):
     """
     运行回测引擎。
     由于使用调整后收盘价，不再需要手动处理股息。
+
+    :param mode: 引擎模式，'loop' 为逐日循环，'vectorized' 为数组化计算。
+                 默认读取 config.ENGINE_MODE，未配置时使用 'loop'。
+    :param verbose: 是否打印引擎启动/完成信息 (批量运行时可关闭)
+    :param initial_state: 上一次回测结束时的引擎状态，传入时从该状态继续回测
+    :param return_state: 为 True 时返回 (results_df, 结束时的引擎状态)
+    :param amounts: 每日投入金额 (以日期为索引的 Series)，给出时代替 signals x INVESTMENT_AMOUNT，
+                    组合和各基准在同一天投入相同的金额
     """
-    print("回测引擎启动...")
+    mode = mode or getattr(config, 'ENGINE_MODE', 'loop')
+    profiling.count('engine.rows', len(prices_df.index))
+    if mode == 'vectorized':
+        return _run_backtest_vectorized(config, prices_df, signals, verbose, initial_state, return_state, amounts)
+    elif mode != 'loop':
+        raise ValueError(f"未知的引擎模式: '{mode}'，可选: {ENGINE_MODES}")
+
+    if verbose:
+        print("回测引擎启动...")
 
     portfolio_conf = config.PORTFOLIO
-    investment_amount = config.INVESTMENT_AMOUNT
     cost_conf = config.TRANSACTION_COST
 
-    portfolio_account = Account("Portfolio", tickers=list(portfolio_conf.keys()))
-    benchmark_accounts = {bm: Account(bm, tickers=[bm]) for bm in config.BENCHMARKS}
+    # 组合和各基准账户是同一个持股数组的不同行，价格按列号访问，不做逐元素的 pandas 查找
+    book = AccountBook({'Portfolio': list(portfolio_conf.keys()), **{bm: [bm] for bm in config.BENCHMARKS}})
+    portfolio_account = book['Portfolio']
+    benchmark_accounts = {bm: book[bm] for bm in config.BENCHMARKS}
+    if initial_state:
+        book.restore_state(initial_state['accounts'])
+
+    price_matrix = prices_df[book.tickers].to_numpy(dtype=float)
+    day_amounts = _day_amounts(config, prices_df, signals, amounts)
+    account_values = np.empty((len(prices_df.index), len(book.names)))
+    total_invested = np.empty(len(prices_df.index))
+
+    for i in range(len(prices_df.index)):
+        current_day_prices = price_matrix[i]
 
-    daily_records = []
-    
-    for current_date in prices_df.index:
         # --- 1. 检查并执行买入信号 ---
-        if signals.get(current_date, 0) == 1:
+        if day_amounts[i] > 0:
+            investment_amount = day_amounts[i]
             # 投资用户组合
             portfolio_account.add_investment(investment_amount)
             for ticker, weight in portfolio_conf.items():
-                price = prices_df.loc[current_date, ticker]
+                price = current_day_prices[book.columns[ticker]]
                 amount_to_invest = investment_amount * weight
                 cost = _calculate_cost(amount_to_invest, cost_conf)
                 net_investment = amount_to_invest - cost
@@ -34,7 +64,7 @@ def run_backtest(config, prices_df, signals):
             # 投资基准
             for bm_name, bm_account in benchmark_accounts.items():
                 bm_account.add_investment(investment_amount)
-                price = prices_df.loc[current_date, bm_name]
+                price = current_day_prices[book.columns[bm_name]]
                 cost = _calculate_cost(investment_amount, cost_conf)
                 net_investment = investment_amount - cost
                 if price > 0:
@@ -45,25 +75,222 @@ def run_backtest(config, prices_df, signals):
         # 调整后收盘价已经包含了股息收益，无需手动再投资。
 
         # --- 3. 记录每日快照 ---
-        current_day_prices = prices_df.loc[current_date]
-        
-        record = {
-            'Date': current_date,
-            'Portfolio_Value': portfolio_account.get_market_value(current_day_prices),
-            'Total_Invested': portfolio_account.total_invested
+        account_values[i] = book.market_value(current_day_prices)
+        total_invested[i] = portfolio_account.total_invested
+
+    if verbose:
+        print("回测引擎完成。")
+    results_df = pd.DataFrame(index=pd.Index(prices_df.index, name='Date'))
+    results_df['Portfolio_Value'] = account_values[:, book.row('Portfolio')]
+    results_df['Total_Invested'] = total_invested
+    for bm_name in benchmark_accounts:
+        results_df[f'{bm_name}_Value'] = account_values[:, book.row(bm_name)]
+
+    if return_state:
+        state = {'last_date': prices_df.index[-1], 'accounts': book.get_state()}
+        return results_df, state
+    return results_df
+
+def _run_backtest_vectorized(config, prices_df, signals, verbose=True, initial_state=None, return_state=False,
+                             amounts=None):
+    """
+    数组化的回测引擎，结果与逐日循环版本一致。
+
+    把每个账户持有的每个标的视为一列 (组合的各标的 + 每个基准)，
+    先由信号生成“买入矩阵”(每列每日买入的股数)，再按列累加得到每日持股，
+    最后把各列市值按所属账户汇总。
+    """
+    if verbose:
+        print("回测引擎启动 (向量化模式)...")
+
+    benchmarks = list(config.BENCHMARKS)
+    account_names, columns, prices, day_amounts, purchases = _purchase_matrix(config, prices_df, signals, amounts)
+    account_idx = np.array([c[0] for c in columns], dtype=np.intp)
+
+    # 从检查点继续时，每列的初始持股和各账户的初始投入
+    initial_shares = np.zeros(len(columns))
+    initial_invested = np.zeros(len(account_names))
+    if initial_state:
+        for col, (acct, ticker, _) in enumerate(columns):
+            initial_shares[col] = initial_state['accounts'][account_names[acct]]['shares'].get(ticker, 0.0)
+        for acct, name in enumerate(account_names):
+            initial_invested[acct] = initial_state['accounts'][name]['total_invested']
+
+    shares = initial_shares + np.cumsum(purchases, axis=0)
+
+    # 与 Account.get_market_value 一致: 只计算持股为正的部分
+    # 按账户分别求和，而不是乘以 0/1 关联矩阵: 其他账户标的的缺失价格 (NaN * 0) 不应污染本账户
+    column_values = np.where(shares > 0, shares * prices, 0.0)
+    account_values = np.column_stack(
+        [column_values[:, account_idx == acct].sum(axis=1) for acct in range(len(account_names))]
+    )
+
+    results_df = pd.DataFrame(index=prices_df.index.copy())
+    results_df.index.name = 'Date'
+    results_df['Portfolio_Value'] = account_values[:, 0]
+    invested = initial_invested + np.cumsum(day_amounts)[:, None]
+    results_df['Total_Invested'] = invested[:, 0]
+    for i, bm in enumerate(benchmarks):
+        results_df[f'{bm}_Value'] = account_values[:, i + 1]
+
+    if verbose:
+        print("回测引擎完成。")
+    if return_state:
+        state = {'last_date': prices_df.index[-1], 'accounts': {}}
+        for acct, name in enumerate(account_names):
+            held = {ticker: float(shares[-1, col]) for col, (a, ticker, _) in enumerate(columns) if a == acct}
+            state['accounts'][name] = {'shares': held, 'total_invested': float(invested[-1, acct])}
+        return results_df, state
+    return results_df
+
+def run_stateful_backtest(config, prices_df, strategy, verbose=True):
+    """
+    回测依赖账户状态的策略 (strategies.stateful)。组合账户由逐日内核 (backtesting.kernel) 计算，
+    各基准在同一天投入与组合相同的金额 (相同的现金流)，用向量化引擎计算。
+
+    :param strategy: StatefulStrategy 实例
+    :return: 与 run_backtest 格式相同的每日结果
+    """
+    # 内核模块会尝试导入 numba，只在用到状态策略时才导入
+    from . import kernel
+
+    if verbose:
+        print(f"回测引擎启动 (状态策略内核{'，已编译' if kernel.JIT_AVAILABLE else ''})...")
+    tickers = list(config.PORTFOLIO.keys())
+    scheduled = strategy.generate_signals(prices_df).reindex(prices_df.index).fillna(0).to_numpy() == 1
+    lot_method = _lot_method(config)
+    with profiling.span('engine.kernel', rule=strategy.rule):
+        values, contributions, *trades = kernel.run_kernel(
+            prices_df[tickers].to_numpy(dtype=float), [config.PORTFOLIO[t] for t in tickers], scheduled,
+            config.INVESTMENT_AMOUNT, strategy.rule, strategy.kernel_params(), config.TRANSACTION_COST,
+            record_trades=lot_method is not None,
+        )
+
+    amounts = pd.Series(contributions, index=prices_df.index)
+    results_df = _run_backtest_vectorized(config, prices_df, None, verbose=False, amounts=amounts)
+    results_df['Portfolio_Value'] = values
+    if lot_method is not None:
+        _add_lot_columns(config, prices_df, results_df, amounts, lot_method, portfolio_trades=trades)
+    if verbose:
+        print("回测引擎完成。")
+    return results_df
+
+def backtest_strategy(config, prices_df, strategy, mode=None, verbose=True):
+    """
+    生成每日投入金额并回测: 依赖账户状态的策略使用 run_stateful_backtest，
+    其余策略由 generate_amounts 给出每日金额 (固定金额的策略与按信号回测的结果相同) 后使用 run_backtest。
+    """
+    from strategies import StatefulStrategy
+
+    if isinstance(strategy, StatefulStrategy):
+        return run_stateful_backtest(config, prices_df, strategy, verbose=verbose)
+    with profiling.span('generate_signals'):
+        amounts = strategy.generate_amounts(prices_df, config.INVESTMENT_AMOUNT)
+    results_df = run_backtest(config, prices_df, None, mode=mode, verbose=verbose, amounts=amounts)
+    lot_method = _lot_method(config)
+    if lot_method is not None:
+        _add_lot_columns(config, prices_df, results_df, amounts, lot_method)
+    return results_df
+
+def _lot_method(config):
+    """
+    :return: 启用税务批次 (config.TAX_LOTS) 时卖出消耗批次的顺序，未启用时为 None
+    """
+    lots_conf = getattr(config, 'TAX_LOTS', None) or {}
+    return lots_conf.get('method', 'fifo') if lots_conf.get('enabled') else None
+
+def _add_lot_columns(config, prices_df, results_df, amounts, method, portfolio_trades=None):
+    """
+    为每个账户的每个标的建立税务批次台账，在 results_df 中加入各账户每日的成本基础 ({账户}_Cost_Basis)、
+    未实现盈亏 ({账户}_Unrealized_PnL) 和累计已实现盈亏 ({账户}_Realized_PnL)。
+
+    :param amounts: 每日投入金额，与回测所用的相同
+    :param method: 卖出时消耗批次的顺序 (backtesting.lots.LOT_METHODS)
+    :param portfolio_trades: 状态策略内核记录的组合交易 [交易股数, 现金流]，代替组合各列按金额买入的记录
+    """
+    from .lots import ledger_from_trades
+
+    with profiling.span('engine.lots'):
+        account_names, columns, prices, day_amounts, purchases = _purchase_matrix(config, prices_df, None, amounts)
+        fractions = np.array([*config.PORTFOLIO.values(), *[1.0] * len(config.BENCHMARKS)], dtype=float)
+        bought = purchases > 0
+        trades = np.where(bought, purchases, 0.0)
+        cash = np.where(bought, day_amounts[:, None] * fractions, 0.0)
+        if portfolio_trades:
+            n_portfolio = len(config.PORTFOLIO)
+            trades[:, :n_portfolio], cash[:, :n_portfolio] = portfolio_trades
+
+        ledger = ledger_from_trades(trades, cash, method=method)
+        account_idx = np.array([c[0] for c in columns], dtype=np.intp)
+        fields = {
+            'Cost_Basis': ledger.daily_cost_basis(len(prices)),
+            'Unrealized_PnL': ledger.daily_unrealized(prices),
+            'Realized_PnL': ledger.daily_realized(len(prices)),
         }
-        
-        for bm_name, bm_account in benchmark_accounts.items():
-            record[f'{bm_name}_Value'] = bm_account.get_market_value(current_day_prices)
-            
-        daily_records.append(record)
+        for acct, name in enumerate(account_names):
+            for field, values in fields.items():
+                results_df[f'{name}_{field}'] = values[:, account_idx == acct].sum(axis=1)
+        profiling.count('engine.lot_count', ledger.n_lots)
+
+def _day_amounts(config, prices_df, signals, amounts=None) -> np.ndarray:
+    """
+    :return: 每日投入金额数组；未给出 amounts 时为信号日的 INVESTMENT_AMOUNT
+    """
+    if amounts is not None:
+        return amounts.reindex(prices_df.index).fillna(0).to_numpy(dtype=float)
+    buy_days = signals.reindex(prices_df.index).fillna(0).to_numpy() == 1
+    return np.where(buy_days, float(config.INVESTMENT_AMOUNT), 0.0)
+
+def _purchase_matrix(config, prices_df, signals, amounts=None):
+    """
+    把每个账户持有的每个标的视为一列，计算每列每日买入的股数。
+
+    :return: (账户名称列表, 列定义 [(所属账户序号, 标的, 每次投入金额)],
+              价格矩阵, 每日投入金额, 买入矩阵)
+    """
+    account_names, columns, net_investment = _account_columns(config)
+    prices = prices_df[[c[1] for c in columns]].to_numpy(dtype=float)
+    day_amounts = _day_amounts(config, prices_df, signals, amounts)
+
+    if amounts is not None:
+        # 每列投入金额随日期变化
+        net_investment = _net_investment(config, day_amounts)
+
+    # 买入矩阵: 仅在投入日且价格为正时买入
+    with np.errstate(divide='ignore', invalid='ignore'):
+        purchases = np.where((day_amounts > 0)[:, None] & (prices > 0), net_investment / prices, 0.0)
+    return account_names, columns, prices, day_amounts, purchases
+
+def _net_investment(config, day_amounts) -> np.ndarray:
+    """
+    按列的权重分配每日投入金额 (组合按 PORTFOLIO 权重，基准为全部金额) 后扣除交易成本。
+
+    :param day_amounts: 每日投入金额数组 (任意形状)
+    :return: 最后多一维 (列) 的净投入数组
+    """
+    fractions = np.array([*config.PORTFOLIO.values(), *[1.0] * len(config.BENCHMARKS)], dtype=float)
+    gross = np.asarray(day_amounts, dtype=float)[..., None] * fractions
+    return gross - _calculate_cost(gross, config.TRANSACTION_COST)
+
+def _account_columns(config):
+    """
+    :return: (账户名称列表, 列定义 [(所属账户序号, 标的, 每次投入金额)], 每列扣除交易成本后的净投入)
+    """
+    investment_amount = config.INVESTMENT_AMOUNT
+    benchmarks = list(config.BENCHMARKS)
+
+    columns = [(0, ticker, investment_amount * weight) for ticker, weight in config.PORTFOLIO.items()]
+    columns += [(i + 1, bm, investment_amount) for i, bm in enumerate(benchmarks)]
+    account_names = ['Portfolio'] + benchmarks
 
-    print("回测引擎完成。")
-    return pd.DataFrame(daily_records).set_index('Date')
+    net_investment = np.array(
+        [amount - _calculate_cost(amount, config.TRANSACTION_COST) for _, _, amount in columns], dtype=float
+    )
+    return account_names, columns, net_investment
 
 def _calculate_cost(amount, cost_conf):
     if cost_conf['type'] == 'fixed':
         return cost_conf['value']
     elif cost_conf['type'] == 'percentage':
         return amount * cost_conf['value']
-    return 0.0
\ No newline at end of file
+    return 0.0
@@ -0,0 +1,139 @@
+import json
+import os
+import pickle
+import pandas as pd
+from strategies import BaseStrategy
+from .engine import backtest_strategy, run_backtest
+
+# 这些配置项决定了回测结果，检查点只能在它们不变时继续使用
+_CHECKPOINT_CONFIG_KEYS = ['PORTFOLIO', 'BENCHMARKS', 'INVESTMENT_AMOUNT', 'TRANSACTION_COST', 'STRATEGY_CONFIG']
+
+def run_incremental(config, prices_df, strategy, checkpoint=None, results_df=None, mode=None, verbose=True):
+    """
+    增量回测：从检查点继续，只处理新的交易日并追加到已有结果之后。
+
+    检查点记录的是封存日 (sealed_date) 结束时的引擎状态和策略状态。封存日之后的
+    信号仍可能随新数据改变 (例如按周决定的均线信号)，所以每次都从封存日之后重新计算，
+    代价为 O(新增天数)，而不是 O(全部历史)。
+
+    调整后价格以区间最后一天为基准，新的分红/拆分会按比例改变全部历史价格。
+    因此 prices_df 必须包含封存日这一行，用于把检查点中的持股换算到新的价格基准。
+
+    :param prices_df: 价格数据。首次运行时为完整历史；继续运行时至少包含封存日及之后的行
+    :param strategy: 支持 generate_signals_incremental 的策略实例
+    :param checkpoint: 上一次返回的检查点，为 None 时从头回测
+    :param results_df: 上一次返回的回测结果
+    :return: (results_df, checkpoint)
+    """
+    config_key = _config_key(config)
+    if checkpoint is None:
+        engine_state, strategy_state, sealed_date = None, None, None
+        new_prices = prices_df
+    else:
+        if checkpoint['config_key'] != config_key:
+            raise ValueError("检查点与当前配置不一致，请删除检查点后重新完整回测。")
+        sealed_date = checkpoint['sealed_date']
+        engine_state, strategy_state = checkpoint['engine_state'], checkpoint['strategy_state']
+        if sealed_date is not None:
+            if sealed_date not in prices_df.index:
+                raise ValueError(f"价格数据必须包含检查点的封存日 {sealed_date:%Y-%m-%d}。")
+            ratios = prices_df.loc[sealed_date, checkpoint['anchor_prices'].index] / checkpoint['anchor_prices']
+            engine_state = _rebase_engine_state(engine_state, ratios)
+            strategy_state = strategy.rebase_state(strategy_state, ratios)
+            new_prices = prices_df[prices_df.index > sealed_date]
+        else:
+            new_prices = prices_df
+
+    signals, new_strategy_state = strategy.generate_signals_incremental(new_prices, strategy_state)
+    new_sealed_date = new_strategy_state['sealed_date']
+
+    # 先回测到新的封存日并记录状态，再回测封存日之后的暂定部分
+    if new_sealed_date is not None and new_sealed_date != sealed_date:
+        sealed_part = new_prices[new_prices.index <= new_sealed_date]
+        sealed_results, new_engine_state = run_backtest(
+            config, sealed_part, signals, mode=mode, verbose=verbose,
+            initial_state=engine_state, return_state=True
+        )
+    else:
+        sealed_results, new_engine_state = None, engine_state
+        new_strategy_state = dict(new_strategy_state, sealed_date=sealed_date)
+        new_sealed_date = sealed_date
+
+    open_part = new_prices if new_sealed_date is None else new_prices[new_prices.index > new_sealed_date]
+    open_results = None
+    if not open_part.empty:
+        open_results = run_backtest(
+            config, open_part, signals, mode=mode, verbose=verbose, initial_state=new_engine_state
+        )
+
+    parts = []
+    if results_df is not None and sealed_date is not None:
+        parts.append(results_df[results_df.index <= sealed_date])
+    parts += [r for r in (sealed_results, open_results) if r is not None]
+    results_df = pd.concat(parts) if parts else pd.DataFrame()
+
+    new_checkpoint = {
+        'config_key': config_key,
+        'sealed_date': new_sealed_date,
+        'engine_state': new_engine_state,
+        'strategy_state': new_strategy_state,
+        'anchor_prices': prices_df.loc[new_sealed_date] if new_sealed_date is not None else None,
+    }
+    return results_df, new_checkpoint
+
+def save_checkpoint(path: str, checkpoint: dict, results_df: pd.DataFrame):
+    """
+    把检查点和对应的回测结果保存到同一个文件。
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'checkpoint': checkpoint, 'results_df': results_df}, f)
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path: str):
+    """
+    读取 save_checkpoint 保存的文件，文件不存在时返回 (None, None)。
+
+    :return: (checkpoint, results_df)
+    """
+    if not os.path.exists(path):
+        return None, None
+    with open(path, 'rb') as f:
+        saved = pickle.load(f)
+    return saved['checkpoint'], saved['results_df']
+
+def resume_backtest(config, prices_df, strategy, path: str, mode=None):
+    """
+    读取检查点文件 (不存在时从头回测)，增量回测后写回检查点，返回完整的回测结果。
+    策略不支持增量信号生成时 (例如表达式策略和依赖账户状态的策略) 改为完整回测，不读写检查点。
+    """
+    if not supports_incremental(strategy):
+        print(f"策略 {type(strategy).__name__} 不支持增量回测，忽略检查点 {path}，改为完整回测...")
+        return backtest_strategy(config, prices_df, strategy, mode=mode)
+    checkpoint, results_df = load_checkpoint(path)
+    if checkpoint is not None and checkpoint['sealed_date'] is not None:
+        print(f"从检查点继续回测 (封存日: {checkpoint['sealed_date']:%Y-%m-%d})...")
+    results_df, checkpoint = run_incremental(config, prices_df, strategy, checkpoint, results_df, mode=mode)
+    save_checkpoint(path, checkpoint, results_df)
+    print(f"检查点已保存到: {path}")
+    return results_df
+
+def supports_incremental(strategy) -> bool:
+    """策略是否实现了 generate_signals_incremental。"""
+    return type(strategy).generate_signals_incremental is not BaseStrategy.generate_signals_incremental
+
+def _rebase_engine_state(engine_state, ratios):
+    """按新旧价格比例换算持股，使持股市值在新的价格基准下保持不变。"""
+    if engine_state is None:
+        return None
+    accounts = {}
+    for name, account in engine_state['accounts'].items():
+        shares = {ticker: n / ratios.get(ticker, 1.0) for ticker, n in account['shares'].items()}
+        accounts[name] = dict(account, shares=shares)
+    return dict(engine_state, accounts=accounts)
+
+def _config_key(config) -> str:
+    return json.dumps({k: getattr(config, k, None) for k in _CHECKPOINT_CONFIG_KEYS}, sort_keys=True, default=str)
@@ -0,0 +1,157 @@
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # 未安装 numba 时使用纯 Python 版本，结果相同，只是更慢
+    njit = None
+
+# 内核支持的规则，与 strategies.stateful 中各策略的 rule 对应
+RULES = {'fixed': 0, 'value_averaging': 1, 'rebalance': 2, 'drawdown': 3}
+_COST_TYPES = {'fixed': 1, 'percentage': 2}
+JIT_AVAILABLE = njit is not None
+
+def _jit(func):
+    return njit(cache=True, nogil=True)(func) if JIT_AVAILABLE else func
+
+def run_kernel(prices, weights, scheduled, amount, rule, params, cost_conf, record_trades=False):
+    """
+    依赖账户状态的策略的逐日内核: 在普通数组上逐日更新持股，每个定投日根据账户当时的状态决定投入金额或调仓。
+    安装了 numba 时编译为机器码运行，否则以纯 Python 运行 (结果相同)。
+
+    :param prices: 组合各标的的价格，形状 (天数, 标的数)
+    :param weights: 组合权重 (标的数,)
+    :param scheduled: 每日是否为定投日 (天数,)
+    :param amount: 每次的基准投入金额 (INVESTMENT_AMOUNT)
+    :param rule: RULES 中的规则名称
+    :param params: 规则参数 (a, b)，含义见 strategies.stateful 中对应的策略
+    :param cost_conf: 交易成本配置 (TRANSACTION_COST)
+    :param record_trades: 为 True 时另外返回每日各标的的交易股数和现金流 (用于建立税务批次台账)
+    :return: (每日组合市值, 每日投入金额)；record_trades 时为 (市值, 投入金额, 交易股数, 现金流)，
+             后两者形状与 prices 相同，买入为正，卖出的股数和现金流 (扣除交易成本的所得) 为负
+    """
+    if rule not in RULES:
+        raise ValueError(f"未知的内核规则: '{rule}'，可选: {list(RULES)}")
+    prices = np.ascontiguousarray(prices, dtype=float)
+    weights = np.ascontiguousarray(weights, dtype=float)
+    scheduled = np.ascontiguousarray(scheduled, dtype=np.bool_)
+    values = np.empty(len(prices))
+    contributions = np.zeros(len(prices))
+    # 不记录交易时传入零行的数组，内核中按行数判断是否记录
+    trades = np.zeros(prices.shape if record_trades else (0, prices.shape[1]))
+    cash = np.zeros_like(trades)
+    param_a, param_b = (float(p) for p in params)
+    _day_loop(prices, weights, scheduled, float(amount), RULES[rule], param_a, param_b,
+              _COST_TYPES.get(cost_conf.get('type'), 0), float(cost_conf.get('value', 0.0)), values, contributions,
+              trades, cash)
+    if record_trades:
+        return values, contributions, trades, cash
+    return values, contributions
+
+
+@_jit
+def _cost(amount, cost_type, cost_value):
+    if cost_type == 1:
+        return cost_value
+    if cost_type == 2:
+        return amount * cost_value
+    return 0.0
+
+@_jit
+def _market_value(row, shares):
+    # 与引擎一致: 只计算持股为正的部分，持有标的缺少价格时市值为 NaN
+    value = 0.0
+    for j in range(len(shares)):
+        if shares[j] > 0:
+            value += shares[j] * row[j]
+    return value
+
+@_jit
+def _buy(i, row, weights, shares, contribution, cost_type, cost_value, trades, cash):
+    for j in range(len(weights)):
+        gross = contribution * weights[j]
+        if row[j] > 0:
+            bought = (gross - _cost(gross, cost_type, cost_value)) / row[j]
+            shares[j] += bought
+            if len(trades):
+                trades[i, j] += bought
+                cash[i, j] += gross
+
+@_jit
+def _drift(row, weights, shares, value):
+    """各标的实际权重与目标权重之差的最大绝对值。"""
+    drift = 0.0
+    for j in range(len(weights)):
+        held = shares[j] * row[j] if shares[j] > 0 else 0.0
+        drift = max(drift, abs(held / value - weights[j]))
+    return drift
+
+@_jit
+def _rebalance(i, row, weights, shares, value, contribution, cost_type, cost_value, trades, cash):
+    """
+    把持仓连同本次投入一起调整到目标权重。按调整前的目标市值估算每笔交易的成本，从可投资金额中扣除。
+    有标的缺少价格时无法调仓，返回 False。
+    记录交易时，每笔交易的现金流 = 成交金额 + 该笔的交易成本 (卖出时成交金额为负)，各笔之和等于本次投入。
+    """
+    for j in range(len(weights)):
+        if not row[j] > 0:
+            return False
+    total = value + contribution
+    costs = 0.0
+    for j in range(len(weights)):
+        held = shares[j] * row[j] if shares[j] > 0 else 0.0
+        trade = abs(weights[j] * total - held)
+        if trade > 1e-9:
+            costs += _cost(trade, cost_type, cost_value)
+    investable = total - costs
+    for j in range(len(weights)):
+        target = weights[j] * investable / row[j]
+        if len(trades):
+            held = shares[j] * row[j] if shares[j] > 0 else 0.0
+            trade = abs(weights[j] * total - held)
+            trades[i, j] += target - shares[j]
+            cash[i, j] += (target - shares[j]) * row[j] + (_cost(trade, cost_type, cost_value) if trade > 1e-9 else 0.0)
+        shares[j] = target
+    return True
+
+@_jit
+def _day_loop(prices, weights, scheduled, amount, rule, param_a, param_b, cost_type, cost_value, values, contributions,
+              trades, cash):
+    shares = np.zeros(len(weights))
+    target = 0.0
+    # 不受投入影响的单位净值，用于计算回撤
+    nav, units, peak = 1.0, 0.0, 1.0
+    n_scheduled = 0
+
+    for i in range(len(prices)):
+        row = prices[i]
+        value = _market_value(row, shares)
+        if units > 0 and value > 0:
+            nav = value / units
+            peak = max(peak, nav)
+
+        if scheduled[i]:
+            n_scheduled += 1
+            contribution = amount
+            if rule == 1:
+                # 价值平均: 目标市值每期按 param_a 增长并增加一期投入，差额即本期投入，上限为 param_b 倍
+                target = target * (1.0 + param_a) + amount
+                gap = target - value if value == value else amount
+                contribution = min(max(gap, 0.0), param_b * amount)
+            elif rule == 3:
+                # 回撤加仓: 投入金额 = 基准金额 * (1 + param_a * 当前回撤)，上限为 param_b 倍
+                drawdown = 1.0 - nav / peak
+                contribution = amount * min(1.0 + param_a * drawdown, param_b)
+
+            rebalanced = False
+            if rule == 2 and value > 0 and n_scheduled % max(int(param_a), 1) == 0:
+                # 定期再平衡: 每 param_a 个定投日检查一次，权重偏离超过 param_b 时调仓
+                if _drift(row, weights, shares, value) > param_b:
+                    rebalanced = _rebalance(i, row, weights, shares, value, contribution, cost_type, cost_value,
+                                            trades, cash)
+            if not rebalanced and contribution > 0:
+                _buy(i, row, weights, shares, contribution, cost_type, cost_value, trades, cash)
+            contributions[i] = contribution
+
+        values[i] = _market_value(row, shares)
+        if values[i] > 0 and contributions[i] > 0:
+            units = values[i] / nav
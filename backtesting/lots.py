@@ -0,0 +1,213 @@
+import numpy as np
+
+# 一个批次: 所属列 (账户持有的某个标的)、买入日 (交易日序号)、买入股数、总成本 (含交易成本)、剩余股数
+LOT_DTYPE = np.dtype([('column', np.int32), ('day', np.int32), ('shares', np.float64), ('cost', np.float64),
+                      ('remaining', np.float64)])
+# 一笔卖出: 所属列、卖出日、卖出股数、消耗的成本基础、卖出所得 (扣除交易成本)
+SALE_DTYPE = np.dtype([('column', np.int32), ('day', np.int32), ('shares', np.float64), ('basis', np.float64),
+                       ('proceeds', np.float64)])
+# 卖出时消耗批次的顺序: 先进先出 / 后进先出 / 单位成本最高者优先
+LOT_METHODS = ('fifo', 'lifo', 'hifo')
+
+class LotLedger:
+    """
+    税务批次台账: 每笔买入是一个批次，保存在预分配的 NumPy 结构化数组中 (容量不足时翻倍)，不为批次创建 Python 对象。
+
+    列的含义与向量化引擎相同，是某个账户持有的某个标的；卖出时按 method 在该列已有的批次中扣减剩余股数，
+    记录消耗的成本基础和已实现盈亏。每日的持股、成本基础和盈亏由批次和卖出记录按 (交易日, 列) 汇总后累加得到，
+    计算量与批次数和天数成正比，不需要逐日遍历批次。
+    """
+    __slots__ = ('n_columns', 'method', 'lots', 'sales', 'n_lots', 'n_sales', '_index', '_index_days', '_starts',
+                 '_first_open')
+
+    def __init__(self, n_columns: int, method: str = 'fifo', capacity: int = 1024):
+        """
+        :param n_columns: 列数
+        :param method: 卖出时消耗批次的顺序，LOT_METHODS 之一
+        :param capacity: 预分配的批次个数
+        """
+        if method not in LOT_METHODS:
+            raise ValueError(f"未知的批次方法: '{method}'，可选: {LOT_METHODS}")
+        self.n_columns = n_columns
+        self.method = method
+        self.lots = np.zeros(max(capacity, 1), dtype=LOT_DTYPE)
+        self.sales = np.zeros(max(capacity // 8, 1), dtype=SALE_DTYPE)
+        self.n_lots = 0
+        self.n_sales = 0
+        # 按列分组的批次序号 (组内保持追加顺序，即按买入日排序) 及其买入日，买入后失效，卖出时按需重建
+        self._index = None
+        self._index_days = None
+        self._starts = None
+        # 每列组内第一个可能还有剩余股数的位置，跳过已经卖完的批次；重建索引不改变组内顺序，位置仍然有效
+        self._first_open = np.zeros(n_columns, dtype=np.intp)
+
+    def buy(self, days, columns, shares, costs):
+        """
+        追加一个或多个批次 (可以是向量)。同一列的批次须按买入日的先后顺序追加。
+
+        :param days: 买入日的交易日序号
+        :param columns: 列号
+        :param shares: 买入股数
+        :param costs: 总成本 (买入金额加交易成本)
+        """
+        days, columns, shares, costs = np.broadcast_arrays(days, columns, shares, costs)
+        lo = self.n_lots
+        self.lots = _reserve(self.lots, lo + days.size)
+        new = self.lots[lo:lo + days.size]
+        new['column'], new['day'] = columns.ravel(), days.ravel()
+        new['shares'], new['cost'], new['remaining'] = shares.ravel(), costs.ravel(), shares.ravel()
+        self.n_lots = lo + days.size
+        self._index = None
+
+    def sell(self, day: int, column: int, shares: float, proceeds: float, lots=None) -> float:
+        """
+        卖出一列的 shares 股，按 method 顺序消耗买入日不晚于 day 的批次。
+
+        :param proceeds: 卖出所得 (扣除交易成本)
+        :param lots: 可选，指定批次 (LotLedger.lots 中的序号) 及其消耗顺序，代替 method
+        :return: 已实现盈亏
+        """
+        if lots is None:
+            lots = self._depletion_order(day, column, shares)
+        lots = np.asarray(lots, dtype=np.intp)
+        remaining = self.lots['remaining'][lots]
+        available = remaining.sum()
+        if shares > available * (1 + 1e-9) + 1e-12:
+            raise ValueError(f"第 {column} 列卖出 {shares} 股，超过可卖出的 {available} 股")
+
+        # 按顺序扣减: 每个批次扣减 min(剩余股数, 还需卖出的股数)
+        before = np.cumsum(remaining) - remaining
+        taken = np.clip(shares - before, 0.0, remaining)
+        basis = float((taken / self.lots['shares'][lots] * self.lots['cost'][lots]).sum())
+        self.lots['remaining'][lots] = remaining - taken
+
+        self.sales = _reserve(self.sales, self.n_sales + 1)
+        self.sales[self.n_sales] = (column, day, taken.sum(), basis, proceeds)
+        self.n_sales += 1
+        return proceeds - basis
+
+    def open_lots(self, column: int = None) -> np.ndarray:
+        """
+        :return: 尚有剩余股数的批次 (结构化数组的副本)，可只取一列
+        """
+        lots = self.lots[:self.n_lots]
+        mask = lots['remaining'] > 0
+        if column is not None:
+            mask &= lots['column'] == column
+        return lots[mask]
+
+    def lot_unrealized(self, prices) -> np.ndarray:
+        """
+        按一行价格计算每个批次剩余部分的未实现盈亏。
+
+        :param prices: 与列对齐的价格向量
+        :return: 与 lots[:n_lots] 对齐的数组，已卖完的批次为 0
+        """
+        lots = self.lots[:self.n_lots]
+        remaining_cost = lots['cost'] * (lots['remaining'] / lots['shares'])
+        return np.where(lots['remaining'] > 0, lots['remaining'] * np.asarray(prices)[lots['column']] - remaining_cost,
+                        0.0)
+
+    def daily_shares(self, n_days: int) -> np.ndarray:
+        """
+        :return: 每日收盘时各列的持股，形状 (天数, 列数)
+        """
+        lots, sales = self.lots[:self.n_lots], self.sales[:self.n_sales]
+        return self._accumulate(n_days, lots, lots['shares']) - self._accumulate(n_days, sales, sales['shares'])
+
+    def daily_cost_basis(self, n_days: int) -> np.ndarray:
+        """
+        :return: 每日收盘时各列持仓的成本基础 (剩余批次的成本之和)，形状 (天数, 列数)
+        """
+        lots, sales = self.lots[:self.n_lots], self.sales[:self.n_sales]
+        return self._accumulate(n_days, lots, lots['cost']) - self._accumulate(n_days, sales, sales['basis'])
+
+    def daily_realized(self, n_days: int) -> np.ndarray:
+        """
+        :return: 截至每日的累计已实现盈亏，形状 (天数, 列数)
+        """
+        sales = self.sales[:self.n_sales]
+        return self._accumulate(n_days, sales, sales['proceeds'] - sales['basis'])
+
+    def daily_unrealized(self, prices: np.ndarray) -> np.ndarray:
+        """
+        每日未实现盈亏 = 持股市值 - 成本基础，与引擎一致只计算持股为正的部分。
+
+        :param prices: 价格矩阵，形状 (天数, 列数)
+        :return: 形状 (天数, 列数)
+        """
+        shares = self.daily_shares(len(prices))
+        values = np.where(shares > 0, shares * prices, 0.0)
+        return values - self.daily_cost_basis(len(prices))
+
+    def _accumulate(self, n_days: int, records: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """按 (交易日, 列) 汇总记录的数值，再沿交易日累加。"""
+        cells = records['day'].astype(np.intp) * self.n_columns + records['column']
+        # 没有记录时 bincount 返回整数数组
+        totals = np.bincount(cells, weights=weights, minlength=n_days * self.n_columns).astype(float, copy=False)
+        return np.cumsum(totals[:n_days * self.n_columns].reshape(n_days, self.n_columns), axis=0)
+
+    def _depletion_order(self, day: int, column: int, shares: float) -> np.ndarray:
+        """
+        按 method 返回本次卖出要消耗的批次序号。只检查这一列买入日不晚于 day 的批次:
+        先进先出 / 后进先出从一端取一个窗口，剩余股数不够时窗口翻倍，耗时只与实际消耗的批次数有关；
+        单位成本最高优先需要比较该列全部未卖完的批次。
+        """
+        if self._index is None:
+            columns = self.lots['column'][:self.n_lots]
+            self._index = np.argsort(columns, kind='stable')
+            self._index_days = self.lots['day'][self._index]
+            self._starts = np.searchsorted(columns[self._index], np.arange(self.n_columns + 1))
+        first = self._starts[column]
+        lo = first + self._first_open[column]
+        hi = first + np.searchsorted(self._index_days[first:self._starts[column + 1]], day, side='right')
+        remaining = self.lots['remaining']
+
+        if self.method == 'hifo':
+            candidates = self._index[lo:hi]
+            candidates = candidates[remaining[candidates] > 0]
+            unit_cost = self.lots['cost'][candidates] / self.lots['shares'][candidates]
+            return candidates[np.argsort(-unit_cost, kind='stable')]
+
+        size = 64
+        while True:
+            if self.method == 'lifo':
+                window = self._index[max(hi - size, lo):hi][::-1]
+            else:
+                window = self._index[lo:min(lo + size, hi)]
+            if len(window) >= hi - lo or remaining[window].sum() >= shares:
+                break
+            size *= 4
+        if self.method == 'fifo':
+            # 跳过开头已经卖完的批次，下次从第一个还有剩余的批次开始
+            held = remaining[window] > 0
+            self._first_open[column] += int(np.argmax(held)) if held.any() else len(window)
+        return window
+
+def ledger_from_trades(trades: np.ndarray, cash: np.ndarray, method: str = 'fifo') -> LotLedger:
+    """
+    由逐日交易记录建立台账: 股数为正的交易是买入 (成为新批次)，为负的是卖出。
+
+    :param trades: 每日每列买入 (正) 或卖出 (负) 的股数，形状 (天数, 列数)
+    :param cash: 对应交易的现金流: 买入为支付的金额 (含交易成本)，卖出为负的卖出所得 (扣除交易成本)
+    :param method: 卖出时消耗批次的顺序
+    """
+    n_days, n_columns = trades.shape
+    bought = trades > 0
+    # 按行展开，批次按买入日排序
+    days, columns = np.nonzero(bought)
+    ledger = LotLedger(n_columns, method=method, capacity=len(days))
+    ledger.buy(days, columns, trades[bought], cash[bought])
+
+    # 同一天先买后卖不会发生 (同一列每天只有一笔净交易)，卖出只消耗之前的批次
+    for day, column in zip(*np.nonzero(trades < 0)):
+        ledger.sell(int(day), int(column), float(-trades[day, column]), float(-cash[day, column]))
+    return ledger
+
+def _reserve(records: np.ndarray, size: int) -> np.ndarray:
+    """容量不足时按两倍扩容，保留已有记录。"""
+    if size <= len(records):
+        return records
+    grown = np.zeros(max(size, 2 * len(records)), dtype=records.dtype)
+    grown[:len(records)] = records
+    return grown
@@ -0,0 +1,123 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from strategies import create_strategy, require_stateless
+from utils.metrics import calculate_max_drawdown_array, outcome_frame
+from .engine import _account_columns, _net_investment
+from .sweep import config_snapshot
+
+# 工作进程中的全局状态，由 _init_worker 设置
+_worker_state = {}
+
+def run_simulation(config, prices_df, n_paths=1000, block_size=20, seed=None, chunk_size=100, max_workers=None):
+    """
+    蒙特卡洛模拟：对历史日收益率做分块自助抽样 (block bootstrap) 生成模拟价格路径，
+    用与回测相同的定投和策略逻辑 (包括策略按日调整的投入金额)，在所有路径上同时评估组合和各基准。
+
+    每块路径是一个 (路径数 x 天数 x 标的数) 的价格张量，按块计算以限制内存占用。
+    各块在进程池中并行，随机数种子由 SeedSequence 按块派生，
+    因此相同的 seed 和 chunk_size 得到相同的结果，与工作进程数无关。
+
+    :param config: 配置 (模块或 config_snapshot 的结果)
+    :param prices_df: 历史价格数据，用于抽样日收益率，需包含策略用到的标的
+    :param n_paths: 模拟路径条数
+    :param block_size: 每次抽取的连续交易日个数，用于保留收益率的短期相关性
+    :param seed: 随机数种子，为 None 时每次结果不同
+    :param chunk_size: 每块的路径条数
+    :param max_workers: 工作进程数，默认等于 CPU 核数；为 1 时在当前进程中计算
+    :return: DataFrame，索引为路径编号，列为 (账户名称, 指标) 的二级列
+    """
+    require_stateless(create_strategy(config.STRATEGY_CONFIG), '蒙特卡洛模拟')
+    if len(prices_df.index) < 2:
+        raise ValueError("价格数据至少需要两个交易日才能进行模拟。")
+
+    values = prices_df.to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_returns = np.diff(np.log(values), axis=0)
+    # 缺失或非正的价格视为当日不变
+    log_returns[~np.isfinite(log_returns)] = 0.0
+
+    sizes = [min(chunk_size, n_paths - lo) for lo in range(0, n_paths, chunk_size)]
+    tasks = list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+    sim_state = (config_snapshot(config), prices_df.index, list(prices_df.columns), values[0], log_returns, block_size)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    print(f"蒙特卡洛模拟: {n_paths} 条路径, 分 {len(tasks)} 块, {max_workers} 个工作进程...")
+    if max_workers == 1 or len(tasks) == 1:
+        parts = [_simulate_chunk(task, *sim_state) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=sim_state) as pool:
+            parts = list(pool.map(_run_chunk, tasks))
+
+    account_names = _account_columns(config)[0]
+    final_values = np.vstack([p[0] for p in parts])
+    total_invested = np.concatenate([p[1] for p in parts])
+    max_drawdowns = np.vstack([p[2] for p in parts])
+    years = np.full(n_paths, (prices_df.index[-1] - prices_df.index[0]).days / 365.25)
+    return outcome_frame(
+        account_names, final_values, total_invested, years, max_drawdowns,
+        index=pd.RangeIndex(n_paths, name='Path'),
+    )
+
+def bootstrap_paths(start_prices, log_returns, n_paths, block_size, rng) -> np.ndarray:
+    """
+    分块自助抽样生成价格路径。每次随机抽取一段连续 block_size 天的收益率 (所有标的同一天)，
+    首尾相接直到覆盖全部天数，以保留标的之间的相关性和收益率的短期相关性。
+
+    :param start_prices: 每个标的的起始价格
+    :param log_returns: 历史对数日收益率，形状 (天数 - 1, 标的数)
+    :param rng: numpy 随机数生成器
+    :return: 形状为 (n_paths, 天数, 标的数) 的价格数组
+    """
+    n_returns, n_tickers = log_returns.shape
+    block_size = max(1, min(int(block_size), n_returns))
+    n_blocks = -(-n_returns // block_size)
+
+    block_starts = rng.integers(0, n_returns - block_size + 1, size=(n_paths, n_blocks))
+    positions = (block_starts[:, :, None] + np.arange(block_size)).reshape(n_paths, -1)[:, :n_returns]
+
+    log_paths = np.zeros((n_paths, n_returns + 1, n_tickers))
+    np.cumsum(log_returns[positions], axis=1, out=log_paths[:, 1:])
+    return np.asarray(start_prices, dtype=float) * np.exp(log_paths)
+
+def evaluate_paths(config, paths, columns, amounts):
+    """
+    在一组价格路径上评估组合和各基准，逻辑与向量化回测引擎一致。
+
+    :param paths: 形状为 (路径数, 天数, 标的数) 的价格数组
+    :param columns: 与 paths 最后一维对齐的股票代码
+    :param amounts: 形状为 (路径数, 天数) 的每日投入金额 (策略的 generate_amounts_paths)
+    :return: (期末市值 (路径数 x 账户数), 总投入本金 (路径数,), 最大回撤 (路径数 x 账户数))
+    """
+    account_names, account_columns, _ = _account_columns(config)
+    account_idx = np.array([c[0] for c in account_columns], dtype=np.intp)
+    prices = paths[:, :, [columns.index(c[1]) for c in account_columns]]
+    amounts = np.asarray(amounts, dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        purchases = np.where((amounts > 0)[:, :, None] & (prices > 0),
+                             _net_investment(config, amounts) / prices, 0.0)
+    shares = np.cumsum(purchases, axis=1)
+    column_values = np.where(shares > 0, shares * prices, 0.0)
+    values = np.stack(
+        [column_values[:, :, account_idx == acct].sum(axis=2) for acct in range(len(account_names))], axis=2
+    )
+
+    total_invested = amounts.sum(axis=1)
+    return values[:, -1, :], total_invested, calculate_max_drawdown_array(values, axis=1)
+
+def _init_worker(config, index, columns, start_prices, log_returns, block_size):
+    _worker_state['args'] = (config, index, columns, start_prices, log_returns, block_size)
+
+def _run_chunk(task):
+    return _simulate_chunk(task, *_worker_state['args'])
+
+def _simulate_chunk(task, config, index, columns, start_prices, log_returns, block_size):
+    n_paths, seed_sequence = task
+    rng = np.random.default_rng(seed_sequence)
+    paths = bootstrap_paths(start_prices, log_returns, n_paths, block_size, rng)
+    amounts = create_strategy(config.STRATEGY_CONFIG).generate_amounts_paths(
+        index, paths, columns, config.INVESTMENT_AMOUNT
+    )
+    return evaluate_paths(config, paths, columns, amounts)
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 class Account:
@@ -45,4 +46,172 @@ class Account:
         for ticker, num_shares in self.shares.items():
             if num_shares > 0 and ticker in current_prices:
                 value += num_shares * current_prices[ticker]
-        return value
\ No newline at end of file
+        return value
+
+    def get_state(self) -> dict:
+        """
+        导出账户状态 (持股和总投入)，可用于保存检查点。
+
+        :return: {'shares': {股票代码: 股数}, 'total_invested': 总投入}
+        """
+        return {'shares': dict(self.shares), 'total_invested': self.total_invested}
+
+    def restore_state(self, state: dict):
+        """
+        从 get_state 导出的状态恢复账户。
+
+        :param state: {'shares': {股票代码: 股数}, 'total_invested': 总投入}
+        """
+        self.shares.update(state['shares'])
+        self.total_invested = state['total_invested']
+
+
+class CompactAccount:
+    """
+    数组化的投资账户：股票代码到列号的映射固定，持股保存在 NumPy 向量中。
+
+    接口与 Account 相同，但价格以与 tickers 对齐的数组传入，避免逐元素访问 pandas Series。
+    可以独立使用，也可以是 AccountBook 中某一行的视图。
+    """
+    __slots__ = ('name', 'tickers', 'columns', 'shares', '_invested')
+
+    def __init__(self, name: str, tickers: list, shares: np.ndarray = None, invested: np.ndarray = None):
+        """
+        :param name: 账户名称
+        :param tickers: 此账户持有的股票代码，决定持股向量的列顺序
+        :param shares: 可选，外部提供的持股向量 (例如 AccountBook 中的一行)
+        :param invested: 可选，外部提供的长度为 1 的总投入数组
+        """
+        self.name = name
+        self.tickers = list(tickers)
+        self.columns = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self.shares = shares if shares is not None else np.zeros(len(self.tickers))
+        self._invested = invested if invested is not None else np.zeros(1)
+
+    @property
+    def total_invested(self) -> float:
+        return float(self._invested[0])
+
+    @total_invested.setter
+    def total_invested(self, value: float):
+        self._invested[0] = value
+
+    def add_investment(self, amount: float):
+        """
+        记录一笔新的投资，增加总投入本金。
+        """
+        self._invested[0] += amount
+
+    def buy(self, ticker: str, num_shares: float):
+        """
+        向账户中增加指定数量的股票。股票代码必须在创建账户时给出。
+        """
+        self.shares[self.columns[ticker]] += num_shares
+
+    def get_market_value(self, current_prices) -> float:
+        """
+        根据当前价格计算账户的总市值，只计算持股为正的部分。
+
+        :param current_prices: 与 tickers 对齐的价格数组 (或包含这些代码的 pandas Series)
+        :return: 账户的总市值
+        """
+        if isinstance(current_prices, pd.Series):
+            current_prices = current_prices.reindex(self.tickers).to_numpy(dtype=float)
+        return float(np.where(self.shares > 0, self.shares * current_prices, 0.0).sum())
+
+    def market_values(self, price_matrix: np.ndarray) -> np.ndarray:
+        """
+        按当前持股批量计算所有日期的市值。
+
+        :param price_matrix: 形状为 (天数, len(tickers)) 的价格矩阵，列与 tickers 对齐
+        :return: 每天的账户市值数组
+        """
+        return _masked_values(price_matrix, self.shares[None, :])[:, 0]
+
+    def get_state(self) -> dict:
+        return {'shares': dict(zip(self.tickers, self.shares.tolist())), 'total_invested': self.total_invested}
+
+    def restore_state(self, state: dict):
+        for ticker, num_shares in state['shares'].items():
+            self.shares[self.columns[ticker]] = num_shares
+        self.total_invested = state['total_invested']
+
+
+class AccountBook:
+    """
+    多账户容器：组合和各基准账户作为同一个二维持股数组 (账户 x 股票代码) 的行。
+
+    所有账户共用一套股票代码列，一行价格向量即可一次算出所有账户的市值。
+    """
+    __slots__ = ('names', 'tickers', 'columns', 'shares', 'total_invested', '_rows', '_holdings', '_accounts')
+
+    def __init__(self, accounts: dict):
+        """
+        :param accounts: {账户名称: 该账户持有的股票代码列表}，保持插入顺序
+        """
+        self.names = list(accounts.keys())
+        self.tickers = list(dict.fromkeys(t for tickers in accounts.values() for t in tickers))
+        self.columns = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self.shares = np.zeros((len(self.names), len(self.tickers)))
+        self.total_invested = np.zeros(len(self.names))
+        self._rows = {name: i for i, name in enumerate(self.names)}
+        self._holdings = {name: list(tickers) for name, tickers in accounts.items()}
+        # 每个账户都是共享行数据的 CompactAccount 视图
+        self._accounts = {
+            name: CompactAccount(
+                name, self.tickers, shares=self.shares[i], invested=self.total_invested[i:i + 1]
+            )
+            for i, name in enumerate(self.names)
+        }
+
+    def __getitem__(self, name: str) -> CompactAccount:
+        return self._accounts[name]
+
+    def row(self, name: str) -> int:
+        return self._rows[name]
+
+    def market_value(self, prices: np.ndarray) -> np.ndarray:
+        """
+        计算所有账户在某一天的市值。
+
+        :param prices: 与 tickers 对齐的一行价格
+        :return: 与 names 对齐的市值数组
+        """
+        return np.where(self.shares > 0, self.shares * prices, 0.0).sum(axis=1)
+
+    def market_values(self, price_matrix: np.ndarray) -> np.ndarray:
+        """
+        按当前持股批量计算所有日期、所有账户的市值。
+
+        :param price_matrix: 形状为 (天数, len(tickers)) 的价格矩阵
+        :return: 形状为 (天数, 账户数) 的市值矩阵
+        """
+        return _masked_values(price_matrix, self.shares)
+
+    def get_state(self) -> dict:
+        """导出所有账户的状态，格式与 Account.get_state 相同，只包含各账户自己的股票代码。"""
+        return {
+            name: {
+                'shares': {t: float(self.shares[i, self.columns[t]]) for t in self._holdings[name]},
+                'total_invested': float(self.total_invested[i]),
+            }
+            for i, name in enumerate(self.names)
+        }
+
+    def restore_state(self, states: dict):
+        for name, state in states.items():
+            self._accounts[name].restore_state(state)
+
+
+def _masked_values(price_matrix: np.ndarray, shares: np.ndarray) -> np.ndarray:
+    """
+    用矩阵乘法计算 (天数 x 账户) 的市值，语义与 Account.get_market_value 一致：
+    只计算持股为正的部分；某个正持股的价格缺失 (NaN) 时该账户当天市值为 NaN。
+    """
+    held = shares > 0
+    positive = np.where(held, shares, 0.0)
+    missing = np.isnan(price_matrix)
+    values = np.where(missing, 0.0, price_matrix) @ positive.T
+    if missing.any():
+        values[(missing.astype(float) @ held.T.astype(float)) > 0] = np.nan
+    return values
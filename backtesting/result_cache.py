@@ -0,0 +1,156 @@
+import hashlib
+import json
+import numbers
+import os
+import pickle
+import pandas as pd
+from utils import profiling
+
+# 决定回测结果 (results_df 和 metrics_summary) 的配置项；引擎模式等不影响结果的配置不计入
+RESULT_CONFIG_KEYS = [
+    'PORTFOLIO', 'BENCHMARKS', 'INVESTMENT_AMOUNT', 'TRANSACTION_COST', 'STRATEGY_CONFIG',
+    'START_DATE', 'END_DATE', 'RISK_FREE_RATE', 'TAX_LOTS',
+]
+# 缓存格式变化时修改此版本号，旧条目自然失效
+CACHE_FORMAT = 1
+
+class ResultCache:
+    """
+    按内容寻址的回测结果磁盘缓存。
+
+    键是规范化配置与价格数据指纹的哈希，每个条目一个 pickle 文件。读取命中时更新文件的修改时间，
+    写入后按修改时间从旧到新删除条目，直到总大小不超过 max_bytes (基于大小的 LRU 淘汰)。
+    价格存储刷新后数据指纹随之改变，旧条目不会再被命中，最终被淘汰。
+    """
+    def __init__(self, root: str, max_bytes: int = 256 * 1024 * 1024):
+        """
+        :param root: 缓存目录，首次写入时自动创建
+        :param max_bytes: 缓存总大小上限 (字节)
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def key(self, config, data_fingerprint: str) -> str:
+        """
+        :param config: 配置对象，只使用 RESULT_CONFIG_KEYS 中的配置项
+        :param data_fingerprint: 价格数据的指纹 (例如 loader.data_fingerprint 或 prices_fingerprint)
+        :return: 十六进制的缓存键
+        """
+        return result_key(config, data_fingerprint)
+
+    def get(self, key: str):
+        """
+        :return: put 时保存的对象，未命中 (或条目损坏) 时为 None
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            profiling.count('result_cache.misses')
+            return None
+        # 更新修改时间，作为 LRU 的“最近使用”时间
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        profiling.count('result_cache.hits')
+        return value
+
+    def put(self, key: str, value):
+        """保存一个条目，然后按需淘汰最久未使用的条目。"""
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        """删除最久未使用的条目，直到缓存总大小不超过 max_bytes。"""
+        entries = []
+        for name in os.listdir(self.root) if os.path.isdir(self.root) else []:
+            if not name.endswith('.pkl'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.root, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.root, name))
+                profiling.count('result_cache.evictions')
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """删除全部条目。"""
+        for name in os.listdir(self.root) if os.path.isdir(self.root) else []:
+            if name.endswith('.pkl'):
+                os.remove(os.path.join(self.root, name))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.pkl")
+
+
+def result_key(config, data_fingerprint: str, extra=None) -> str:
+    """
+    由规范化的配置和价格数据指纹计算稳定的哈希，配置等价 (例如 100 与 100.0) 时结果相同。
+
+    :param extra: 其他需要区分的内容 (可 JSON 序列化)，例如请求类型和选项
+    """
+    settings = {k: _normalize(getattr(config, k, None)) for k in RESULT_CONFIG_KEYS}
+    # '2014-1-1' 与 '2014-01-01' 是同一天
+    for k in ('START_DATE', 'END_DATE'):
+        if settings[k] is not None:
+            settings[k] = pd.Timestamp(getattr(config, k)).strftime('%Y-%m-%d')
+    payload = {'format': CACHE_FORMAT, 'config': settings, 'data': data_fingerprint}
+    if extra is not None:
+        payload['extra'] = _normalize(extra)
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def create_result_cache(cache_config: dict = None):
+    """
+    根据配置 (config.RESULT_CACHE) 创建结果缓存，未启用时返回 None。
+    """
+    cache_config = cache_config or {}
+    if not cache_config.get('enabled'):
+        return None
+    return ResultCache(
+        cache_config.get('directory', os.path.join('cache', 'results')),
+        max_bytes=int(cache_config.get('max_mb', 256) * 1024 * 1024),
+    )
+
+def prices_fingerprint(prices_df: pd.DataFrame) -> str:
+    """
+    按内容计算价格宽表的指纹 (日期、列名和数值)，用于不经过价格存储直接传入价格数据的场景。
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(prices_df.index.as_unit('ns').asi8.tobytes())
+    digest.update(json.dumps([str(c) for c in prices_df.columns]).encode('utf-8'))
+    digest.update(prices_df.to_numpy(dtype=float).tobytes())
+    return digest.hexdigest()
+
+def _normalize(value):
+    """
+    把配置值规范化为稳定的 JSON 结构: 数值统一为浮点数，使 100 与 100.0 得到相同的键。
+    """
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, numbers.Number):
+        return float(value)
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%Y-%m-%d')
+    return str(value)
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+from utils.metrics import OUTCOME_METRICS, calculate_max_drawdown_array, outcome_frame
+from strategies import create_strategy, require_stateless
+from .engine import _purchase_matrix
+
+def run_rolling_analysis(config, prices_df, signals, horizon_years=5, step=1, chunk_size=256, amounts=None):
+    """
+    滚动起始日分析：对历史上每一个可能的起始日，按固定的投资期限回测一次，得到结果的分布。
+
+    所有窗口在一次数组运算中完成：先对每列 (账户持有的标的) 的买入股数做前缀和，
+    窗口 [s, e] 内第 t 天的持股即为 prefix[t] - prefix[s-1]，不需要逐个窗口重新回测。
+    最大回撤依赖逐日路径，按起始日分块计算以限制内存占用。
+
+    信号在完整历史上生成后按窗口截取，因此均线等指标不会在每个窗口重新预热。
+
+    :param prices_df: 完整历史的价格数据
+    :param signals: 在完整历史上生成的交易信号
+    :param amounts: 在完整历史上生成的每日投入金额 (策略的 generate_amounts)，给出时代替 signals x INVESTMENT_AMOUNT
+    :param horizon_years: 投资期限 (年)，可以是小数，按月取整
+    :param step: 每隔多少个交易日取一个起始日
+    :param chunk_size: 计算最大回撤时每块包含的起始日个数
+    :return: DataFrame，索引为起始日，列为 (账户名称, 指标) 的二级列
+    """
+    require_stateless(create_strategy(config.STRATEGY_CONFIG), '滚动起始日分析')
+    index = prices_df.index
+    account_names, columns, prices, day_amounts, purchases = _purchase_matrix(config, prices_df, signals, amounts)
+    account_idx = np.array([c[0] for c in columns], dtype=np.intp)
+
+    # 每个起始日对应的结束日: 期限内的最后一个交易日，超出历史的起始日不参与统计
+    horizon = pd.DateOffset(months=int(round(horizon_years * 12)))
+    targets = index + horizon
+    starts = np.arange(0, len(index), max(int(step), 1))
+    starts = starts[targets[starts] <= index[-1]]
+    if len(starts) == 0:
+        return pd.DataFrame(columns=pd.MultiIndex.from_product([account_names, OUTCOME_METRICS]))
+    ends = np.searchsorted(index.as_unit('ns').asi8, targets[starts].as_unit('ns').asi8, side='right') - 1
+
+    # 前缀和多一行 0，prefix[t + 1] 为截至第 t 天 (含) 的累计值
+    share_prefix = np.vstack([np.zeros((1, len(columns))), np.cumsum(purchases, axis=0)])
+    invested_prefix = np.concatenate([[0.0], np.cumsum(day_amounts)])
+
+    final_values = _window_values(share_prefix, prices, account_idx, len(account_names), starts, ends[:, None])[:, 0]
+    total_invested = invested_prefix[ends + 1] - invested_prefix[starts]
+    years = (index[ends] - index[starts]).days.to_numpy() / 365.25
+
+    max_drawdowns = np.empty((len(starts), len(account_names)))
+    for lo in range(0, len(starts), chunk_size):
+        chunk = slice(lo, lo + chunk_size)
+        max_drawdowns[chunk] = _window_max_drawdown(
+            share_prefix, prices, account_idx, len(account_names), starts[chunk], ends[chunk]
+        )
+
+    return outcome_frame(
+        account_names, final_values, total_invested, years, max_drawdowns,
+        index=pd.Index(index[starts], name='Start_Date'),
+    )
+
+def _window_values(share_prefix, prices, account_idx, n_accounts, starts, days):
+    """
+    计算各窗口在指定日期的账户市值。
+
+    :param starts: 每个窗口的起始日位置，形状 (窗口数,)
+    :param days: 每个窗口要计算市值的日期位置，形状 (窗口数, 天数)
+    :return: 形状为 (窗口数, 天数, 账户数) 的市值数组
+    """
+    values = np.zeros(days.shape + (n_accounts,))
+    for col in range(share_prefix.shape[1]):
+        shares = share_prefix[days + 1, col] - share_prefix[starts, col][:, None]
+        # 与 Account.get_market_value 一致: 只计算持股为正的部分
+        values[:, :, account_idx[col]] += np.where(shares > 0, shares * prices[days, col], 0.0)
+    return values
+
+def _window_max_drawdown(share_prefix, prices, account_idx, n_accounts, starts, ends):
+    """计算一块窗口内各账户的最大回撤，语义与 metrics.calculate_max_drawdown 一致。"""
+    lengths = ends - starts + 1
+    offsets = np.arange(lengths.max())
+    inside = offsets[None, :] < lengths[:, None]
+    days = np.minimum(starts[:, None] + offsets[None, :], ends[:, None])
+
+    values = _window_values(share_prefix, prices, account_idx, n_accounts, starts, days)
+    values[~inside] = np.nan
+    return calculate_max_drawdown_array(values, axis=1)
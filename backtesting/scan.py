@@ -0,0 +1,75 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from strategies import create_strategy, require_stateless, signal_tickers
+from utils import metrics, profiling
+from .engine import _calculate_cost
+
+# 工作进程中的全局状态，由 _init_worker 设置
+_worker_state = {}
+
+def scan_universe(config, matrix, chunk_size=256, max_workers=None, rank_by='年化收益率(CAGR)') -> pd.DataFrame:
+    """
+    大规模标的筛选: 把价格矩阵中的每个标的作为一个单独的定投账户回测 (规则与基准账户相同:
+    每个买入日投入 INVESTMENT_AMOUNT，扣除交易成本)，返回按指标排序的指标表。
+
+    每日投入金额 (策略的 generate_amounts) 只计算一次，所有标的共用。矩阵按列块计算，每块只把 chunk_size 列读入内存，
+    内存占用与标的总数无关；各块在进程池中并行，工作进程打开同一个内存映射文件，不复制价格数据。
+
+    :param config: 配置，使用其中的 STRATEGY_CONFIG / INVESTMENT_AMOUNT / TRANSACTION_COST / RISK_FREE_RATE
+    :param matrix: 价格矩阵 (data.matrix.PriceMatrix)，需包含策略的信号标的
+    :param chunk_size: 每块的标的个数
+    :param max_workers: 工作进程数，默认等于 CPU 核数；为 1 时在当前进程中计算
+    :param rank_by: 排序所依据的指标
+    :return: DataFrame (标的 x 指标)，第一列为排名
+    """
+    strategy_config = config.STRATEGY_CONFIG
+    strategy = create_strategy(strategy_config)
+    require_stateless(strategy, '标的筛选')
+    with profiling.span('scan.signals'):
+        amounts = strategy.generate_amounts(
+            matrix.frame(signal_tickers(strategy_config)), config.INVESTMENT_AMOUNT
+        ).reindex(matrix.index).fillna(0).to_numpy(dtype=float)
+
+    net_amounts = np.where(amounts > 0, amounts - _calculate_cost(amounts, config.TRANSACTION_COST), 0.0)
+    scan_state = (matrix, amounts, net_amounts, getattr(config, 'RISK_FREE_RATE', 0.0))
+    chunks = matrix.column_chunks(chunk_size)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    print(f"标的筛选: {len(matrix.columns)} 个标的 x {len(matrix.index)} 个交易日, "
+          f"分 {len(chunks)} 块, {max_workers} 个工作进程...")
+    if max_workers == 1 or len(chunks) == 1:
+        parts = [scan_chunk(bounds, *scan_state) for bounds in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=scan_state) as pool:
+            parts = list(pool.map(_run_chunk, chunks))
+
+    table = pd.concat(parts) if parts else pd.DataFrame(columns=metrics.METRIC_ORDER)
+    table.index.name = '标的'
+    table = table.sort_values(rank_by, ascending=False, na_position='last')
+    table.insert(0, '排名', np.arange(1, len(table) + 1))
+    return table
+
+def scan_chunk(bounds, matrix, amounts, net_amounts, risk_free_rate) -> pd.DataFrame:
+    """
+    回测矩阵中 [起始列, 结束列) 的标的，计算方式与向量化引擎中的基准账户相同。
+
+    :return: DataFrame (标的 x 指标)
+    """
+    lo, hi = bounds
+    with profiling.span('scan.chunk', tickers=hi - lo):
+        prices = np.asarray(matrix.values[:, lo:hi], dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            purchases = np.where((amounts > 0)[:, None] & (prices > 0), net_amounts[:, None] / prices, 0.0)
+        shares = np.cumsum(purchases, axis=0)
+        values = pd.DataFrame(np.where(shares > 0, shares * prices, 0.0), index=matrix.index,
+                              columns=matrix.columns[lo:hi])
+        invested = np.cumsum(amounts)
+        return metrics.calculate_metrics_table(values, invested, risk_free_rate=risk_free_rate)
+
+def _init_worker(matrix, amounts, net_amounts, risk_free_rate):
+    _worker_state['args'] = (matrix, amounts, net_amounts, risk_free_rate)
+
+def _run_chunk(bounds):
+    return scan_chunk(bounds, *_worker_state['args'])
@@ -0,0 +1,136 @@
+import itertools
+import os
+import types
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+import pandas as pd
+from strategies import create_strategy
+from utils import metrics
+from .engine import backtest_strategy
+
+# 参与排名的组合指标 (与 metrics_summary 中的字段一致)
+METRIC_FIELDS = metrics.METRIC_ORDER
+
+# 工作进程中的全局状态，由 _init_worker 设置
+_worker_state = {}
+
+def expand_grid(grid) -> list:
+    """
+    把参数网格展开为策略配置列表。
+
+    :param grid: {参数名: 取值列表} 的字典，或多个这样的字典组成的列表
+                 (例如同时扫描 time_based 和 sma_crossover)。非列表的取值视为固定值。
+    :return: STRATEGY_CONFIG 字典的列表
+    """
+    grids = grid if isinstance(grid, list) else [grid]
+    strategy_configs = []
+    for g in grids:
+        keys = list(g.keys())
+        values = [v if isinstance(v, (list, tuple)) else [v] for v in g.values()]
+        for combination in itertools.product(*values):
+            strategy_configs.append(dict(zip(keys, combination)))
+    return strategy_configs
+
+def config_snapshot(config) -> types.SimpleNamespace:
+    """
+    把 config 模块中的大写配置项复制为可序列化的对象，供工作进程使用。
+    """
+    return types.SimpleNamespace(**{k: getattr(config, k) for k in dir(config) if k.isupper()})
+
+def run_sweep(config, prices_df, strategy_configs, max_workers=None, rank_by='年化收益率(CAGR)'):
+    """
+    在进程池中并行回测一组策略配置，返回按指标排序的结果表。
+
+    价格矩阵只放入一块共享内存，工作进程直接映射使用，不会随每个任务序列化。
+
+    :param config: 配置 (模块或 config_snapshot 的结果)，其中的 STRATEGY_CONFIG 会被逐个替换
+    :param prices_df: 已加载的价格数据，需包含所有策略用到的标的
+    :param strategy_configs: STRATEGY_CONFIG 字典的列表，可由 expand_grid 生成
+    :param max_workers: 工作进程数，默认等于 CPU 核数
+    :param rank_by: 排序所依据的指标
+    :return: 每行一个策略配置的 DataFrame，包含策略参数、组合指标和排名
+    """
+    if not strategy_configs:
+        return pd.DataFrame()
+
+    values = np.ascontiguousarray(prices_df.to_numpy(dtype=float))
+    shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    try:
+        np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[:] = values
+        prices_meta = (shm.name, values.shape, prices_df.index, list(prices_df.columns))
+
+        max_workers = max_workers or os.cpu_count() or 1
+        chunksize = max(1, len(strategy_configs) // (max_workers * 4))
+        print(f"参数扫描: {len(strategy_configs)} 组配置, {max_workers} 个工作进程...")
+
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(config_snapshot(config), prices_meta),
+        ) as pool:
+            rows = list(pool.map(_run_one, strategy_configs, chunksize=chunksize))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return rank_results(rows, rank_by)
+
+def _init_worker(config, prices_meta):
+    name, shape, index, columns = prices_meta
+    shm = _attach_shared_memory(name)
+    values = np.ndarray(shape, dtype=float, buffer=shm.buf)
+
+    _worker_state['shm'] = shm
+    _worker_state['config'] = config
+    _worker_state['prices_df'] = pd.DataFrame(values, index=index, columns=columns, copy=False)
+
+def _attach_shared_memory(name):
+    """
+    附加到主进程创建的共享内存，且不向资源追踪器注册。
+    共享内存由主进程负责释放，工作进程注册后会在退出时将其提前回收。
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        pass
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+def evaluate_strategy(config, prices_df, strategy_config) -> dict:
+    """
+    用一组策略参数回测并返回一行结果: 策略参数 + 组合指标，出错时指标为 NaN 并记录错误信息。
+
+    :param config: 配置，其中的 STRATEGY_CONFIG 会被 strategy_config 替换 (不修改原对象)
+    """
+    config = types.SimpleNamespace(**vars(config))
+    config.STRATEGY_CONFIG = strategy_config
+
+    row = dict(strategy_config)
+    try:
+        results_df = backtest_strategy(config, prices_df, create_strategy(strategy_config), mode='vectorized',
+                                       verbose=False)
+        summary = metrics.build_metrics_summary(
+            results_df, config.BENCHMARKS, risk_free_rate=getattr(config, 'RISK_FREE_RATE', 0.0)
+        )['Portfolio']
+        row.update({field: summary[field] for field in METRIC_FIELDS})
+    except Exception as e:
+        row.update({field: np.nan for field in METRIC_FIELDS})
+        row['错误'] = str(e)
+    return row
+
+def rank_results(rows, rank_by='年化收益率(CAGR)') -> pd.DataFrame:
+    """
+    把 evaluate_strategy 的结果行按指标从高到低排序，并加上排名列。
+    """
+    results = pd.DataFrame(rows)
+    results = results.sort_values(rank_by, ascending=False, na_position='last').reset_index(drop=True)
+    results.insert(0, '排名', np.arange(1, len(results) + 1))
+    return results
+
+def _run_one(strategy_config):
+    return evaluate_strategy(_worker_state['config'], _worker_state['prices_df'], strategy_config)
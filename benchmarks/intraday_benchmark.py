@@ -0,0 +1,124 @@
+"""
+分钟 K 线流式读取的吞吐量/内存基准测试。
+
+在临时目录中生成模拟的分钟 K 线文件 (每个交易日 390 根，默认 gzip 压缩的 CSV)，
+分别计算收盘价、VWAP 和某一时刻的每日成交价，统计每秒处理的行数、文件字节数和进程内存峰值。
+文件大小由 --tickers 和 --years 决定，每个标的每年约 10 万行 (未压缩约 4.5 MB)：
+
+    python3 benchmarks/intraday_benchmark.py --tickers 20 --years 20 --format csv.gz
+    python3 benchmarks/intraday_benchmark.py --directory market_data/minute   # 使用已有的文件
+
+--baseline 同时测量用 pandas 把整个文件读入内存再按日分组的方式 (大文件时内存占用与文件大小成正比)。
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from tabulate import tabulate
+from data.intraday import BAR_SUFFIXES, DEFAULT_COLUMNS, daily_bars, find_bar_file, parse_price_type, read_bar_chunks
+
+BARS_PER_DAY = 390
+PRICES = ('close', 'vwap', '10:30')
+
+def write_bars(path: str, years: int, seed: int = 0):
+    """按年分块生成一个标的的分钟 K 线并追加写入，生成过程的内存占用与一年的数据量相当。"""
+    rng = np.random.default_rng(seed)
+    price = 100.0
+    writer = None
+    minutes = pd.to_timedelta(np.arange(BARS_PER_DAY) + 9 * 60 + 30, unit='min').to_numpy()
+    for year in range(2000, 2000 + years):
+        days = pd.bdate_range(f"{year}-01-01", f"{year}-12-31").to_numpy()
+        stamps = (days[:, None] + minutes[None, :]).ravel()
+        closes = price * np.exp(np.cumsum(rng.normal(0, 5e-4, len(stamps))))
+        price = closes[-1]
+        frame = pd.DataFrame({'Datetime': stamps, 'Open': closes, 'High': closes, 'Low': closes,
+                              'Close': np.round(closes, 4), 'Volume': rng.integers(1, 5000, len(stamps))})
+        if path.endswith('.parquet'):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            writer = writer or pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+        else:
+            compression = {'method': 'gzip', 'compresslevel': 1} if path.endswith('.gz') else 'infer'
+            frame.to_csv(path, mode='a' if year > 2000 else 'w', header=year == 2000, index=False,
+                         compression=compression)
+    if writer is not None:
+        writer.close()
+
+def stream(path: str, price: str, chunk_rows: int):
+    """流式计算一个文件的每日成交价 (与 build_intraday_matrix 中的流程相同)，返回 (K 线行数, 交易日数)。"""
+    kind, at_time = parse_price_type(price)
+    n_rows = 0
+
+    def counted(chunks):
+        nonlocal n_rows
+        for chunk in chunks:
+            n_rows += len(chunk[0])
+            yield chunk
+
+    n_days = sum(len(daily[kind]) for daily in daily_bars(counted(read_bar_chunks(path, chunk_rows=chunk_rows)),
+                                                           at_time))
+    return n_rows, n_days
+
+def pandas_baseline(path: str) -> float:
+    """整个文件读入内存后按日分组求 VWAP，返回耗时。"""
+    start = time.perf_counter()
+    bars = pd.read_csv(path, usecols=list(DEFAULT_COLUMNS.values()), parse_dates=['Datetime']) \
+        if not path.endswith('.parquet') else pd.read_parquet(path, columns=list(DEFAULT_COLUMNS.values()))
+    day = bars['Datetime'].dt.normalize()
+    (bars['Close'] * bars['Volume']).groupby(day).sum() / bars['Volume'].groupby(day).sum()
+    return time.perf_counter() - start
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run(directory: str, tickers: list, chunk_rows: int, baseline: bool):
+    paths = [find_bar_file(directory, ticker) for ticker in tickers]
+    total_bytes = sum(os.path.getsize(p) for p in paths)
+    rows = []
+    for price in PRICES:
+        start = time.perf_counter()
+        n_rows, n_days = np.sum([stream(path, price, chunk_rows) for path in paths], axis=0)
+        elapsed = time.perf_counter() - start
+        rows.append([price, f"{elapsed:.1f}", f"{n_rows / elapsed / 1e6:.2f}", f"{total_bytes / elapsed / 1e6:.1f}",
+                     f"{peak_rss_mb():.0f}"])
+    print(f"日内成交价基准测试: {len(tickers)} 个标的，共 {n_rows / 1e6:.1f} 百万行 K 线、{n_days} 个标的交易日，"
+          f"文件共 {total_bytes / 1e9:.2f} GB，chunk_rows={chunk_rows}")
+    print(tabulate(rows, headers=['成交价', '耗时 (秒)', '百万行/秒', '文件 MB/秒', '进程内存峰值 (MB)'],
+                   tablefmt='grid'))
+
+    if baseline:
+        elapsed = pandas_baseline(paths[0])
+        print(f"对比: pandas 一次读入单个文件 ({os.path.getsize(paths[0]) / 1e6:.0f} MB) 再分组: {elapsed:.1f} 秒，"
+              f"进程内存峰值 {peak_rss_mb():.0f} MB")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='分钟 K 线流式读取的吞吐量/内存基准测试')
+    parser.add_argument('--tickers', type=int, default=10)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--format', default='csv.gz', choices=[s.lstrip('.') for s in BAR_SUFFIXES])
+    parser.add_argument('--directory', default=None, help='使用已有的 K 线目录，不生成模拟数据')
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000)
+    parser.add_argument('--baseline', action='store_true')
+    args = parser.parse_args()
+
+    if args.directory:
+        names = sorted(os.listdir(args.directory))
+        tickers = sorted({name.split('.', 1)[0] for name in names if name.endswith(BAR_SUFFIXES)})
+        run(args.directory, tickers, args.chunk_rows, args.baseline)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            tickers = [f"T{i:04d}" for i in range(args.tickers)]
+            start = time.perf_counter()
+            for i, ticker in enumerate(tickers):
+                write_bars(os.path.join(directory, f"{ticker}.{args.format}"), args.years, seed=i)
+            print(f"生成模拟 K 线: {time.perf_counter() - start:.1f} 秒")
+            run(directory, tickers, args.chunk_rows, args.baseline)
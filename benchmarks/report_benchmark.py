@@ -0,0 +1,80 @@
+"""
+报告生成的体积/耗时基准测试。
+
+用模拟的长历史、多标的数据 (默认 30 年 x 100 个标的) 分别以完整模式和轻量模式生成报告，
+比较 HTML 体积和耗时：
+
+    python3 benchmarks/report_benchmark.py --years 30 --tickers 100
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tabulate import tabulate
+from backtesting import engine
+from data.synthetic import synthetic_market
+from reporting import generator
+from strategies import create_strategy
+from utils import metrics
+from utils.price_adjuster import calculate_adjusted_price_frame
+
+# 对比的报告配置
+MODES = {
+    'full': {'max_points': None, 'webgl': False, 'max_price_tickers': None, 'max_workers': 1},
+    'light': {'max_points': 2000, 'webgl': False, 'max_price_tickers': 30, 'max_workers': 4},
+    'light+webgl': {'max_points': 2000, 'webgl': True, 'max_price_tickers': 30, 'max_workers': 4},
+}
+
+def make_inputs(years: int, n_tickers: int, seed: int = 0):
+    """用模拟行情生成调整后价格，组合等权持有全部标的，前三个标的作为基准。"""
+    raw = synthetic_market(n_tickers, years, seed=seed)
+    prices_df = calculate_adjusted_price_frame(raw['close'], raw['dividends'], raw['splits'])
+    index, tickers = prices_df.index, list(prices_df.columns)
+
+    config = types.SimpleNamespace(
+        PORTFOLIO={t: 1.0 / n_tickers for t in tickers},
+        BENCHMARKS=tickers[:3],
+        START_DATE=str(index[0].date()),
+        END_DATE=str(index[-1].date()),
+        INVESTMENT_AMOUNT=100.0,
+        TRANSACTION_COST={'type': 'fixed', 'value': 0.0},
+        STRATEGY_CONFIG={'type': 'time_based', 'frequency': 'weekly', 'day': 2},
+    )
+    signals = create_strategy(config.STRATEGY_CONFIG).generate_signals(prices_df)
+    results_df = engine.run_backtest(config, prices_df, signals, mode='vectorized', verbose=False)
+    return config, prices_df, results_df
+
+def run(years: int, n_tickers: int, repeat: int):
+    config, prices_df, results_df = make_inputs(years, n_tickers)
+    summary = metrics.build_metrics_summary(results_df, config.BENCHMARKS)
+
+    rows = []
+    for mode, report_config in MODES.items():
+        config.REPORT_CONFIG = report_config
+        timings = []
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory() as output_dir, contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                generator.generate_report(results_df, prices_df, summary, config, output_dir=output_dir)
+                timings.append(time.perf_counter() - start)
+                size = os.path.getsize(os.path.join(output_dir, 'summary_report.html'))
+        rows.append([mode, f"{size / 1e6:.2f}", f"{min(timings):.2f}"])
+
+    print(f"报告基准测试: {years} 年 ({len(prices_df)} 个交易日) x {n_tickers} 个标的")
+    print(tabulate(rows, headers=['模式', 'HTML 体积 (MB)', '耗时 (秒)'], tablefmt='grid'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='报告体积/耗时基准测试')
+    parser.add_argument('--years', type=int, default=30)
+    parser.add_argument('--tickers', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.years, args.tickers, args.repeat)
@@ -0,0 +1,299 @@
+"""
+热点路径基准测试。
+
+用 data.synthetic 生成的确定性模拟行情 (无需网络)，在 (标的数 x 年数) 的规模矩阵上
+分别计时行情下载 (注入延迟的模拟数据源)、价格调整、策略信号、回测引擎、指标计算和报告生成，记录耗时、吞吐量 (交易日 x 标的 / 秒)
+和 Python 内存峰值，连同当前 git 提交写入 JSON，便于在不同提交之间比较：
+
+    python3 benchmarks/run.py                                  # 默认规模矩阵
+    python3 benchmarks/run.py --tickers 1 10 --years 5 --repeat 1
+    python3 benchmarks/run.py --compare benchmarks/results/旧结果.json   # 运行后与旧结果对比
+    python3 benchmarks/run.py --compare 旧结果.json 新结果.json          # 只比较两个已有结果
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+from tabulate import tabulate
+from backtesting import engine
+from backtesting.lots import ledger_from_trades
+from data import loader
+from data.providers import FakeProvider
+from data.synthetic import synthetic_market
+from reporting import generator
+from strategies import create_strategy
+from utils import metrics
+from utils.price_adjuster import calculate_adjusted_price_frame
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+DEFAULT_TICKERS = (1, 10, 100, 1000)
+DEFAULT_YEARS = (5, 20, 50)
+# 行情下载用例中模拟数据源每次请求的延迟 (秒)，代表网络往返
+FETCH_LATENCY = 0.01
+
+def make_inputs(n_tickers: int, years: int, seed: int = 0) -> types.SimpleNamespace:
+    """
+    生成一个规模下所有用例共用的输入：原始行情、调整后价格、配置、信号和回测结果。
+    组合等权持有全部标的，前三个标的作为基准。
+    """
+    raw = synthetic_market(n_tickers, years, seed=seed)
+    prices_df = calculate_adjusted_price_frame(raw['close'], raw['dividends'], raw['splits'])
+    tickers = list(prices_df.columns)
+
+    config = types.SimpleNamespace(
+        PORTFOLIO={t: 1.0 / n_tickers for t in tickers},
+        BENCHMARKS=tickers[:3],
+        START_DATE=str(prices_df.index[0].date()),
+        END_DATE=str(prices_df.index[-1].date()),
+        INVESTMENT_AMOUNT=100.0,
+        TRANSACTION_COST={'type': 'percentage', 'value': 0.001},
+        STRATEGY_CONFIG={'type': 'time_based', 'frequency': 'weekly', 'day': 2},
+        REPORT_CONFIG={'max_points': 2000, 'max_price_tickers': 30, 'max_workers': 4},
+    )
+    signals = create_strategy(config.STRATEGY_CONFIG).generate_signals(prices_df)
+    results_df = engine.run_backtest(config, prices_df, signals, mode='vectorized', verbose=False)
+    summary = metrics.build_metrics_summary(results_df, config.BENCHMARKS)
+    return types.SimpleNamespace(
+        raw=raw, prices_df=prices_df, config=config, signals=signals, results_df=results_df, summary=summary
+    )
+
+def _lot_ledger(inputs):
+    """
+    每个买入日等额买入全部标的 (每笔一个批次，1000 个标的 x 50 年约 260 万个批次)，
+    每 13 个买入日的次日卖出各标的持仓的 10%，建立先进先出台账并计算每日成本基础和未实现盈亏。
+    """
+    prices = inputs.prices_df.to_numpy(dtype=float)
+    buy_days = np.flatnonzero(inputs.signals.reindex(inputs.prices_df.index).fillna(0).to_numpy() == 1)
+    amount = inputs.config.INVESTMENT_AMOUNT / prices.shape[1]
+    trades, cash = np.zeros_like(prices), np.zeros_like(prices)
+    trades[buy_days], cash[buy_days] = amount / prices[buy_days], amount
+
+    held, last = np.zeros(prices.shape[1]), 0
+    for day in buy_days[12::13] + 1:
+        if day >= len(prices):
+            break
+        held += trades[last:day].sum(axis=0)
+        trades[day] = -0.1 * held
+        cash[day] = trades[day] * prices[day]
+        held += trades[day]
+        last = day + 1
+
+    ledger = ledger_from_trades(trades, cash, method='fifo')
+    return ledger.daily_cost_basis(len(prices)), ledger.daily_unrealized(prices)
+
+def _fetch(max_workers: int):
+    """
+    用注入了 FETCH_LATENCY 延迟的模拟数据源把全部标的下载到临时的行情存储，max_workers=1 时逐个下载。
+    两个用例的耗时之比即为并发下载的加速比。
+    """
+    def case(inputs):
+        with tempfile.TemporaryDirectory() as store_dir:
+            previous, loader.STORE_DIR = loader.STORE_DIR, store_dir
+            try:
+                loader.get_data(list(inputs.prices_df.columns), inputs.config.START_DATE, inputs.config.END_DATE,
+                                provider=FakeProvider(latency=FETCH_LATENCY), max_workers=max_workers)
+            finally:
+                loader.STORE_DIR = previous
+    return case
+
+def _generate_report(inputs):
+    with tempfile.TemporaryDirectory() as output_dir:
+        generator.generate_report(inputs.results_df, inputs.prices_df, inputs.summary, inputs.config, output_dir=output_dir)
+
+# 用例名称 -> 接收 make_inputs 结果的函数
+CASES = {
+    'loader.fetch.serial': _fetch(1),
+    'loader.fetch.concurrent': _fetch(8),
+    'adjust_prices': lambda inputs: calculate_adjusted_price_frame(
+        inputs.raw['close'], inputs.raw['dividends'], inputs.raw['splits']
+    ),
+    'strategy.time_based': lambda inputs: create_strategy(
+        {'type': 'time_based', 'frequency': 'weekly', 'day': 2}
+    ).generate_signals(inputs.prices_df),
+    'strategy.sma_crossover': lambda inputs: create_strategy(
+        {'type': 'sma_crossover', 'ticker_for_signal': inputs.prices_df.columns[0], 'short_window': 50, 'long_window': 200}
+    ).generate_signals(inputs.prices_df),
+    'strategy.expression': lambda inputs: create_strategy({
+        'type': 'expression',
+        'buy': f"weekly(2) and close('{inputs.prices_df.columns[0]}') > sma('{inputs.prices_df.columns[0]}', 200)",
+        'amount': f"where(rsi('{inputs.prices_df.columns[0]}') < 30, 2, 1)",
+    }).generate_amounts(inputs.prices_df, inputs.config.INVESTMENT_AMOUNT),
+    'engine.loop': lambda inputs: engine.run_backtest(
+        inputs.config, inputs.prices_df, inputs.signals, mode='loop', verbose=False
+    ),
+    'engine.vectorized': lambda inputs: engine.run_backtest(
+        inputs.config, inputs.prices_df, inputs.signals, mode='vectorized', verbose=False
+    ),
+    'engine.stateful': lambda inputs: engine.run_stateful_backtest(
+        inputs.config, inputs.prices_df,
+        create_strategy({'type': 'rebalance', 'schedule': inputs.config.STRATEGY_CONFIG, 'every': 4, 'threshold': 0.05}),
+        verbose=False,
+    ),
+    'lots.ledger': _lot_ledger,
+    'metrics': lambda inputs: metrics.build_metrics_summary(inputs.results_df, inputs.config.BENCHMARKS),
+    'report': _generate_report,
+}
+
+def measure(func, inputs, repeat: int, track_memory: bool = True) -> dict:
+    """
+    计时一个用例：取 repeat 次中的最短耗时，另外在 tracemalloc 下单独运行一次记录内存峰值
+    (tracemalloc 会拖慢运行，所以不计入耗时)。
+    """
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func(inputs)
+            timings.append(time.perf_counter() - start)
+
+    result = {'seconds': min(timings), 'mean_seconds': float(np.mean(timings)), 'repeat': repeat}
+    if track_memory:
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            with contextlib.redirect_stdout(io.StringIO()):
+                func(inputs)
+            result['peak_bytes'] = tracemalloc.get_traced_memory()[1] - baseline
+        finally:
+            tracemalloc.stop()
+    return result
+
+def run(tickers, years, cases, repeat: int = 3, track_memory: bool = True, seed: int = 0) -> dict:
+    """
+    在规模矩阵上运行所有用例。
+
+    :return: 可直接写入 JSON 的结果 (包含 git 提交、运行环境和每个用例的测量值)
+    """
+    records = []
+    for n_years in years:
+        for n_tickers in tickers:
+            print(f"生成模拟行情: {n_tickers} 个标的 x {n_years} 年...")
+            inputs = make_inputs(n_tickers, n_years, seed=seed)
+            cells = inputs.prices_df.size
+            for name in cases:
+                print(f"  运行 {name}...")
+                record = {'case': name, 'tickers': n_tickers, 'years': n_years, 'days': len(inputs.prices_df)}
+                record.update(measure(CASES[name], inputs, repeat, track_memory))
+                record['cells_per_second'] = cells / record['seconds'] if record['seconds'] > 0 else None
+                records.append(record)
+
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git': _git_info(),
+        'environment': {
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'matrix': {'tickers': list(tickers), 'years': list(years), 'cases': list(cases), 'seed': seed},
+        'results': records,
+    }
+
+def write_results(results: dict, path: str = None) -> str:
+    """把结果写入 JSON，默认保存为 benchmarks/results/{时间}_{提交}.json。"""
+    if path is None:
+        commit = (results['git'].get('commit') or 'unknown')[:10]
+        stamp = results['created_at'].replace(':', '').replace('-', '')
+        path = os.path.join(RESULTS_DIR, f"{stamp}_{commit}.json")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=1)
+    return path
+
+def compare(base: dict, current: dict) -> list:
+    """
+    按 (用例, 标的数, 年数) 对齐两次结果，返回表格行：基准耗时、当前耗时、加速比和内存峰值变化。
+    只在其中一次结果中出现的组合会被忽略。
+    """
+    base_records = {(r['case'], r['tickers'], r['years']): r for r in base['results']}
+    rows = []
+    for record in current['results']:
+        key = (record['case'], record['tickers'], record['years'])
+        if key not in base_records:
+            continue
+        old = base_records[key]
+        memory = '-'
+        if old.get('peak_bytes') and record.get('peak_bytes') is not None:
+            memory = f"{record['peak_bytes'] / old['peak_bytes']:.2f}x"
+        rows.append([
+            *key, f"{old['seconds']:.4f}", f"{record['seconds']:.4f}",
+            f"{old['seconds'] / record['seconds']:.2f}x" if record['seconds'] > 0 else '-', memory,
+        ])
+    return rows
+
+def print_results(results: dict):
+    rows = [
+        [r['case'], r['tickers'], r['years'], r['days'], f"{r['seconds']:.4f}",
+         f"{r['cells_per_second']:,.0f}" if r['cells_per_second'] else '-',
+         f"{r['peak_bytes'] / 1e6:.1f}" if 'peak_bytes' in r else '-']
+        for r in results['results']
+    ]
+    commit = results['git'].get('commit') or 'unknown'
+    print(f"\n基准测试结果 (提交 {commit[:10]}{' +未提交修改' if results['git'].get('dirty') else ''}):")
+    print(tabulate(rows, headers=['用例', '标的数', '年数', '交易日', '耗时 (秒)', '吞吐量 (格/秒)', '内存峰值 (MB)'], tablefmt='grid'))
+
+def print_comparison(base: dict, current: dict):
+    rows = compare(base, current)
+    base_commit = (base['git'].get('commit') or 'unknown')[:10]
+    current_commit = (current['git'].get('commit') or 'unknown')[:10]
+    print(f"\n对比 {base_commit} -> {current_commit} (加速比 > 1 表示变快):")
+    print(tabulate(rows, headers=['用例', '标的数', '年数', '基准耗时', '当前耗时', '加速比', '内存峰值'], tablefmt='grid'))
+
+def _git_info() -> dict:
+    def git(*args):
+        return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    try:
+        return {
+            'commit': git('rev-parse', 'HEAD'),
+            'branch': git('rev-parse', '--abbrev-ref', 'HEAD'),
+            'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        }
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'branch': None, 'dirty': None}
+
+def _load(path: str) -> dict:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='热点路径基准测试')
+    parser.add_argument('--tickers', type=int, nargs='+', default=DEFAULT_TICKERS, help='标的数量列表')
+    parser.add_argument('--years', type=int, nargs='+', default=DEFAULT_YEARS, help='年数列表')
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES), help='要运行的用例')
+    parser.add_argument('--repeat', type=int, default=3, help='每个用例重复次数，取最短耗时')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help='不测量内存峰值')
+    parser.add_argument('--output', help='结果 JSON 路径，默认写入 benchmarks/results/')
+    parser.add_argument('--compare', nargs='+', metavar='JSON',
+                        help='与已有结果对比；给出两个文件时只比较这两个文件，不运行基准测试')
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) >= 2:
+        print_comparison(_load(args.compare[0]), _load(args.compare[1]))
+        sys.exit(0)
+
+    results = run(args.tickers, args.years, args.cases, repeat=args.repeat, track_memory=not args.no_memory, seed=args.seed)
+    print_results(results)
+    print(f"\n结果已保存至: {write_results(results, args.output)}")
+    if args.compare:
+        print_comparison(_load(args.compare[0]), results)
@@ -0,0 +1,180 @@
+"""
+本地回测服务的吞吐量/延迟基准测试。
+
+在后台线程中用模拟行情启动服务 (只监听本机的临时端口)，由多个并发的 keep-alive 客户端发送回测请求，
+统计每秒请求数和延迟分位数；并与不经过服务、在当前进程中逐个计算的基线对比：
+
+    python3 benchmarks/service_benchmark.py --clients 1 4 16 --requests 8 --workers 2
+
+场景:
+    distinct   每个请求的配置都不同，全部需要计算
+    identical  所有请求的配置相同，运行中的相同请求只计算一次
+    mixed      从 8 个配置中随机选择
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from tabulate import tabulate
+from data.synthetic import synthetic_market
+from service import worker
+from service.server import serve
+from utils.price_adjuster import calculate_adjusted_price_frame
+
+SCENARIOS = ('distinct', 'identical', 'mixed')
+
+def make_config(n_tickers: int, years: int, seed: int = 0):
+    """生成模拟价格和服务的基础配置: 组合持有前 10 个标的，前 3 个标的作为基准，均线择时。"""
+    raw = synthetic_market(n_tickers, years, seed=seed)
+    prices_df = calculate_adjusted_price_frame(raw['close'], raw['dividends'], raw['splits'])
+    tickers = list(prices_df.columns)
+    holdings = tickers[:10]
+    config = types.SimpleNamespace(
+        PORTFOLIO={t: 1.0 / len(holdings) for t in holdings},
+        BENCHMARKS=tickers[:3],
+        START_DATE=f"{prices_df.index[0]:%Y-%m-%d}",
+        END_DATE=f"{prices_df.index[-1] + pd.Timedelta(days=1):%Y-%m-%d}",
+        INVESTMENT_AMOUNT=100.0,
+        TRANSACTION_COST={'type': 'fixed', 'value': 0.25},
+        RISK_FREE_RATE=0.0,
+        STRATEGY_CONFIG={'type': 'sma_crossover', 'ticker_for_signal': tickers[0], 'short_window': 50, 'long_window': 200},
+    )
+    return config, prices_df
+
+def request_body(scenario: str, client: int, i: int, rng) -> dict:
+    if scenario == 'identical':
+        variant = 0
+    elif scenario == 'mixed':
+        variant = int(rng.integers(8))
+    else:
+        variant = client * 10000 + i
+    return {'INVESTMENT_AMOUNT': 100.0 + variant}
+
+async def http_request(reader, writer, method, path, payload=None):
+    """在已有的 keep-alive 连接上发送一个请求，返回 (状态码, JSON)。"""
+    body = json.dumps(payload or {}).encode('utf-8')
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+async def run_clients(port: int, scenario: str, n_clients: int, n_requests: int, seed: int = 0):
+    """n_clients 个并发客户端，每个在自己的连接上依次发送 n_requests 个请求。"""
+    latencies = []
+
+    async def client(c):
+        rng = np.random.default_rng([seed, c])
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            for i in range(n_requests):
+                start = time.perf_counter()
+                status, data = await http_request(reader, writer, 'POST', '/backtest', request_body(scenario, c, i, rng))
+                if status != 200:
+                    raise RuntimeError(f"请求失败 ({status}): {data}")
+                latencies.append(time.perf_counter() - start)
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(n_clients)))
+    return time.perf_counter() - start, np.array(latencies)
+
+async def fetch_status(port):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        return (await http_request(reader, writer, 'GET', '/health'))[1]
+    finally:
+        writer.close()
+
+def start_service(config, prices_df, workers):
+    """在后台线程中启动服务，返回 (端口, 停止函数)。"""
+    started = threading.Event()
+    handles = {}
+
+    def ready(service, server):
+        handles.update(server=server, loop=asyncio.get_running_loop(), port=server.sockets[0].getsockname()[1])
+        started.set()
+
+    def run():
+        try:
+            asyncio.run(serve(config, port=0, max_workers=workers, prices_df=prices_df, ready=ready))
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    started.wait()
+
+    def stop():
+        handles['loop'].call_soon_threadsafe(handles['server'].close)
+        thread.join()
+    return handles['port'], stop
+
+def baseline(config, prices_df, n_requests: int) -> float:
+    """不经过服务，在当前进程中逐个计算，返回每秒请求数。"""
+    worker.init_worker(prices_df)
+    start = time.perf_counter()
+    for i in range(n_requests):
+        request_config = types.SimpleNamespace(**vars(config))
+        request_config.INVESTMENT_AMOUNT = 100.0 + i
+        worker.run_backtest_job(request_config)
+    return n_requests / (time.perf_counter() - start)
+
+def run(clients, n_requests, workers, n_tickers, years):
+    config, prices_df = make_config(n_tickers, years)
+    print(f"服务基准测试: {n_tickers} 个标的 x {years} 年 ({len(prices_df)} 个交易日), {workers} 个工作进程")
+    base_rate = baseline(config, prices_df, max(4, n_requests))
+
+    port, stop = start_service(config, prices_df, workers)
+    rows = []
+    try:
+        # 预热: 让所有工作进程启动并建立指标缓存
+        asyncio.run(run_clients(port, 'distinct', workers, 2))
+        for scenario in SCENARIOS:
+            for n_clients in clients:
+                before = asyncio.run(fetch_status(port))
+                elapsed, latencies = asyncio.run(run_clients(port, scenario, n_clients, n_requests))
+                after = asyncio.run(fetch_status(port))
+                p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+                rows.append([
+                    scenario, n_clients, len(latencies), f"{len(latencies) / elapsed:.1f}",
+                    f"{p50:.0f}", f"{p95:.0f}", f"{p99:.0f}",
+                    after['jobs'] - before['jobs'], after['coalesced'] - before['coalesced'],
+                ])
+    finally:
+        stop()
+
+    print(f"基线 (当前进程逐个计算): {base_rate:.1f} 请求/秒")
+    print(tabulate(rows, headers=['场景', '并发客户端', '请求数', '请求/秒', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)',
+                                  '实际计算', '合并'], tablefmt='grid'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='本地回测服务吞吐量/延迟基准测试')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16], help='并发客户端数列表')
+    parser.add_argument('--requests', type=int, default=8, help='每个客户端发送的请求数')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='服务的工作进程数')
+    parser.add_argument('--tickers', type=int, default=20)
+    parser.add_argument('--years', type=int, default=20)
+    args = parser.parse_args()
+    run(args.clients, args.requests, args.workers, args.tickers, args.years)
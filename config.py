@@ -5,6 +5,40 @@ PORTFOLIO = {
 }
 BENCHMARKS = ['SPY', 'DIA', 'QQQ']
 
+# --- 数据源配置 ---
+# 'yfinance': 在线下载 (默认); 'local': 从本地目录读取 {ticker}.csv / {ticker}.parquet;
+# 'fake': 生成模拟行情，可通过 latency 注入延迟，用于离线测试
+# 每个数据源 (及 local 的目录、fake 的种子) 的行情分别保存在 cache/prices 下的子目录中，互不复用
+DATA_PROVIDER = {
+    'type': 'yfinance',
+    # 'directory': 'market_data',   # 仅 'local' 需要
+}
+# 并发下载参数: 线程数、失败重试次数、重试初始等待秒数、单次请求超时秒数
+DATA_FETCH = {
+    'max_workers': 8,
+    'retries': 3,
+    'backoff': 1.0,
+    'timeout': 30.0,
+}
+
+# --- 日内成交价 ---
+# 启用后回测不使用日收盘价，而是从本地分钟 K 线文件流式计算每个交易日的成交价，内存占用只与 chunk_rows 有关。
+# directory 下每个标的一个文件: {ticker}.csv (可压缩为 .csv.gz / .csv.bz2 / .csv.xz / .csv.zip) 或
+# {ticker}.parquet (需要 pyarrow)，按时间排序，包含 columns 中的时间、价格、成交量三列。
+# price: 'close' 当日最后一根 K 线的收盘价; 'vwap' 成交量加权均价; 'HH:MM' (例如 '10:30') 该时刻的价格。
+# adjust: 用日线数据的股息、拆分做复权，与日收盘价回测的口径一致 (需要能从 DATA_PROVIDER 获取日线)。
+INTRADAY_PRICES = {
+    'enabled': False,
+    'directory': 'market_data/minute',
+    'price': 'vwap',
+    'columns': {'timestamp': 'Datetime', 'price': 'Close', 'volume': 'Volume'},
+    'timezone': None,            # 例如 'America/New_York'；时间戳为 UTC 或带时区时用于划分交易日
+    'adjust': True,
+    'chunk_rows': 1000000,       # 每次读取的 K 线行数
+    'matrix_directory': 'cache/intraday',
+    'dtype': 'float64',
+}
+
 # --- 回测周期配置 ---
 START_DATE = '2014-01-01'
 END_DATE = '2024-01-01'
@@ -13,10 +47,74 @@ END_DATE = '2024-01-01'
 # 对于所有策略，当触发买入信号时，投入的固定金额
 INVESTMENT_AMOUNT = 100.00
 
+# --- 风险指标配置 ---
+# 年化无风险利率，用于计算夏普比率和索提诺比率
+RISK_FREE_RATE = 0.0
+
 # --- 交易成本配置 ---
 TRANSACTION_COST = {
     'type': 'fixed',
-    'value': 0.25 
+    'value': 0.25
+}
+
+# --- 回测引擎配置 ---
+# 'loop': 逐日循环 (参考实现); 'vectorized': 数组化计算，结果一致但速度快得多
+ENGINE_MODE = 'vectorized'
+# 增量回测检查点文件。设置后每次运行只计算上次检查点之后的新交易日，
+# 适合 END_DATE 每天向后推进的日常更新；修改组合或策略后需删除该文件。
+# 只有 time_based 和 sma_crossover 策略支持增量回测，其他策略忽略检查点，每次完整回测。
+CHECKPOINT_PATH = None   # 例如 'cache/checkpoints/daily.pkl'
+
+# --- 税务批次 ---
+# 启用后为每个账户的每个标的记录买入批次 (成本含交易成本)，卖出 (再平衡策略调仓) 时按 method 消耗批次，
+# 回测结果中增加各账户每日的成本基础 ({账户}_Cost_Basis)、未实现盈亏和累计已实现盈亏列。
+# method: 'fifo' 先进先出; 'lifo' 后进先出; 'hifo' 单位成本最高的批次优先 (通常已实现收益最少)。
+# 增量回测 (CHECKPOINT_PATH) 不记录批次。
+TAX_LOTS = {
+    'enabled': False,
+    'method': 'fifo',
+}
+
+# --- 结果缓存 ---
+# 相同的组合、策略、成本、日期区间和价格数据的回测结果保存在磁盘上，重复运行时直接读取。
+# 价格缓存刷新 (下载了新数据) 后对应的结果自动失效；总大小超过 max_mb 时淘汰最久未使用的结果。
+RESULT_CACHE = {
+    'enabled': True,
+    'directory': 'cache/results',
+    'max_mb': 256,
+}
+
+# --- 滚动起始日分析 ---
+# 启用后，对历史上每一个起始日按固定期限回测，在报告中输出结果分布 (分位数表和图表)。
+# 需要价格数据覆盖 START_DATE 起至少 horizon_years 年。
+ROLLING_ANALYSIS = {
+    'enabled': False,
+    'horizon_years': 5,                  # 每个窗口的投资期限 (年)
+    'step': 1,                           # 每隔多少个交易日取一个起始日
+    'percentiles': [5, 25, 50, 75, 95],
+}
+
+# --- 蒙特卡洛模拟 ---
+# 启用后，对历史日收益率做分块自助抽样生成模拟价格路径，在所有路径上运行同一策略，
+# 在报告中输出结果分布。相同的 seed 得到相同的结果 (与进程数无关)。
+MONTE_CARLO = {
+    'enabled': False,
+    'n_paths': 1000,                     # 模拟路径条数
+    'block_size': 20,                    # 每次抽取的连续交易日个数
+    'seed': 42,
+    'chunk_size': 100,                   # 每块的路径条数，决定单块内存占用
+    'max_workers': None,                 # 工作进程数，默认等于 CPU 核数
+    'percentiles': [5, 25, 50, 75, 95],
+}
+
+# --- 报告配置 ---
+# 长历史或大量标的时，降采样和 WebGL 可以显著减小报告体积、加快打开速度
+REPORT_CONFIG = {
+    'max_points': 2000,          # 每条曲线最多显示的点数 (LTTB 降采样)，None 为显示全部数据
+    'webgl': False,              # 使用 WebGL 绘制折线
+    'plotlyjs': 'cdn',           # 'cdn' 或 'inline' (内嵌 plotly.js，报告可离线打开，约增加 4.6MB)
+    'max_price_tickers': 30,     # 价格走势图最多显示的标的个数，None 为不限制
+    'max_workers': 4,            # 并行构建图表的线程数
 }
 
 # --- 策略选择与配置 ---
@@ -50,3 +148,77 @@ STRATEGY_CONFIG = {
     'short_window': 50,
     'long_window': 200,
 }
+
+# # === 策略示例 5: 表达式策略 (组合定投日、指标、比较和逻辑运算，按条件调整投入金额) ===
+# # buy 为买入条件，amount 为投入金额相对 INVESTMENT_AMOUNT 的倍数；相同的子表达式只计算一次。
+# # 可用函数: close(标的) sma/ema(x, 窗口) rsi(x, 窗口=14) drawdown(x) change(x, 天数=1)
+# #           weekly/biweekly(星期几) monthly(日期) week_start(条件) where(条件, a, b) min/max(a, b) clip(x, 下限, 上限)
+# # 需要价格的参数可以直接写标的代码字符串，例如 sma('SPY', 200) 等价于 sma(close('SPY'), 200)。
+# STRATEGY_CONFIG = {
+#     'type': 'expression',
+#     'buy': "weekly(0) and close('SPY') > sma('SPY', 200)",   # 每周一，且 SPY 在 200 日均线之上
+#     'amount': "where(rsi('SPY', 14) < 30, 2, 1)",            # RSI 低于 30 时投入加倍
+# }
+
+# # === 策略示例 6: 价值平均 (依赖账户状态，每个定投日补足目标市值与当前市值的差额) ===
+# STRATEGY_CONFIG = {
+#     'type': 'value_averaging',
+#     'schedule': {'type': 'time_based', 'frequency': 'weekly', 'day': 2},   # 定投日，可以是任意其他策略
+#     'growth': 0.0,           # 目标市值每期的增长率
+#     'max_multiple': 3.0,     # 单次投入最多为 INVESTMENT_AMOUNT 的几倍
+# }
+
+# # === 策略示例 7: 定投并定期再平衡到 PORTFOLIO 权重 ===
+# STRATEGY_CONFIG = {
+#     'type': 'rebalance',
+#     'schedule': {'type': 'time_based', 'frequency': 'weekly', 'day': 2},
+#     'every': 4,              # 每隔几个定投日检查一次
+#     'threshold': 0.05,       # 权重偏离超过 5 个百分点时调仓
+# }
+
+# # === 策略示例 8: 组合回撤越大投入越多 ===
+# STRATEGY_CONFIG = {
+#     'type': 'drawdown_scaling',
+#     'schedule': {'type': 'time_based', 'frequency': 'weekly', 'day': 2},
+#     'scale': 5.0,            # 回撤 20% 时投入 2 倍
+#     'max_multiple': 3.0,
+# }
+
+# --- 批量回测配置 (python3 main.py batch) ---
+# 用同一组基准、策略和交易成本一次评估多个组合，价格只加载一次、基准只计算一次。
+# 键为组合名称 (不能与基准重名)，值与 PORTFOLIO 格式相同。
+BATCH_PORTFOLIOS = {
+    'Growth': {'QQQ': 0.9, 'IBKR': 0.1},
+    'Balanced': {'QQQ': 0.5, 'SPY': 0.3, 'DIA': 0.2},
+    'Index': {'SPY': 1.0},
+}
+
+# --- 标的筛选配置 (python3 main.py scan) ---
+# 对股票池中的每个标的单独回测当前策略 (规则与基准账户相同)，适合在数千个 ETF 中筛选。
+# 价格保存为磁盘上的内存映射矩阵 (directory)，按 chunk_size 列分块计算，内存占用与标的个数无关。
+UNIVERSE_SCAN = {
+    'tickers': ['SPY', 'QQQ', 'DIA', 'IWM', 'VTI', 'VEA', 'VWO', 'TLT', 'GLD', 'VNQ'],
+    'file': None,                # 股票池文件，每行一个代码，与 tickers 合并
+    'directory': 'cache/matrix',
+    'dtype': 'float32',          # 'float32' 文件大小减半；'float64' 与常规回测的数值完全一致
+    'chunk_size': 256,           # 每块的标的个数，决定单块内存占用
+    'max_workers': None,         # 工作进程数，默认等于 CPU 核数
+    'rank_by': '年化收益率(CAGR)',
+}
+
+# --- 参数扫描配置 (python3 sweep.py) ---
+# 每个键对应 STRATEGY_CONFIG 中的一个参数，取值为列表时会展开为所有组合；
+# 也可以写成多个这样的字典组成的列表，同时扫描不同类型的策略。
+SWEEP_GRID = [
+    {
+        'type': 'sma_crossover',
+        'ticker_for_signal': 'SPY',
+        'short_window': [20, 50, 100],
+        'long_window': [150, 200, 250],
+    },
+    {
+        'type': 'time_based',
+        'frequency': ['weekly', 'bi-weekly'],
+        'day': [0, 1, 2, 3, 4],
+    },
+]
@@ -0,0 +1,242 @@
+import datetime
+import hashlib
+import json
+import os
+import re
+import numpy as np
+import pandas as pd
+from data.matrix import write_price_matrix
+from utils import profiling
+
+# 本地分钟 K 线文件: 每个标的一个 {ticker}{后缀}，按下列顺序查找；CSV 的压缩格式由 pandas 按后缀识别
+BAR_SUFFIXES = ('.parquet', '.csv', '.csv.gz', '.csv.bz2', '.csv.xz', '.csv.zip')
+# K 线文件中时间、价格、成交量三列的列名，其余列不会被解析
+DEFAULT_COLUMNS = {'timestamp': 'Datetime', 'price': 'Close', 'volume': 'Volume'}
+# 每日成交价: 当日最后一根 K 线的收盘价，或成交量加权均价；也可以是 'HH:MM' 表示当日该时刻的价格
+PRICE_TYPES = ('close', 'vwap')
+# CSV 中的时间按定长字节串读取，避免为每一行创建 Python 字符串；ISO 格式 (YYYY-MM-DD HH:MM:SS) 由 numpy 直接解析
+_TIMESTAMP_DTYPE = 'S40'
+# 不带时区偏移的 ISO 时间 (日期、可选的时分秒和小数秒)
+_ISO_NAIVE = re.compile(rb'\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?')
+
+def find_bar_file(directory: str, ticker: str):
+    """
+    :return: 标的的 K 线文件路径，不存在时返回 None
+    """
+    for suffix in BAR_SUFFIXES:
+        path = os.path.join(directory, f"{ticker}{suffix}")
+        if os.path.exists(path):
+            return path
+    return None
+
+def parse_price_type(price: str):
+    """
+    :param price: 'close'、'vwap' 或 'HH:MM' (例如 '10:30')
+    :return: (种类, 时刻)，种类为 'close' / 'vwap' / 'at_time'，时刻只有 'at_time' 时不为 None
+    """
+    if price in PRICE_TYPES:
+        return price, None
+    try:
+        return 'at_time', datetime.time.fromisoformat(price)
+    except (TypeError, ValueError):
+        raise ValueError(f"未知的成交价: '{price}'，可选: {PRICE_TYPES} 或 'HH:MM'") from None
+
+def read_bar_chunks(path: str, columns: dict = None, chunk_rows: int = 1_000_000, timezone: str = None):
+    """
+    逐块读取一个 K 线文件，每块最多 chunk_rows 行，只解析时间、价格、成交量三列，
+    内存占用只与块大小有关，与文件大小无关。Parquet 文件需要安装 pyarrow。
+
+    :param columns: 列名，覆盖 DEFAULT_COLUMNS 中的对应项
+    :param timezone: 交易所时区 (例如 'America/New_York')。给出时时间戳按 UTC (带时区的按其自身偏移) 解析后
+                     转换到该时区再划分交易日；默认直接使用文件中的本地时间
+    :return: 生成器，每块为 (时间戳 datetime64[ns] 数组, 价格数组, 成交量数组)
+    """
+    columns = {**DEFAULT_COLUMNS, **(columns or {})}
+    names = [columns['timestamp'], columns['price'], columns['volume']]
+
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        batches = pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=names)
+        for batch in batches:
+            yield _unpack(batch.to_pandas(), names, timezone)
+    else:
+        with pd.read_csv(path, usecols=names, chunksize=chunk_rows,
+                         dtype={names[0]: _TIMESTAMP_DTYPE, names[1]: float, names[2]: float}) as reader:
+            for frame in reader:
+                yield _unpack(frame, names, timezone)
+
+def daily_bars(chunks, at_time: datetime.time = None):
+    """
+    把按时间排序的 K 线块流式聚合为日线。每块末尾的交易日可能在下一块中继续，留到下一块一起计算，
+    所以结果与块的大小无关，同时在内存中的只有当前块和一个交易日的 K 线。
+
+    :param chunks: read_bar_chunks 产生的块
+    :param at_time: 给出时另外计算该时刻的价格: 时间不晚于该时刻的最后一根 K 线的收盘价，
+                    当天没有这样的 K 线 (例如停牌到午后) 时取当天第一根
+    :return: 生成器，每次产生若干个完整交易日的 DataFrame (Date 索引，列 close / vwap / volume，
+             给出 at_time 时还有 at_time)
+    """
+    carry = None
+    for stamps, prices, volumes in chunks:
+        if carry is not None:
+            stamps, prices, volumes = (np.concatenate(pair) for pair in zip(carry, (stamps, prices, volumes)))
+        if not len(stamps):
+            continue
+        if np.any(stamps[1:] < stamps[:-1]):
+            raise ValueError("K 线须按时间先后排序")
+        days = stamps.astype('datetime64[D]')
+        cut = np.searchsorted(days, days[-1])
+        carry = (stamps[cut:], prices[cut:], volumes[cut:])
+        if cut:
+            yield _aggregate(stamps[:cut], prices[:cut], volumes[:cut], days[:cut], at_time)
+    if carry is not None and len(carry[0]):
+        yield _aggregate(*carry, carry[0].astype('datetime64[D]'), at_time)
+
+def execution_prices(path: str, price: str = 'close', start=None, end=None, columns: dict = None,
+                     chunk_rows: int = 1_000_000, timezone: str = None) -> pd.Series:
+    """
+    由一个 K 线文件计算每个交易日的成交价。
+
+    :param price: 'close'、'vwap' 或 'HH:MM'，见 parse_price_type
+    :param start: 起始日期 (包含)，None 表示不限
+    :param end: 结束日期 (不包含)，None 表示不限
+    :return: 以 Date 为索引的成交价序列
+    """
+    kind, at_time = parse_price_type(price)
+    start = None if start is None else np.datetime64(pd.Timestamp(start), 'ns')
+    end = None if end is None else np.datetime64(pd.Timestamp(end), 'ns')
+
+    parts = []
+    for daily in daily_bars(read_bar_chunks(path, columns, chunk_rows, timezone), at_time):
+        dates = daily.index.to_numpy()
+        if end is not None and dates[0] >= end:
+            break
+        mask = np.ones(len(dates), dtype=bool)
+        if start is not None:
+            mask &= dates >= start
+        if end is not None:
+            mask &= dates < end
+        parts.append(daily.loc[mask, kind])
+    if not parts:
+        return pd.Series(dtype=float, index=pd.DatetimeIndex([], name='Date'))
+    return pd.concat(parts)
+
+def bar_files_fingerprint(directory: str, tickers: list, settings: dict, base: str = None) -> str:
+    """
+    不读取内容，由 K 线文件的大小和修改时间、成交价设置计算指纹，用于判断日内成交价矩阵和回测结果能否复用。
+
+    :param settings: 影响结果的设置 (成交价种类、时区、列名、是否调整等)
+    :param base: 同时依赖的其他数据的指纹 (调整因子所在的价格存储)
+    """
+    files = []
+    for ticker in sorted(tickers):
+        path = find_bar_file(directory, ticker)
+        if path is None:
+            files.append([ticker, None])
+        else:
+            stat = os.stat(path)
+            files.append([ticker, os.path.basename(path), stat.st_size, stat.st_mtime_ns])
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps({'settings': settings, 'base': base, 'files': files}, sort_keys=True,
+                             default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+def build_intraday_matrix(directory: str, tickers: list, start, end, path: str, price: str = 'close',
+                          dtype: str = 'float64', columns: dict = None, chunk_rows: int = 1_000_000,
+                          timezone: str = None, factors: pd.DataFrame = None, fingerprint: str = None):
+    """
+    逐个标的流式读取 K 线文件，计算 [start, end) 内每个交易日的成交价，写成与 build_price_matrix
+    相同格式的价格矩阵 (data.matrix.PriceMatrix)，之后的回测、筛选与使用日收盘价时完全相同。
+
+    同一时刻只有一个标的的一块 K 线在内存中，日线结果每个标的只有几千行。
+
+    :param directory: K 线文件目录，没有文件的标的会被跳过
+    :param factors: 可选，PriceStore.load_matrix(..., fields=('factors',)) 的累积调整因子宽表；给出时
+                    成交价按与 loader.get_data 相同的方式做股息、拆分调整 (以区间内最后一个交易日为基准)
+    :param fingerprint: 记录在 meta.json 中的数据指纹 (bar_files_fingerprint)
+    其余参数与 execution_prices、build_price_matrix 相同。
+    """
+    parse_price_type(price)
+    series = {}
+    for ticker in tickers:
+        bar_file = find_bar_file(directory, ticker)
+        if bar_file is None:
+            continue
+        with profiling.span('intraday.ticker', ticker=ticker):
+            prices = execution_prices(bar_file, price, start, end, columns, chunk_rows, timezone)
+        profiling.count('intraday.bytes', os.path.getsize(bar_file))
+        if factors is not None and ticker in factors.columns:
+            prices = prices * _adjustment_ratio(factors[ticker], prices.index)
+        if prices.notna().any():
+            series[ticker] = prices
+    if not series:
+        raise ValueError("未能加载任何股票数据。")
+
+    index = pd.DatetimeIndex(np.unique(np.concatenate([s.index.to_numpy() for s in series.values()])), name='Date')
+    names = list(series)
+    blocks = (series[ticker].reindex(index).ffill().bfill().to_frame(ticker) for ticker in names)
+    return write_price_matrix(path, index, names, blocks, start, end, dtype=dtype, fingerprint=fingerprint)
+
+def _adjustment_ratio(factors: pd.Series, dates: pd.DatetimeIndex) -> pd.Series:
+    """
+    按日线的累积因子 F 求各日期的调整比例 F[-1] / F。分钟数据中有、日线中没有的日期沿用之前最近的比例
+    (之后没有新的事件)，早于日线第一天的沿用第一天的比例。
+    """
+    factors = factors.dropna()
+    if factors.empty:
+        return pd.Series(1.0, index=dates)
+    ratio = factors.iloc[-1] / factors
+    return ratio.reindex(dates, method='ffill').bfill()
+
+def _unpack(frame: pd.DataFrame, names: list, timezone: str):
+    """把一块 K 线拆成时间戳、价格、成交量数组。"""
+    return (_timestamps(frame[names[0]], timezone), frame[names[1]].to_numpy(dtype=float),
+            frame[names[2]].to_numpy(dtype=float))
+
+def _timestamps(values: pd.Series, timezone: str) -> np.ndarray:
+    """
+    解析时间戳为 datetime64[ns]。不带时区偏移的 ISO 格式字节串由 numpy 直接解析，
+    其他格式 (带偏移、其他日期写法) 交给 pandas。给出 timezone 时不带时区的时间按 UTC 处理。
+    """
+    stamps = None
+    if values.dtype.kind == 'S':
+        values = values.to_numpy()
+    # 只检查第一行: 同一个文件的时间格式一致。numpy 会把带偏移的字符串换算为 UTC，这种情况交给 pandas
+    if values.dtype.kind == 'S' and len(values) and _ISO_NAIVE.fullmatch(values[0]):
+        try:
+            stamps = pd.DatetimeIndex(values.astype('datetime64[ns]'))
+        except ValueError:
+            pass
+    if stamps is None:
+        if values.dtype.kind == 'S':
+            values = np.char.decode(values, 'utf-8')
+        stamps = pd.DatetimeIndex(pd.to_datetime(values, utc=timezone is not None))
+
+    if timezone is not None:
+        if stamps.tz is None:
+            stamps = stamps.tz_localize('UTC')
+        stamps = stamps.tz_convert(timezone)
+    if stamps.tz is not None:
+        stamps = stamps.tz_localize(None)
+    return stamps.to_numpy(dtype='datetime64[ns]')
+
+def _aggregate(stamps, prices, volumes, days, at_time):
+    """把若干个完整交易日的 K 线聚合为日线 (按交易日分段求和，不逐日循环)。"""
+    starts = np.flatnonzero(np.concatenate([[True], days[1:] != days[:-1]]))
+    ends = np.append(starts[1:], len(days))
+    valid = np.isfinite(prices) & np.isfinite(volumes)
+    volume = np.add.reduceat(np.where(valid, volumes, 0.0), starts)
+    notional = np.add.reduceat(np.where(valid, prices * volumes, 0.0), starts)
+    close = prices[ends - 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # 当天没有成交量时成交量加权均价退化为收盘价
+        vwap = np.where(volume > 0, notional / volume, close)
+    daily = {'close': close, 'vwap': vwap, 'volume': volume}
+
+    if at_time is not None:
+        limit = np.timedelta64(at_time.hour * 3600 + at_time.minute * 60 + at_time.second, 's')
+        positions = np.where(stamps - days <= limit, np.arange(len(stamps)), -1)
+        last_before = np.maximum.reduceat(positions, starts)
+        daily['at_time'] = prices[np.where(last_before >= 0, last_before, starts)]
+
+    return pd.DataFrame(daily, index=pd.DatetimeIndex(days[starts].astype('datetime64[ns]'), name='Date'))
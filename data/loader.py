@@ -1,55 +1,212 @@
-import yfinance as yf
 import pandas as pd
 import os
-import pickle
-from utils.price_adjuster import calculate_adjusted_prices # 导入新的工具函数
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from data.intraday import bar_files_fingerprint, build_intraday_matrix
+from data.matrix import build_price_matrix, open_price_matrix
+from data.providers import YFinanceProvider
+from data.store import PriceStore
+from utils import profiling
 
+# 缓存目录在第一次写入时才创建 (PriceStore.update)，导入本模块没有副作用
 CACHE_DIR = "cache"
-if not os.path.exists(CACHE_DIR):
-    os.makedirs(CACHE_DIR)
+# 原始行情按标的保存在列式存储中，可回答任意子区间，刷新时只下载缺失的部分；
+# 每个数据源一个子目录 (BaseProvider.store_key)，模拟或本地数据不会被当作在线行情复用
+STORE_DIR = os.path.join(CACHE_DIR, "prices")
+# 大规模标的模式的内存映射价格矩阵
+MATRIX_DIR = os.path.join(CACHE_DIR, "matrix")
+# 由分钟 K 线计算的日内成交价矩阵
+INTRADAY_DIR = os.path.join(CACHE_DIR, "intraday")
 
-def get_data(tickers, start_date, end_date):
+def get_data(tickers, start_date, end_date, provider=None, max_workers=8, retries=3, backoff=1.0, timeout=30.0):
     """
     下载原始价格、股息、拆分数据，并手动计算调整后收盘价。
     这是最可靠的数据处理方式。
+
+    :param provider: 数据源 (BaseProvider)，默认使用 yfinance
+    :param max_workers: 并发下载的最大线程数
+    :param retries: 单个标的下载失败后的最大重试次数
+    :param backoff: 重试前的初始等待秒数，之后每次翻倍
+    :param timeout: 单次请求的超时时间 (秒)
+    """
+    provider = provider or YFinanceProvider()
+    store = price_store(provider)
+    _ensure_stored(store, tickers, start_date, end_date, provider, max_workers, retries, backoff, timeout)
+
+    # 调整后价格以区间内最后一个交易日为基准，与按区间下载后再调整的结果一致；
+    # 存储中保存的是累积调整因子，读取时直接换算，不需要重算整段历史
+    with profiling.span('loader.load_adjusted'):
+        prices_df = store.load_adjusted(tickers, start_date, end_date)
+    if prices_df.empty:
+        raise ValueError("未能加载任何股票数据。")
+
+    for ticker in tickers:
+        if ticker not in prices_df.columns:
+            print(f"警告: 无法获取 {ticker} 的历史数据。")
+
+    prices_df = prices_df.ffill().bfill()
+    profiling.count('loader.rows', len(prices_df))
+
+    return prices_df
+
+def get_price_matrix(tickers, start_date, end_date, path=MATRIX_DIR, dtype='float64', chunk_size=256, provider=None,
+                     max_workers=8, retries=3, backoff=1.0, timeout=30.0):
+    """
+    大规模标的模式: 与 get_data 相同的调整后价格，但保存为磁盘上的内存映射矩阵 (data.matrix.PriceMatrix)，
+    按列块构建，不在内存中生成完整的价格表。已有矩阵的标的、区间、数值类型和数据版本都相同时直接复用。
+
+    :param path: 矩阵目录
+    :param dtype: 'float32' 或 'float64'
+    :param chunk_size: 构建时每次载入的标的个数
+    其余参数与 get_data 相同。
+    """
+    provider = provider or YFinanceProvider()
+    store = price_store(provider)
+    _ensure_stored(store, tickers, start_date, end_date, provider, max_workers, retries, backoff, timeout, verbose=False)
+
+    fingerprint = store.fingerprint(tickers, start_date, end_date)
+    matrix = open_price_matrix(path)
+    if matrix is not None and matrix.meta.get('fingerprint') == fingerprint and matrix.meta.get('dtype') == dtype:
+        print(f"复用已构建的价格矩阵: {path}")
+        return matrix
+
+    print(f"正在构建 {len(tickers)} 个标的的价格矩阵 ({dtype}): {path}")
+    with profiling.span('loader.build_matrix', tickers=len(tickers)):
+        matrix = build_price_matrix(store, tickers, start_date, end_date, path, dtype=dtype, chunk_size=chunk_size,
+                                    fingerprint=fingerprint)
+    missing = sorted(set(tickers) - set(matrix.columns))
+    if missing:
+        print(f"警告: 无法获取 {len(missing)} 个标的的历史数据: {', '.join(missing[:20])}")
+    return matrix
+
+def get_intraday_matrix(tickers, start_date, end_date, intraday, provider=None, max_workers=8, retries=3,
+                        backoff=1.0, timeout=30.0):
+    """
+    日内成交价模式: 从本地分钟 K 线文件流式计算每个交易日的成交价 (收盘、成交量加权均价或某一时刻的价格)，
+    保存为与 get_price_matrix 相同格式的内存映射矩阵。K 线文件和设置都没有变化时直接复用已构建的矩阵。
+
+    :param intraday: 日内成交价配置 (config.INTRADAY_PRICES)
+    其余参数与 get_data 相同，只在需要日线的调整因子 (intraday['adjust']) 时用于下载。
+    """
+    path = intraday.get('matrix_directory', INTRADAY_DIR)
+    dtype = intraday.get('dtype', 'float64')
+    provider = provider or YFinanceProvider()
+    store = price_store(provider)
+    if intraday.get('adjust', True):
+        _ensure_stored(store, tickers, start_date, end_date, provider, max_workers, retries, backoff, timeout,
+                       verbose=False)
+
+    fingerprint = data_fingerprint(tickers, start_date, end_date, intraday=intraday, provider=provider)
+    matrix = open_price_matrix(path)
+    if (fingerprint is not None and matrix is not None and matrix.meta.get('fingerprint') == fingerprint
+            and matrix.meta.get('dtype') == dtype):
+        print(f"复用已构建的日内成交价矩阵: {path}")
+        return matrix
+
+    factors = None
+    if intraday.get('adjust', True):
+        factors = store.load_matrix(tickers, start_date, end_date, fields=('factors',))['factors']
+
+    print(f"正在由分钟 K 线计算 {len(tickers)} 个标的的成交价 ({intraday.get('price', 'close')}): "
+          f"{intraday['directory']}")
+    with profiling.span('loader.build_intraday', tickers=len(tickers)):
+        matrix = build_intraday_matrix(
+            intraday['directory'], tickers, start_date, end_date, path, price=intraday.get('price', 'close'),
+            dtype=dtype, columns=intraday.get('columns'), chunk_rows=intraday.get('chunk_rows', 1_000_000),
+            timezone=intraday.get('timezone'), factors=factors, fingerprint=fingerprint,
+        )
+    missing = sorted(set(tickers) - set(matrix.columns))
+    if missing:
+        print(f"警告: 没有 {len(missing)} 个标的的分钟 K 线: {', '.join(missing[:20])}")
+    return matrix
+
+def data_fingerprint(tickers, start_date, end_date, intraday=None, provider=None):
+    """
+    不下载、不读取行情，返回 get_data 将使用的价格数据的指纹，用于结果缓存的键。
+
+    :param provider: 数据源，默认使用 yfinance；指纹包含数据源的标识
+    :param intraday: 日内成交价配置，启用时返回 get_intraday_matrix 所用数据的指纹
+                     (K 线文件、成交价设置，以及调整时用到的日线数据)
+    :return: 指纹字符串；有标的需要补下载 (缓存不完整，数据可能变化) 时返回 None
     """
-    all_adj_prices = {}
-    
+    intraday = intraday if intraday and intraday.get('enabled', True) else None
+    fingerprint = None
+    if intraday is None or intraday.get('adjust', True):
+        store = price_store(provider)
+        if any(store.missing_ranges(ticker, start_date, end_date) for ticker in tickers):
+            return None
+        fingerprint = store.fingerprint(tickers, start_date, end_date)
+    if intraday is not None:
+        settings = {key: intraday.get(key) for key in ('price', 'timezone', 'columns', 'adjust')}
+        settings['range'] = [pd.Timestamp(d).strftime('%Y-%m-%d') for d in (start_date, end_date)]
+        fingerprint = bar_files_fingerprint(intraday['directory'], tickers, settings, base=fingerprint)
+    return fingerprint
+
+def price_store(provider=None) -> PriceStore:
+    """
+    数据源对应的行情存储: STORE_DIR 下以 provider.store_key() 命名的子目录。
+
+    :param provider: 数据源，默认使用 yfinance
+    """
+    key = (provider or YFinanceProvider()).store_key()
+    return PriceStore(os.path.join(STORE_DIR, key), source=key)
+
+def _ensure_stored(store, tickers, start_date, end_date, provider, max_workers, retries, backoff, timeout,
+                   verbose=True):
+    """
+    下载存储中缺失的区间。
+
+    :param verbose: 是否逐个打印命中缓存的标的 (大规模标的时关闭)
+    """
+    jobs = []
     for ticker in tickers:
-        # 使用新的缓存文件名
-        cache_file = os.path.join(CACHE_DIR, f"manual_adj_{ticker}_{start_date}_{end_date}.pkl")
-        
-        if os.path.exists(cache_file):
-            print(f"从缓存加载 {ticker} 的手动调整后价格...")
-            with open(cache_file, 'rb') as f:
-                all_adj_prices[ticker] = pickle.load(f)
+        missing = store.missing_ranges(ticker, start_date, end_date)
+        if not missing:
+            if verbose:
+                print(f"从缓存加载 {ticker} 的原始数据...")
+            profiling.count('loader.cache_hits')
         else:
-            print(f"正在下载 {ticker} 的原始数据（价格、股息、拆分）...")
-            stock = yf.Ticker(ticker)
-            # --- FIX: 使用 auto_adjust=False 并获取 actions ---
-            history = stock.history(start=start_date, end=end_date, auto_adjust=False, actions=True)
-            
-            if history.empty:
-                print(f"警告: 无法获取 {ticker} 的历史数据。")
+            profiling.count('loader.cache_misses')
+        jobs.extend((ticker, fetch_start, fetch_end) for fetch_start, fetch_end in missing)
+
+    if jobs:
+        _fetch_into_store(provider, store, jobs, max_workers, retries, backoff, timeout)
+
+def _fetch_into_store(provider, store, jobs, max_workers, retries, backoff, timeout):
+    """
+    用有界线程池并发下载所有缺失区间，下载完成后在主线程中依次写入存储。
+    """
+    profiling.count('loader.fetch_jobs', len(jobs))
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs)))) as pool:
+        futures = {
+            pool.submit(_fetch_with_retry, provider, ticker, start, end, retries, backoff, timeout): (ticker, start, end)
+            for ticker, start, end in jobs
+        }
+        for future in as_completed(futures):
+            ticker, start, end = futures[future]
+            try:
+                history = future.result()
+            except Exception as e:
+                print(f"警告: 下载 {ticker} 失败: {e}")
+                profiling.count('loader.fetch_failures')
                 continue
 
-            # 调用我们的函数来计算调整后价格
-            adj_close = calculate_adjusted_prices(
-                prices=history['Close'],
-                dividends=history['Dividends'],
-                splits=history['Stock Splits']
-            )
-            
-            with open(cache_file, 'wb') as f:
-                pickle.dump(adj_close, f)
-            all_adj_prices[ticker] = adj_close
-
-    if not all_adj_prices:
-        raise ValueError("未能加载任何股票数据。")
+            if history.empty and store.coverage(ticker) is None:
+                # 从未获取到数据的标的不写入存储，下次运行时会重新尝试
+                continue
+            with profiling.span('loader.store_update', ticker=ticker):
+                store.update(ticker, history, start, end)
 
-    prices_df = pd.DataFrame(all_adj_prices).ffill().bfill()
-    
-    if prices_df.index.tz is not None:
-        prices_df.index = prices_df.index.tz_localize(None)
-    
-    return prices_df
\ No newline at end of file
+def _fetch_with_retry(provider, ticker, start, end, retries, backoff, timeout):
+    print(f"正在下载 {ticker} 的原始数据（价格、股息、拆分）: {start:%Y-%m-%d} 至 {end:%Y-%m-%d}...")
+    for attempt in range(retries + 1):
+        try:
+            with profiling.span('loader.fetch', ticker=ticker, attempt=attempt):
+                return provider.fetch(ticker, start, end, timeout=timeout)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            profiling.count('loader.fetch_retries')
+            delay = backoff * (2 ** attempt)
+            print(f"下载 {ticker} 出错 ({e})，{delay:.1f} 秒后重试...")
+            time.sleep(delay)
@@ -0,0 +1,156 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from utils import profiling
+
+DTYPES = ('float32', 'float64')
+
+class PriceMatrix:
+    """
+    保存在磁盘上的对齐调整后价格矩阵 (日期 x 标的)，数值以内存映射方式读取。
+
+    目录中 dates.npy 为所有标的共用的交易日，prices.npy 为按列连续存储 (Fortran 顺序) 的价格矩阵，
+    tickers.json 为列顺序，meta.json 记录数值类型和构建时的数据指纹。打开矩阵不会读取数值，
+    按列块访问时只有用到的列被载入内存；多个进程打开同一目录时共享操作系统的页缓存，
+    序列化 (传给工作进程) 时只保存目录路径，不复制数据。
+    """
+    def __init__(self, path: str):
+        """
+        :param path: build_price_matrix 生成的矩阵目录
+        """
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        with open(os.path.join(path, 'tickers.json'), 'r', encoding='utf-8') as f:
+            self.columns = pd.Index(json.load(f))
+        self.index = pd.DatetimeIndex(np.load(os.path.join(path, 'dates.npy')), name='Date')
+        self.values = np.load(os.path.join(path, 'prices.npy'), mmap_mode='r')
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def frame(self, tickers=None, dtype=float) -> pd.DataFrame:
+        """
+        把部分标的的价格读入内存，返回普通的价格 DataFrame (与 loader.get_data 的结果格式相同)。
+
+        :param tickers: 股票代码列表，默认为全部标的 (大规模标的时应按列块读取)
+        """
+        if tickers is None:
+            return pd.DataFrame(np.asarray(self.values, dtype=dtype), index=self.index, columns=self.columns)
+        positions = self.columns.get_indexer(tickers)
+        missing = [t for t, pos in zip(tickers, positions) if pos < 0]
+        if missing:
+            raise KeyError(f"价格矩阵中没有这些标的: {missing}")
+        return pd.DataFrame(np.asarray(self.values[:, positions], dtype=dtype), index=self.index, columns=list(tickers))
+
+    def column_chunks(self, chunk_size: int = 256) -> list:
+        """
+        :return: 列块的 [(起始列, 结束列), ...]，每块最多 chunk_size 列
+        """
+        n_columns = len(self.columns)
+        return [(lo, min(lo + chunk_size, n_columns)) for lo in range(0, n_columns, max(1, chunk_size))]
+
+
+def open_price_matrix(path: str):
+    """
+    打开已构建的价格矩阵，目录不存在或不完整 (meta.json 最后写入) 时返回 None。
+    """
+    if not os.path.exists(os.path.join(path, 'meta.json')):
+        return None
+    return PriceMatrix(path)
+
+def build_price_matrix(store, tickers, start, end, path, dtype='float64', chunk_size=256, fingerprint=None) -> PriceMatrix:
+    """
+    从价格存储按列块构建内存映射的价格矩阵，结果与 loader.get_data 相同 (调整后价格，向前/向后填充)。
+
+    先只读取各标的的交易日求出共用的日期索引，再每次载入 chunk_size 个标的的调整后价格，
+    写入矩阵的对应列，内存占用只与块大小有关，与标的总数无关。
+
+    :param store: 价格存储 (PriceStore)
+    :param tickers: 股票代码列表，存储中没有数据的标的会被跳过
+    :param path: 矩阵目录，已存在时整体替换 (已打开旧矩阵的进程不受影响)
+    :param dtype: 'float32' 或 'float64'，float32 的文件大小减半
+    :param fingerprint: 构建所用数据的指纹 (PriceStore.fingerprint)，记录在 meta.json 中用于判断能否复用
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"未知的数值类型: '{dtype}'，可选: {DTYPES}")
+
+    with profiling.span('matrix.index', tickers=len(tickers)):
+        dates = np.array([], dtype='datetime64[ns]')
+        columns = []
+        for ticker in tickers:
+            ticker_dates = store.dates(ticker, start, end)
+            if not len(ticker_dates):
+                continue
+            columns.append(ticker)
+            # 大多数标的使用相同的交易日历，已包含在索引中时跳过合并
+            positions = np.minimum(np.searchsorted(dates, ticker_dates), max(len(dates) - 1, 0))
+            if not len(dates) or not np.array_equal(dates[positions], ticker_dates):
+                dates = np.union1d(dates, ticker_dates)
+    if not columns:
+        raise ValueError("未能加载任何股票数据。")
+    index = pd.DatetimeIndex(dates, name='Date')
+
+    def blocks():
+        for lo in range(0, len(columns), chunk_size):
+            chunk = columns[lo:lo + chunk_size]
+            with profiling.span('matrix.chunk', tickers=len(chunk)):
+                # 各标的的调整因子互不相关，按块计算与整体计算的结果相同
+                yield store.load_adjusted(chunk, start, end).reindex(index=index, columns=chunk).ffill().bfill()
+
+    return write_price_matrix(path, index, columns, blocks(), start, end, dtype=dtype, fingerprint=fingerprint)
+
+def write_price_matrix(path, index, columns, blocks, start, end, dtype='float64', fingerprint=None) -> PriceMatrix:
+    """
+    把按列块产生的价格写成 PriceMatrix 目录，build_price_matrix 和日内成交价矩阵 (data.intraday) 共用。
+
+    :param path: 矩阵目录，已存在时整体替换 (已打开旧矩阵的进程不受影响)
+    :param index: 共用的日期索引
+    :param columns: 列顺序 (股票代码列表)
+    :param blocks: 依次覆盖全部列的 DataFrame (已按 index 对齐并填充)，每次只需一块在内存中
+    :param fingerprint: 数据指纹，记录在 meta.json 中用于判断能否复用
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"未知的数值类型: '{dtype}'，可选: {DTYPES}")
+
+    os.makedirs(path, exist_ok=True)
+    tmp_prices = os.path.join(path, 'prices.tmp.npy')
+    values = np.lib.format.open_memmap(tmp_prices, mode='w+', dtype=dtype, shape=(len(index), len(columns)),
+                                       fortran_order=True)
+    lo = 0
+    for block in blocks:
+        values[:, lo:lo + block.shape[1]] = block.to_numpy(dtype=float)
+        lo += block.shape[1]
+    values.flush()
+    del values
+
+    # 数值文件就位后才写 meta.json，中途失败不会留下看似完整的矩阵
+    meta_path = os.path.join(path, 'meta.json')
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    os.replace(tmp_prices, os.path.join(path, 'prices.npy'))
+    np.save(os.path.join(path, 'dates.npy'), index.to_numpy(dtype='datetime64[ns]'))
+    with open(os.path.join(path, 'tickers.json'), 'w', encoding='utf-8') as f:
+        json.dump(list(columns), f)
+    meta = {
+        'dtype': dtype,
+        'rows': len(index),
+        'tickers': len(columns),
+        'start': pd.Timestamp(start).strftime('%Y-%m-%d'),
+        'end': pd.Timestamp(end).strftime('%Y-%m-%d'),
+        'fingerprint': fingerprint,
+    }
+    tmp_meta = os.path.join(path, 'meta.tmp.json')
+    with open(tmp_meta, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta, meta_path)
+    profiling.count('matrix.bytes', os.path.getsize(os.path.join(path, 'prices.npy')))
+    return PriceMatrix(path)
@@ -0,0 +1,139 @@
+import hashlib
+import os
+import time
+from abc import ABC, abstractmethod
+import pandas as pd
+from data.store import HISTORY_COLUMNS
+from data.synthetic import synthetic_history
+
+# 所有数据源返回的行情都使用 yfinance history 的列名
+COLUMNS = list(HISTORY_COLUMNS.values())
+
+class BaseProvider(ABC):
+    """
+    行情数据源的抽象基类。
+    所有数据源都必须实现 fetch 方法，返回 [start, end) 区间内的原始 (未调整) 行情。
+    """
+
+    @abstractmethod
+    def fetch(self, ticker: str, start, end, timeout: float = None) -> pd.DataFrame:
+        """
+        获取单个标的的原始行情。
+
+        :param ticker: 股票代码
+        :param start: 开始日期 (包含)
+        :param end: 结束日期 (不包含)
+        :param timeout: 单次请求的超时时间 (秒)，不需要网络的数据源可以忽略
+        :return: 以日期为索引、包含 Close / Dividends / Stock Splits 列的 DataFrame，
+                 没有数据时返回空 DataFrame。
+        """
+        pass
+
+    def store_key(self) -> str:
+        """
+        数据源的标识，用作本地行情存储 (data.store.PriceStore) 的子目录名并记录在 meta.json 中。
+        不同数据源 (或同一数据源的不同目录、种子) 的行情分开保存，不会互相复用。
+        """
+        return type(self).__name__
+
+
+class YFinanceProvider(BaseProvider):
+    """
+    通过 yfinance 在线下载行情 (默认数据源)。
+    """
+    def store_key(self):
+        return 'yfinance'
+
+    def fetch(self, ticker, start, end, timeout=None):
+        import yfinance as yf
+
+        stock = yf.Ticker(ticker)
+        # --- FIX: 使用 auto_adjust=False 并获取 actions ---
+        kwargs = {'timeout': timeout} if timeout else {}
+        return stock.history(start=start, end=end, auto_adjust=False, actions=True, **kwargs)
+
+
+class LocalDirectoryProvider(BaseProvider):
+    """
+    从本地目录读取行情文件，可离线使用。
+
+    目录中每个标的一个文件，命名为 {ticker}.parquet 或 {ticker}.csv，
+    包含日期列 (Date) 和 Close 列，Dividends / Stock Splits 列可选，缺失时视为 0。
+    """
+    def __init__(self, directory: str):
+        """
+        :param directory: 行情文件所在目录
+        """
+        self.directory = directory
+
+    def store_key(self):
+        digest = hashlib.blake2b(os.path.abspath(self.directory).encode('utf-8'), digest_size=6).hexdigest()
+        return f'local-{digest}'
+
+    def fetch(self, ticker, start, end, timeout=None):
+        parquet_path = os.path.join(self.directory, f"{ticker}.parquet")
+        csv_path = os.path.join(self.directory, f"{ticker}.csv")
+
+        if os.path.exists(parquet_path):
+            history = pd.read_parquet(parquet_path)
+            if 'Date' in history.columns:
+                history = history.set_index('Date')
+        elif os.path.exists(csv_path):
+            history = pd.read_csv(csv_path, index_col='Date')
+        else:
+            return pd.DataFrame(columns=COLUMNS)
+
+        history.index = pd.to_datetime(history.index)
+        history = history.sort_index()
+        for column in COLUMNS[1:]:
+            if column not in history.columns:
+                history[column] = 0.0
+
+        index = history.index.tz_localize(None) if history.index.tz is not None else history.index
+        mask = (index >= pd.Timestamp(start)) & (index < pd.Timestamp(end))
+        return history.loc[mask, COLUMNS]
+
+
+class FakeProvider(BaseProvider):
+    """
+    生成确定性随机游走行情 (含分红和拆分) 的模拟数据源，用于离线测试和测量并发下载的收益。
+    行情由 data.synthetic 生成。
+    """
+    def __init__(self, latency: float = 0.0, seed: int = 0):
+        """
+        :param latency: 每次请求人为注入的延迟 (秒)，模拟网络往返
+        :param seed: 随机种子，同一标的在相同种子下总是得到相同的行情
+        """
+        self.latency = latency
+        self.seed = seed
+
+    def store_key(self):
+        # 延迟不影响行情，只有种子决定数据
+        return f'fake-seed{self.seed}'
+
+    def fetch(self, ticker, start, end, timeout=None):
+        if timeout is not None and self.latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"获取 {ticker} 超时")
+        time.sleep(self.latency)
+        return synthetic_history(ticker, start, end, seed=self.seed)
+
+
+def create_provider(provider_config: dict = None) -> BaseProvider:
+    """
+    数据源工厂，根据配置创建并返回一个数据源实例。
+    """
+    provider_config = provider_config or {'type': 'yfinance'}
+    provider_type = provider_config.get('type')
+
+    if provider_type == 'yfinance':
+        return YFinanceProvider()
+    elif provider_type == 'local':
+        return LocalDirectoryProvider(directory=provider_config['directory'])
+    elif provider_type == 'fake':
+        return FakeProvider(
+            latency=provider_config.get('latency', 0.0),
+            seed=provider_config.get('seed', 0)
+        )
+    else:
+        raise ValueError(f"未知的数据源类型: '{provider_type}'")
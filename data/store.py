@@ -0,0 +1,403 @@
+import hashlib
+import io
+import json
+import os
+import numpy as np
+import pandas as pd
+from utils.price_adjuster import event_factors
+
+FIELDS = ('close', 'dividends', 'splits')
+# yfinance history 中对应的列名
+HISTORY_COLUMNS = {'close': 'Close', 'dividends': 'Dividends', 'splits': 'Stock Splits'}
+# 稀疏保存的公司行动事件 (只保存股息或拆分不为 0 的交易日)
+EVENT_DTYPE = np.dtype([('date', 'datetime64[ns]'), ('dividends', 'float64'), ('splits', 'float64')])
+# 按行存储、可在末尾原地追加的数组
+ROW_ARRAYS = ('dates', 'close', 'factors')
+
+class PriceStore:
+    """
+    按标的分目录保存原始行情的列式存储。
+
+    每个标的一个目录: dates.npy / close.npy 为交易日和原始收盘价，factors.npy 为事件因子的正向累积乘积
+    (见 utils.price_adjuster.event_factors)，events.npy 为稀疏的股息和拆分事件。读取时使用内存映射，
+    按日期二分查找切片即可回答任意子区间的查询，调整后价格在读取时按 close * F[区间末行] / F 计算，
+    不保存整段调整后的序列。因此刷新数据时只需为新增的行计算累积因子并追加到数组末尾，
+    新的股息或拆分也不需要重算更早的历史。
+
+    meta.json 记录已下载过的日期区间 (左闭右开，与 yfinance 的 start/end 语义一致)，用于判断需要补下载的部分，
+    有效行数 (数组文件末尾可能有未提交的行)，以及每次写入后递增的数据版本号，用于让依赖这些数据的缓存失效。
+    给出 source 时 meta.json 还记录写入数据的数据源，读取由其他数据源写入的标的会报错。
+    """
+    def __init__(self, root: str, source: str = None):
+        """
+        :param root: 存储根目录，首次写入时自动创建
+        :param source: 数据源标识 (BaseProvider.store_key)
+        """
+        self.root = root
+        self.source = source
+
+    def coverage(self, ticker: str):
+        """
+        返回已下载过的日期区间 (start, end)，尚未保存过该标的时返回 None。
+        """
+        meta = self._read_meta(ticker)
+        if meta is None:
+            return None
+        return pd.Timestamp(meta['start']), pd.Timestamp(meta['end'])
+
+    def version(self, ticker: str):
+        """
+        返回标的的数据版本号，每次 update 后加一，尚未保存过该标的时返回 None。
+        """
+        meta = self._read_meta(ticker)
+        return None if meta is None else meta.get('version', 0)
+
+    def fingerprint(self, tickers: list, start=None, end=None) -> str:
+        """
+        不读取行情数据，由各标的的数据版本计算 [start, end) 区间内价格数据的指纹。
+        任何一个标的被刷新 (update) 后指纹都会改变，可用作结果缓存键的一部分。
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        bounds = [None if d is None else pd.Timestamp(d).strftime('%Y-%m-%d') for d in (start, end)]
+        state = [[ticker, self.version(ticker)] for ticker in sorted(tickers)]
+        digest.update(json.dumps({'source': self.source, 'range': bounds, 'tickers': state}).encode('utf-8'))
+        return digest.hexdigest()
+
+    def missing_ranges(self, ticker: str, start, end) -> list:
+        """
+        计算覆盖 [start, end) 还需要下载的区间列表。
+
+        :return: [(start, end), ...]，完全命中缓存时为空列表
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        covered = self.coverage(ticker)
+        if covered is None:
+            return [(start, end)]
+
+        cov_start, cov_end = covered
+        if start > cov_end or end < cov_start:
+            # 与已有区间不相连，直接下载两者之间的全部数据，保持区间连续
+            return [(min(start, cov_end), max(end, cov_start))]
+
+        ranges = []
+        if start < cov_start:
+            ranges.append((start, cov_start))
+        if end > cov_end:
+            ranges.append((cov_end, end))
+        return ranges
+
+    def update(self, ticker: str, history: pd.DataFrame, start, end):
+        """
+        将新下载的行情合并进存储，并把已覆盖区间扩展到 [start, end)。
+
+        与已有数据日期重叠的行以新数据为准 (例如上次下载时尚未收盘的最后一天)。
+
+        :param history: yfinance 格式的行情，包含 Close / Dividends / Stock Splits 列
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        # 今天及以后的数据可能不完整，不计入已覆盖区间，下次会重新下载
+        end = min(end, pd.Timestamp.today().normalize())
+
+        new_dates = _naive_dates(history.index)
+        new_columns = {
+            field: history[column].to_numpy(dtype=float) if column in history else np.zeros(len(history))
+            for field, column in HISTORY_COLUMNS.items()
+        }
+        order = np.argsort(new_dates, kind='stable')
+        new_dates, new_columns = new_dates[order], {f: new_columns[f][order] for f in FIELDS}
+
+        existing = self._load_arrays(ticker)
+        covered = self.coverage(ticker)
+        version = (self.version(ticker) or 0) + 1
+        if existing is None:
+            self._save_arrays(ticker, new_dates, new_columns, start, end, version)
+            return
+
+        start, end = min(start, covered[0]), max(end, covered[1])
+        # 新数据从第 k 行开始；已有的第 k 行及之后的交易日都被新数据覆盖时 (日常刷新: 末尾追加，
+        # 可能重新下载了上次未收盘的最后一天)，只需改写尾部，否则按合并后的全部数据重写
+        k = len(existing['dates']) if not len(new_dates) else int(np.searchsorted(existing['dates'], new_dates[0]))
+        if 'legacy' not in existing and k > 0 and np.isin(existing['dates'][k:], new_dates).all():
+            self._write_tail(ticker, existing, k, new_dates, new_columns, start, end, version)
+            return
+
+        old_columns = {'close': np.asarray(existing['close']), **self._event_columns(existing, 0, len(existing['dates']))}
+        keep = ~np.isin(existing['dates'], new_dates)
+        dates = np.concatenate([existing['dates'][keep], new_dates])
+        columns = {f: np.concatenate([old_columns[f][keep], new_columns[f]]) for f in FIELDS}
+        # 释放内存映射，之后才能安全地替换文件
+        existing = None
+
+        order = np.argsort(dates, kind='stable')
+        self._save_arrays(ticker, dates[order], {f: columns[f][order] for f in FIELDS}, start, end, version)
+
+    def read(self, ticker: str, start=None, end=None) -> pd.DataFrame:
+        """
+        读取 [start, end) 区间内的原始行情。
+
+        :return: 以日期为索引、列为 close / dividends / splits 的 DataFrame
+        """
+        arrays = self._load_arrays(ticker)
+        if arrays is None:
+            return pd.DataFrame(columns=list(FIELDS), index=pd.DatetimeIndex([], name='Date'))
+        lo, hi = _slice_bounds(arrays['dates'], start, end)
+        index = pd.DatetimeIndex(np.asarray(arrays['dates'][lo:hi]), name='Date')
+        columns = {'close': np.asarray(arrays['close'][lo:hi]), **self._event_columns(arrays, lo, hi)}
+        return pd.DataFrame({f: columns[f] for f in FIELDS}, index=index)
+
+    def dates(self, ticker: str, start=None, end=None) -> np.ndarray:
+        """
+        只读取 [start, end) 区间内的交易日 (datetime64[ns] 数组)，不载入行情数值。
+        """
+        arrays = self._load_arrays(ticker)
+        if arrays is None:
+            return np.array([], dtype='datetime64[ns]')
+        lo, hi = _slice_bounds(arrays['dates'], start, end)
+        return np.asarray(arrays['dates'][lo:hi])
+
+    def load_matrix(self, tickers: list, start=None, end=None, fields=FIELDS) -> dict:
+        """
+        把多个标的的原始行情直接载入为对齐的宽表，不经过中间的 Series 字典。
+
+        :param tickers: 股票代码列表，未保存或区间内无数据的标的会被跳过
+        :param fields: 需要载入的字段，除 FIELDS 外还可以是 'factors' (正向累积调整因子 F，
+                       区间内调整后价格 = 原始收盘价 * F[-1] / F)
+        :return: {字段名: DataFrame(日期 x 股票代码)}，缺失的交易日为 NaN
+        """
+        def columns(arrays, lo, hi):
+            values = {'close': arrays['close'][lo:hi], 'factors': arrays['factors'][lo:hi]}
+            if set(fields) - {'close', 'factors'}:
+                values.update(self._event_columns(arrays, lo, hi))
+            return [values[field] for field in fields]
+
+        return dict(zip(fields, self._load_frames(tickers, start, end, columns, len(fields))))
+
+    def load_adjusted(self, tickers: list, start=None, end=None) -> pd.DataFrame:
+        """
+        载入多个标的在 [start, end) 区间内的调整后收盘价宽表，以各标的区间内最后一个交易日为基准，
+        与 calculate_adjusted_price_frame 处理 load_matrix 结果的方式相同，但只需读取收盘价和累积因子。
+
+        :param tickers: 股票代码列表，未保存或区间内无数据的标的会被跳过
+        :return: DataFrame(日期 x 股票代码)，缺失的交易日为 NaN
+        """
+        def adjusted(arrays, lo, hi):
+            factors = arrays['factors'][lo:hi]
+            return [arrays['close'][lo:hi] * (factors[-1] / factors)]
+
+        return self._load_frames(tickers, start, end, adjusted, 1)[0]
+
+    def _load_frames(self, tickers, start, end, columns, n_fields: int) -> list:
+        """
+        load_matrix / load_adjusted 的共同部分: 按各标的交易日的并集对齐，columns(arrays, lo, hi)
+        返回该标的在区间内各字段的数值。
+        """
+        slices = []
+        for ticker in tickers:
+            arrays = self._load_arrays(ticker)
+            if arrays is None:
+                continue
+            lo, hi = _slice_bounds(arrays['dates'], start, end)
+            if hi > lo:
+                slices.append((ticker, arrays, lo, hi))
+
+        if not slices:
+            return [pd.DataFrame() for _ in range(n_fields)]
+
+        dates = np.unique(np.concatenate([arrays['dates'][lo:hi] for _, arrays, lo, hi in slices]))
+        index = pd.DatetimeIndex(dates, name='Date')
+        tickers = [ticker for ticker, _, _, _ in slices]
+
+        matrices = [np.full((len(dates), len(slices)), np.nan) for _ in range(n_fields)]
+        for col, (_, arrays, lo, hi) in enumerate(slices):
+            rows = np.searchsorted(dates, arrays['dates'][lo:hi])
+            for matrix, values in zip(matrices, columns(arrays, lo, hi)):
+                matrix[rows, col] = values
+
+        return [pd.DataFrame(matrix, index=index, columns=tickers) for matrix in matrices]
+
+    def _ticker_dir(self, ticker: str) -> str:
+        return os.path.join(self.root, ticker)
+
+    def _read_meta(self, ticker: str):
+        """
+        :return: 标的的 meta.json 内容，尚未保存过该标的时返回 None
+        """
+        meta_path = os.path.join(self._ticker_dir(ticker), 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if self.source is not None and meta.get('source') != self.source:
+            raise ValueError(f"{ticker} 的行情存储 ({self._ticker_dir(ticker)}) 由数据源 '{meta.get('source')}' 写入，"
+                             f"与当前数据源 '{self.source}' 不一致，不能复用。")
+        return meta
+
+    def _load_arrays(self, ticker: str):
+        ticker_dir = self._ticker_dir(ticker)
+        meta = self._read_meta(ticker)
+        if meta is None:
+            return None
+        rows = meta['rows']
+
+        if not os.path.exists(os.path.join(ticker_dir, 'factors.npy')):
+            return self._load_legacy_arrays(ticker_dir, rows)
+        # 数组文件末尾可能有中途失败的写入留下的行，以 meta.json 中的行数为准
+        arrays = {name: np.load(os.path.join(ticker_dir, f'{name}.npy'), mmap_mode='r')[:rows] for name in ROW_ARRAYS}
+        arrays['events'] = np.load(os.path.join(ticker_dir, 'events.npy'))
+        return arrays
+
+    def _load_legacy_arrays(self, ticker_dir: str, rows: int) -> dict:
+        """
+        读取旧格式 (股息、拆分按行保存，没有累积因子) 的目录，在内存中转换，下次 update 时整体改写为新格式。
+        """
+        dense = {name: np.load(os.path.join(ticker_dir, f'{name}.npy'))[:rows] for name in ('dates',) + FIELDS}
+        return {
+            'dates': dense['dates'],
+            'close': dense['close'],
+            'factors': np.cumprod(event_factors(dense['close'], dense['dividends'], dense['splits'])),
+            'events': _sparse_events(dense['dates'], dense['dividends'], dense['splits']),
+            'legacy': True,
+        }
+
+    def _event_columns(self, arrays: dict, lo: int, hi: int) -> dict:
+        """
+        把稀疏事件展开为 [lo, hi) 行的股息和拆分数组，无事件的交易日为 0。
+        """
+        dates = arrays['dates'][lo:hi]
+        events = arrays['events']
+        columns = {'dividends': np.zeros(hi - lo), 'splits': np.zeros(hi - lo)}
+        events = events[(events['date'] >= dates[0]) & (events['date'] <= dates[-1])] if hi > lo else events[:0]
+        rows = np.searchsorted(dates, events['date'])
+        for field in columns:
+            columns[field][rows] = events[field]
+        return columns
+
+    def _save_arrays(self, ticker: str, dates, columns: dict, start, end, version: int = 1):
+        """
+        整体写入一个标的的全部数据，重新计算整段累积因子。
+        """
+        ticker_dir = self._ticker_dir(ticker)
+        os.makedirs(ticker_dir, exist_ok=True)
+        arrays = {
+            'dates': dates,
+            'close': columns['close'],
+            'factors': np.cumprod(event_factors(columns['close'], columns['dividends'], columns['splits'])),
+            'events': _sparse_events(dates, columns['dividends'], columns['splits']),
+        }
+        # 先写临时文件再替换，避免中途失败留下不一致的数据
+        for name, values in arrays.items():
+            tmp_path = os.path.join(ticker_dir, f'{name}.tmp.npy')
+            np.save(tmp_path, np.ascontiguousarray(values))
+            os.replace(tmp_path, os.path.join(ticker_dir, f'{name}.npy'))
+        self._write_meta(ticker, start, end, len(dates), version)
+        # 旧格式按行保存的股息、拆分数组已由 events.npy 取代
+        for field in ('dividends', 'splits'):
+            legacy_path = os.path.join(ticker_dir, f'{field}.npy')
+            if os.path.exists(legacy_path):
+                os.remove(legacy_path)
+
+    def _write_tail(self, ticker: str, existing: dict, k: int, new_dates, new_columns: dict, start, end, version: int):
+        """
+        保留前 k 行，用新数据替换之后的行: 只为新行计算事件因子，接在第 k-1 行的累积因子之后，
+        并原地写入各数组文件的末尾，耗时只与新行数有关，与已有历史的长度无关。
+        """
+        close = existing['close']
+        prev = k - 1
+        while prev >= 0 and not np.isfinite(close[prev]):
+            prev -= 1
+        prev_close = float(close[prev]) if prev >= 0 else np.nan
+        factors = float(existing['factors'][k - 1]) * np.cumprod(
+            event_factors(new_columns['close'], new_columns['dividends'], new_columns['splits'], prev_close)
+        )
+        events = existing['events']
+        events = np.concatenate([
+            events[events['date'] < existing['dates'][k]] if k < len(existing['dates']) else events,
+            _sparse_events(new_dates, new_columns['dividends'], new_columns['splits']),
+        ])
+        replaced = pd.Timestamp(existing['dates'][k]) if k < len(existing['dates']) else None
+        existing = close = None
+
+        if replaced is not None:
+            # 要改写已有的行: 先把有效行数和已覆盖区间退回到前 k 行，中途失败时存储仍是一致的，
+            # 下次刷新会重新下载被退回的部分
+            self._write_meta(ticker, start, replaced, k, version)
+        ticker_dir = self._ticker_dir(ticker)
+        for name, values in (('dates', new_dates), ('close', new_columns['close']), ('factors', factors)):
+            _write_rows(os.path.join(ticker_dir, f'{name}.npy'), k, values)
+        tmp_path = os.path.join(ticker_dir, 'events.tmp.npy')
+        np.save(tmp_path, events)
+        os.replace(tmp_path, os.path.join(ticker_dir, 'events.npy'))
+        self._write_meta(ticker, start, end, k + len(new_dates), version)
+
+    def _write_meta(self, ticker: str, start, end, rows: int, version: int):
+        meta = {
+            'start': pd.Timestamp(start).strftime('%Y-%m-%d'),
+            'end': pd.Timestamp(end).strftime('%Y-%m-%d'),
+            'rows': int(rows),
+            'version': int(version),
+        }
+        if self.source is not None:
+            meta['source'] = self.source
+        ticker_dir = self._ticker_dir(ticker)
+        tmp_meta = os.path.join(ticker_dir, 'meta.tmp.json')
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta, os.path.join(ticker_dir, 'meta.json'))
+
+
+def _sparse_events(dates, dividends, splits) -> np.ndarray:
+    """只保留股息或拆分不为 0 的交易日。"""
+    dividends, splits = np.asarray(dividends, dtype=float), np.asarray(splits, dtype=float)
+    mask = (dividends != 0) | (splits != 0)
+    events = np.empty(int(mask.sum()), dtype=EVENT_DTYPE)
+    events['date'] = np.asarray(dates)[mask]
+    events['dividends'] = dividends[mask]
+    events['splits'] = splits[mask]
+    return events
+
+def _write_rows(path: str, row: int, values: np.ndarray):
+    """
+    从第 row 行开始原地写入一维 .npy 数组并更新文件头中的长度，之前的行不读取也不改写。
+    np.save 在文件头中为长度预留了空间 (numpy.lib.format.GROWTH_AXIS_MAX_DIGITS)，
+    文件头大小不变时可以直接改写；否则 (例如更早版本的 numpy 写入的文件) 退回到整体重写。
+    """
+    with open(path, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        read_header = {(1, 0): np.lib.format.read_array_header_1_0, (2, 0): np.lib.format.read_array_header_2_0}
+        if version in read_header:
+            _, fortran_order, dtype = read_header[version](f)
+            header_size = f.tell()
+            values = np.ascontiguousarray(values, dtype=dtype)
+            header = io.BytesIO()
+            write_header = np.lib.format.write_array_header_1_0 if version == (1, 0) else \
+                np.lib.format.write_array_header_2_0
+            write_header(header, {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': fortran_order,
+                                  'shape': (row + len(values),)})
+            if header.tell() == header_size:
+                # 先写数据再改长度，文件末尾多出的字节不影响读取
+                f.seek(header_size + row * dtype.itemsize)
+                f.write(values.tobytes())
+                f.flush()
+                f.seek(0)
+                f.write(header.getvalue())
+                return
+
+    head = np.load(path, mmap_mode='r')[:row]
+    combined = np.concatenate([head, np.asarray(values, dtype=head.dtype)])
+    head = None
+    tmp_path = path[:-len('.npy')] + '.tmp.npy'
+    np.save(tmp_path, combined)
+    os.replace(tmp_path, path)
+
+def _naive_dates(index: pd.Index) -> np.ndarray:
+    """把 (可能带时区的) 日期索引转换为不带时区的 datetime64[ns] 数组。"""
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.to_numpy(dtype='datetime64[ns]')
+
+def _slice_bounds(dates: np.ndarray, start, end):
+    """返回 [start, end) 在有序日期数组中的切片位置。"""
+    lo = 0 if start is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start), 'ns'), side='left')
+    hi = len(dates) if end is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end), 'ns'), side='left')
+    return lo, hi
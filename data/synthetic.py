@@ -0,0 +1,83 @@
+import zlib
+import numpy as np
+import pandas as pd
+from data.store import HISTORY_COLUMNS
+
+# 所有模拟行情都从同一天开始生成，不同区间的请求互相一致
+ORIGIN = '1990-01-01'
+# 大约每季度派息一次，股息率约 0.4%
+DIVIDEND_PERIOD = 63
+DIVIDEND_YIELD = 0.004
+# 每隔约 5 年有一次拆分机会
+SPLIT_PERIOD = 1260
+SPLIT_PROBABILITY = 0.3
+SPLIT_RATIOS = (2.0, 3.0)
+
+def business_days(start, end) -> pd.DatetimeIndex:
+    """[start, end) 之间的工作日 (周一至周五)。"""
+    days = np.arange(pd.Timestamp(start).strftime('%Y-%m-%d'), pd.Timestamp(end).strftime('%Y-%m-%d'), dtype='datetime64[D]')
+    return pd.DatetimeIndex(days[np.is_busday(days)].astype('datetime64[ns]'), name='Date')
+
+def synthetic_history(ticker: str, start, end, seed: int = 0) -> pd.DataFrame:
+    """
+    生成单个标的确定性的原始 (未调整) 行情，包含分红和拆分，无需网络。
+
+    价格是对数正态随机游走；每季度派息一次；约每 5 年以一定概率按 2:1 或 3:1 拆分，
+    拆分日起原始价格相应下降。随机数只由 (seed, 股票代码) 决定，并且从固定的起点
+    生成再切片，所以相同标的在任意区间上的数据都互相一致。
+
+    :param ticker: 股票代码
+    :param start: 开始日期 (包含)
+    :param end: 结束日期 (不包含)
+    :param seed: 随机种子
+    :return: 以日期为索引、包含 Close / Dividends / Stock Splits 列的 DataFrame
+    """
+    index = business_days(ORIGIN, end)
+    n = len(index)
+    ticker_key = zlib.crc32(ticker.encode())
+
+    rng = np.random.default_rng([seed, ticker_key])
+    path = 50.0 * np.exp(np.cumsum(rng.normal(0.0003, 0.012, n)))
+
+    # 拆分使用独立的随机数流，拆分日之后的原始价格除以累计拆分比例
+    split_rng = np.random.default_rng([seed, ticker_key, 1])
+    candidates = np.arange(SPLIT_PERIOD, n, SPLIT_PERIOD)
+    draws = split_rng.random(len(candidates))
+    ratios = np.asarray(SPLIT_RATIOS)[split_rng.integers(0, len(SPLIT_RATIOS), len(candidates))]
+    splits = np.zeros(n)
+    splits[candidates[draws < SPLIT_PROBABILITY]] = ratios[draws < SPLIT_PROBABILITY]
+    closes = path / np.cumprod(np.where(splits > 0, splits, 1.0))
+
+    dividends = np.zeros(n)
+    dividends[DIVIDEND_PERIOD::DIVIDEND_PERIOD] = np.round(
+        closes[DIVIDEND_PERIOD - 1:-1:DIVIDEND_PERIOD] * DIVIDEND_YIELD, 4
+    )
+
+    history = pd.DataFrame(
+        {HISTORY_COLUMNS['close']: closes, HISTORY_COLUMNS['dividends']: dividends, HISTORY_COLUMNS['splits']: splits},
+        index=index
+    )
+    return history[history.index >= pd.Timestamp(start)]
+
+def synthetic_market(n_tickers: int, years: int, seed: int = 0, start: str = ORIGIN) -> dict:
+    """
+    生成 N 个标的、M 年的模拟市场，格式与 PriceStore.load_matrix 的结果相同，
+    可以直接传给 calculate_adjusted_price_frame。
+
+    :param n_tickers: 标的个数，代码为 T0000, T0001, ...
+    :param years: 年数 (按每年 52 周的工作日计算)
+    :return: {'close': DataFrame, 'dividends': DataFrame, 'splits': DataFrame}，均为 (日期 x 标的)
+    """
+    start = pd.Timestamp(start)
+    end = start + pd.Timedelta(weeks=52 * years)
+    tickers = [f'T{i:04d}' for i in range(n_tickers)]
+    histories = [synthetic_history(ticker, start, end, seed=seed) for ticker in tickers]
+
+    index = histories[0].index if histories else business_days(start, end)
+    return {
+        field: pd.DataFrame(
+            np.column_stack([h[column].to_numpy() for h in histories]) if histories else np.empty((len(index), 0)),
+            index=index, columns=tickers,
+        )
+        for field, column in HISTORY_COLUMNS.items()
+    }
@@ -1,66 +1,537 @@
-import pandas as pd
-import config
-from data import loader
-from backtesting import engine
-from reporting import generator
-from utils import metrics
-from strategies import create_strategy
-
-def main():
+import argparse
+import os
+import pickle
+from datetime import datetime
+from utils import profiling
+from utils.config_loader import apply_override, load_config, parse_override
+
+# pandas、数据源、回测引擎和绘图库都在用到的阶段才导入：
+# --help 和 fetch 不需要导入绘图库，--no-report 的运行完全不导入 plotly / jinja2
+
+COMMANDS = ('run', 'batch', 'sweep', 'scan', 'fetch', 'report', 'serve')
+
+def required_tickers(config, include_sweep=False, portfolios=None) -> list:
+    """
+    回测需要加载的全部标的: 组合、基准和择时信号所用的标的。
+
+    :param include_sweep: 是否包含参数扫描 (SWEEP_GRID) 中用到的信号标的
+    :param portfolios: 批量回测的组合 ({名称: 权重} 或权重字典的列表)，给出时代替 config.PORTFOLIO
+    """
+    if portfolios is not None:
+        from backtesting.batch import portfolio_tickers
+        tickers = set(portfolio_tickers(portfolios)) | set(config.BENCHMARKS)
+    else:
+        tickers = set(config.PORTFOLIO.keys()) | set(config.BENCHMARKS)
+    strategy_configs = [config.STRATEGY_CONFIG]
+    if include_sweep and getattr(config, 'SWEEP_GRID', None):
+        from backtesting.sweep import expand_grid
+        strategy_configs += expand_grid(config.SWEEP_GRID)
+    from strategies import signal_tickers
+    tickers |= {t for c in strategy_configs for t in signal_tickers(c)}
+    return sorted(tickers)
+
+def load_prices(config, tickers):
+    """
+    按配置的数据源加载调整后价格。启用 INTRADAY_PRICES 时改为由分钟 K 线计算的每日成交价，格式相同。
+    """
+    from data import loader
+    from data.providers import create_provider
+
+    intraday = getattr(config, 'INTRADAY_PRICES', None)
+    if intraday and intraday.get('enabled'):
+        with profiling.span('load_data', tickers=len(tickers), intraday=True):
+            matrix = loader.get_intraday_matrix(
+                tickers, config.START_DATE, config.END_DATE, intraday,
+                provider=create_provider(getattr(config, 'DATA_PROVIDER', None)),
+                **getattr(config, 'DATA_FETCH', {})
+            )
+            return matrix.frame()
+
+    with profiling.span('load_data', tickers=len(tickers)):
+        return loader.get_data(
+            tickers, config.START_DATE, config.END_DATE,
+            provider=create_provider(getattr(config, 'DATA_PROVIDER', None)),
+            **getattr(config, 'DATA_FETCH', {})
+        )
+
+def supports_strategy(strategy, purpose) -> bool:
+    """
+    不模拟账户状态的流程遇到依赖账户状态的策略时打印原因并返回 False。
+    """
+    from strategies import require_stateless
+
+    try:
+        require_stateless(strategy, purpose)
+    except ValueError as e:
+        print(f"{e} 已跳过{purpose}。")
+        return False
+    return True
+
+
+def main(config=None, report=True, save_path=None):
+    """
+    运行完整的回测流程: 加载数据、生成信号、回测、计算指标、可选的结果分布分析和报告。
+
+    :param config: 配置对象，默认读取项目根目录下的 config.py
+    :param report: 为 False 时不生成图表和 HTML 报告，只在终端输出结果 (不导入绘图库)
+    :param save_path: 把回测结果保存到该文件，之后可以用 `report` 子命令生成报告
+    :return: 回测结果 (与 save_run 保存的内容相同)，失败时为 None
+    """
+    from backtesting import engine, incremental, montecarlo, rolling
+    from backtesting.result_cache import create_result_cache
+    from data import loader
+    from data.providers import create_provider
+    from strategies import create_strategy
+    from utils import metrics
+
+    config = config or load_config()
     print("开始执行ETF策略回测...")
-    
-    all_tickers = sorted(list(set(list(config.PORTFOLIO.keys()) + config.BENCHMARKS)))
-    if config.STRATEGY_CONFIG['type'] == 'sma_crossover':
-        all_tickers = sorted(list(set(all_tickers + [config.STRATEGY_CONFIG['ticker_for_signal']])))
-    
+
+    all_tickers = required_tickers(config)
+    rolling_conf = getattr(config, 'ROLLING_ANALYSIS', None) or {}
+    simulation_conf = getattr(config, 'MONTE_CARLO', None) or {}
+    checkpoint_path = getattr(config, 'CHECKPOINT_PATH', None)
+
+    # 相同配置 + 相同价格数据 (包括数据源) 的回测结果直接从缓存读取；增量回测有检查点副作用，不使用缓存
+    provider = create_provider(getattr(config, 'DATA_PROVIDER', None))
+    cache = None if checkpoint_path else create_result_cache(getattr(config, 'RESULT_CACHE', None))
+    cached = None
+    if cache is not None:
+        data_fingerprint = loader.data_fingerprint(all_tickers, config.START_DATE, config.END_DATE,
+                                                   intraday=getattr(config, 'INTRADAY_PRICES', None), provider=provider)
+        if data_fingerprint is not None:
+            cached = cache.get(cache.key(config, data_fingerprint))
+        if cached is not None:
+            print("命中结果缓存，跳过回测。")
+
+    # 只需要输出结果时，命中缓存后完全不加载价格
+    needs_prices = (cached is None or report or save_path
+                    or rolling_conf.get('enabled') or simulation_conf.get('enabled'))
+    prices_df = None
+    if needs_prices:
+        try:
+            # 不再需要接收 dividends_data
+            prices_df = load_prices(config, all_tickers)
+        except Exception as e:
+            print(f"数据加载失败: {e}")
+            return None
+
+    # 命中缓存时策略仍用于滚动分析的投入金额等
+    strategy = create_strategy(config.STRATEGY_CONFIG)
+
+    if cached is not None:
+        results_df, metrics_summary = cached['results_df'], cached['metrics_summary']
+    else:
+        print(f"正在使用策略 '{config.STRATEGY_CONFIG['type']}' 生成交易信号...")
+        if checkpoint_path:
+            # 从检查点增量回测，只计算上次之后的新交易日
+            with profiling.span('backtest', incremental=True):
+                results_df = incremental.resume_backtest(config, prices_df, strategy, checkpoint_path)
+        else:
+            # 不再需要传递 dividends_data
+            with profiling.span('backtest'):
+                results_df = engine.backtest_strategy(config, prices_df, strategy)
+
+        if results_df.empty:
+            print("回测没有产生任何结果，请检查日期范围或输入。")
+            return None
+
+        with profiling.span('metrics'):
+            metrics_summary = metrics.build_metrics_summary(
+                results_df, config.BENCHMARKS, risk_free_rate=getattr(config, 'RISK_FREE_RATE', 0.0)
+            )
+
+        if cache is not None:
+            # 加载数据时可能刚刚下载过，重新计算指纹；数据仍不完整 (例如区间包含今天) 时不缓存
+            data_fingerprint = loader.data_fingerprint(all_tickers, config.START_DATE, config.END_DATE,
+                                                        intraday=getattr(config, 'INTRADAY_PRICES', None),
+                                                        provider=provider)
+            if data_fingerprint is not None:
+                cache.put(cache.key(config, data_fingerprint),
+                          {'results_df': results_df, 'metrics_summary': metrics_summary})
+
+    rolling_results = None
+    if rolling_conf.get('enabled') and supports_strategy(strategy, '滚动起始日分析'):
+        print(f"正在进行滚动起始日分析 (期限 {rolling_conf.get('horizon_years', 5)} 年)...")
+        with profiling.span('rolling_analysis'):
+            rolling_results = rolling.run_rolling_analysis(
+                config, prices_df, None,
+                amounts=strategy.generate_amounts(prices_df, config.INVESTMENT_AMOUNT),
+                horizon_years=rolling_conf.get('horizon_years', 5),
+                step=rolling_conf.get('step', 1),
+            )
+        if rolling_results.empty:
+            print("价格数据不足一个完整的投资期限，跳过滚动分析。")
+            rolling_results = None
+
+    simulation_results = None
+    if simulation_conf.get('enabled') and supports_strategy(strategy, '蒙特卡洛模拟'):
+        with profiling.span('monte_carlo'):
+            simulation_results = montecarlo.run_simulation(
+                config, prices_df,
+                n_paths=simulation_conf.get('n_paths', 1000),
+                block_size=simulation_conf.get('block_size', 20),
+                seed=simulation_conf.get('seed'),
+                chunk_size=simulation_conf.get('chunk_size', 100),
+                max_workers=simulation_conf.get('max_workers'),
+            )
+
+    run_results = {
+        'config': config,
+        'results_df': results_df,
+        'prices_df': prices_df,
+        'metrics_summary': metrics_summary,
+        'rolling_results': rolling_results,
+        'simulation_results': simulation_results,
+    }
+    if save_path:
+        save_run(save_path, run_results)
+        print(f"回测结果已保存到: {save_path}")
+
+    if report:
+        with profiling.span('report'):
+            render_report(run_results)
+    else:
+        print_summary(run_results)
+
+    print("\n回测流程全部完成。")
+    return run_results
+
+
+def render_report(run_results, output_dir=None):
+    """用回测结果生成终端摘要、CSV 和 HTML 报告。"""
+    from reporting import generator
+
+    return generator.generate_report(
+        run_results['results_df'], run_results['prices_df'], run_results['metrics_summary'], run_results['config'],
+        rolling_results=run_results['rolling_results'], simulation_results=run_results['simulation_results'],
+        output_dir=output_dir,
+    )
+
+
+def print_summary(run_results):
+    """不生成报告时只在终端输出指标表和结果分布的分位数。"""
+    from reporting.console import print_metrics_summary, print_outcome_summary
+    from utils.metrics import outcome_percentiles
+
+    config = run_results['config']
+    print_metrics_summary(run_results['metrics_summary'])
+    sections = [
+        ('滚动起始日分析', run_results['rolling_results'], getattr(config, 'ROLLING_ANALYSIS', None)),
+        ('蒙特卡洛模拟', run_results['simulation_results'], getattr(config, 'MONTE_CARLO', None)),
+    ]
+    for title, results, section_conf in sections:
+        if results is not None:
+            percentiles = (section_conf or {}).get('percentiles', [5, 25, 50, 75, 95])
+            print_outcome_summary(title, outcome_percentiles(results, percentiles))
+
+
+def save_run(path, run_results):
+    """把一次回测的结果 (含配置) 保存到文件，写入过程中断不会留下损坏的文件。"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(run_results, f)
+    os.replace(tmp_path, path)
+
+
+def load_run(path):
+    """读取 save_run 保存的回测结果。"""
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def batch(config):
+    """
+    批量回测 config.BATCH_PORTFOLIOS 中的所有组合: 价格只加载一次 (所有组合标的的并集)，
+    信号只生成一次，基准曲线只计算一次，输出一张合并的每日结果表和指标表。
+    """
+    from backtesting.batch import build_batch_metrics, normalize_portfolios, run_batch
+    from reporting.console import print_metrics_table
+    from strategies import create_strategy
+
+    portfolios = normalize_portfolios(getattr(config, 'BATCH_PORTFOLIOS', None) or [config.PORTFOLIO])
+    strategy = create_strategy(config.STRATEGY_CONFIG)
+    if not supports_strategy(strategy, '批量回测'):
+        return None
+    print(f"开始执行批量回测 ({len(portfolios)} 个组合)...")
     try:
-        # 不再需要接收 dividends_data
-        prices_df = loader.get_data(
-            all_tickers, config.START_DATE, config.END_DATE
+        prices_df = load_prices(config, required_tickers(config, portfolios=portfolios))
+    except Exception as e:
+        print(f"数据加载失败: {e}")
+        return None
+
+    with profiling.span('generate_signals'):
+        amounts = strategy.generate_amounts(prices_df, config.INVESTMENT_AMOUNT)
+    # 所有组合共用的单位持股数组假定每次投入相同的金额
+    if not amounts.isin([0.0, float(config.INVESTMENT_AMOUNT)]).all():
+        print("批量回测按固定的 INVESTMENT_AMOUNT 定投，不支持按日调整投入金额的策略 (例如带 amount 的表达式策略)，"
+              "请使用 run 逐个回测。")
+        return None
+    signals = (amounts > 0).astype(int)
+    with profiling.span('backtest', portfolios=len(portfolios)):
+        results_df = run_batch(config, prices_df, signals, portfolios)
+    with profiling.span('metrics'):
+        metrics_table = build_batch_metrics(
+            results_df, portfolios, config.BENCHMARKS, risk_free_rate=getattr(config, 'RISK_FREE_RATE', 0.0)
         )
+
+    print_metrics_table(metrics_table, title="批量回测结果")
+    output_dir = os.path.join("results", f"batch_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}")
+    os.makedirs(output_dir, exist_ok=True)
+    results_df.to_csv(os.path.join(output_dir, 'daily_results.csv'))
+    metrics_table.to_csv(os.path.join(output_dir, 'metrics.csv'), index_label='账户')
+    print(f"每日数据和指标已保存到: {output_dir}")
+    return results_df, metrics_table
+
+
+def universe_tickers(config) -> list:
+    """
+    标的筛选的股票池: UNIVERSE_SCAN 中的 tickers 列表，加上 file 指定的文件 (每行一个代码，# 开头为注释)。
+    """
+    scan_conf = getattr(config, 'UNIVERSE_SCAN', None) or {}
+    tickers = list(scan_conf.get('tickers') or [])
+    if scan_conf.get('file'):
+        with open(scan_conf['file'], 'r', encoding='utf-8') as f:
+            tickers += [line.split('#')[0].strip() for line in f]
+    return list(dict.fromkeys(t for t in tickers if t))
+
+
+def scan(config, tickers=None, top=20):
+    """
+    大规模标的筛选: 对股票池中的每个标的单独回测当前策略 (规则与基准账户相同)，按指标排序输出。
+    价格保存为磁盘上的内存映射矩阵并按列块计算，数千个标的的内存占用也是有界的。
+
+    :param tickers: 股票池，默认见 universe_tickers
+    :param top: 终端显示的行数
+    """
+    from backtesting.scan import scan_universe
+    from data import loader
+    from data.providers import create_provider
+    from reporting.console import print_metrics_table
+    from strategies import create_strategy, signal_tickers
+
+    scan_conf = getattr(config, 'UNIVERSE_SCAN', None) or {}
+    tickers = list(tickers or universe_tickers(config))
+    if not tickers:
+        print("股票池为空，请在 UNIVERSE_SCAN 中配置 tickers 或 file，或在命令行中给出标的。")
+        return None
+    if not supports_strategy(create_strategy(config.STRATEGY_CONFIG), '标的筛选'):
+        return None
+    tickers += [t for t in signal_tickers(config.STRATEGY_CONFIG) if t not in tickers]
+
+    print(f"开始执行标的筛选 ({len(tickers)} 个标的)...")
+    try:
+        intraday = getattr(config, 'INTRADAY_PRICES', None)
+        with profiling.span('load_data', tickers=len(tickers)):
+            if intraday and intraday.get('enabled'):
+                # 日内成交价矩阵与日收盘价矩阵的格式相同
+                matrix = loader.get_intraday_matrix(
+                    tickers, config.START_DATE, config.END_DATE, intraday,
+                    provider=create_provider(getattr(config, 'DATA_PROVIDER', None)),
+                    **getattr(config, 'DATA_FETCH', {})
+                )
+            else:
+                matrix = loader.get_price_matrix(
+                    tickers, config.START_DATE, config.END_DATE,
+                    path=scan_conf.get('directory', loader.MATRIX_DIR),
+                    dtype=scan_conf.get('dtype', 'float32'),
+                    chunk_size=scan_conf.get('chunk_size', 256),
+                    provider=create_provider(getattr(config, 'DATA_PROVIDER', None)),
+                    **getattr(config, 'DATA_FETCH', {})
+                )
     except Exception as e:
         print(f"数据加载失败: {e}")
-        return
+        return None
 
-    print(f"正在使用策略 '{config.STRATEGY_CONFIG['type']}' 生成交易信号...")
-    strategy = create_strategy(config.STRATEGY_CONFIG)
-    signals = strategy.generate_signals(prices_df)
-
-    # 不再需要传递 dividends_data
-    results_df = engine.run_backtest(config, prices_df, signals)
-    
-    if results_df.empty:
-        print("回测没有产生任何结果，请检查日期范围或输入。")
-        return
-
-    metrics_summary = {}
-    total_years = (results_df.index.max() - results_df.index.min()).days / 365.25
-
-    portfolio_final_value = results_df['Portfolio_Value'].iloc[-1]
-    total_invested = results_df['Total_Invested'].iloc[-1] if not results_df['Total_Invested'].empty else 0
-    metrics_summary['Portfolio'] = {
-        '最终市值': portfolio_final_value,
-        '总投入本金': total_invested,
-        '总收益率': (portfolio_final_value - total_invested) / total_invested if total_invested > 0 else 0,
-        '年化收益率(CAGR)': metrics.calculate_cagr(portfolio_final_value, total_invested, total_years),
-        '最大回撤': metrics.calculate_max_drawdown(results_df['Portfolio_Value'])
-    }
+    with profiling.span('backtest', tickers=len(matrix.columns)):
+        table = scan_universe(
+            config, matrix,
+            chunk_size=scan_conf.get('chunk_size', 256),
+            max_workers=scan_conf.get('max_workers'),
+            rank_by=scan_conf.get('rank_by', '年化收益率(CAGR)'),
+        )
 
-    for bm in config.BENCHMARKS:
-        col_name = f'{bm}_Value'
-        bm_final_value = results_df[col_name].iloc[-1]
-        metrics_summary[bm] = {
-            '最终市值': bm_final_value,
-            '总投入本金': total_invested,
-            '总收益率': (bm_final_value - total_invested) / total_invested if total_invested > 0 else 0,
-            '年化收益率(CAGR)': metrics.calculate_cagr(bm_final_value, total_invested, total_years),
-            '最大回撤': metrics.calculate_max_drawdown(results_df[col_name])
-        }
-
-    generator.generate_report(results_df, prices_df, metrics_summary, config)
-    
-    print("\n回测流程全部完成。")
+    print_metrics_table(table.drop(columns='排名').head(top), title=f"标的筛选结果 (前 {top} 名)")
+    output_dir = "results"
+    os.makedirs(output_dir, exist_ok=True)
+    csv_path = os.path.join(output_dir, f"scan_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.csv")
+    table.to_csv(csv_path)
+    print(f"完整结果已保存到: {csv_path}")
+    return table
+
+
+def fetch(config, tickers=None):
+    """
+    只下载/更新行情缓存，不运行回测。
+
+    :param tickers: 要获取的标的，默认为回测和参数扫描用到的全部标的
+    """
+    tickers = sorted(tickers or required_tickers(config, include_sweep=True))
+    print(f"正在获取 {len(tickers)} 个标的的行情: {', '.join(tickers)}")
+    try:
+        prices_df = load_prices(config, tickers)
+    except Exception as e:
+        print(f"数据加载失败: {e}")
+        return None
+    print(f"行情已缓存: {prices_df.index[0]:%Y-%m-%d} 至 {prices_df.index[-1]:%Y-%m-%d}，"
+          f"共 {len(prices_df)} 个交易日 x {prices_df.shape[1]} 个标的。")
+    return prices_df
+
+
+def report(run_path, overrides=None, output_dir=None):
+    """
+    用 `run --save` 保存的回测结果生成报告，不重新加载数据或回测。
+
+    :param overrides: 覆盖保存时的配置 (例如 REPORT_CONFIG.plotlyjs)
+    """
+    run_results = load_run(run_path)
+    settings = vars(run_results['config'])
+    for key, value in (overrides or {}).items():
+        apply_override(settings, key, value)
+    with profiling.span('report'):
+        return render_report(run_results, output_dir=output_dir)
+
+
+def serve(config, host='127.0.0.1', port=8765, max_workers=None):
+    """
+    启动常驻的本地回测服务 (见 service/server.py)，按 Ctrl+C 停止。
+    """
+    import asyncio
+    from service.server import serve as serve_async
+
+    try:
+        asyncio.run(serve_async(config, host=host, port=port, max_workers=max_workers))
+    except KeyboardInterrupt:
+        print("\n回测服务已停止。")
+
+
+def profiled_main(profile_path=None, cprofile_path=None, track_memory=False, func=None):
+    """
+    在性能分析模式下运行 main (或 func)：记录各阶段耗时、计数器和内存高水位并写出 JSON，
+    可选同时用 cProfile 记录函数级的调用统计 (可用 snakeviz / pstats 查看)。
+
+    :param profile_path: JSON 输出路径，默认为 results/profile_{时间}.json
+    :param cprofile_path: cProfile 统计的输出路径，为 None 时不启用 cProfile
+    :param track_memory: 是否用 tracemalloc 记录每个阶段的 Python 内存峰值
+    :param func: 要分析的无参数函数，默认为 main
+    """
+    import cProfile
+
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    profile_path = profile_path or os.path.join("results", f"profile_{timestamp}.json")
+    profiler = profiling.enable(track_memory=track_memory)
+    function_profiler = cProfile.Profile() if cprofile_path else None
+    try:
+        if function_profiler:
+            function_profiler.enable()
+        with profiling.span('main'):
+            (func or main)()
+    finally:
+        if function_profiler:
+            function_profiler.disable()
+            function_profiler.dump_stats(cprofile_path)
+            print(f"cProfile 统计已保存到: {cprofile_path}")
+        profiler.write_json(profile_path)
+        profiling.disable()
+        print(f"性能分析数据已保存到: {profile_path}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="ETF 定投策略回测。不指定子命令时等同于 run。",
+        epilog="性能分析选项需写在子命令之前，例如: python3 main.py --profile run --no-report",
+    )
+    parser.add_argument('--profile', nargs='?', const='', default=None, metavar='PATH',
+                        help="记录各阶段耗时并写出 JSON (默认 results/profile_{时间}.json)")
+    parser.add_argument('--profile-memory', action='store_true',
+                        help="性能分析时用 tracemalloc 记录每个阶段的内存峰值 (较慢)")
+    parser.add_argument('--cprofile', metavar='PATH', help="同时写出 cProfile 统计到指定文件")
+    # 不写子命令时使用 run 的默认参数
+    parser.set_defaults(command='run', config=None, overrides=[], start=None, end=None, provider=None,
+                        engine=None, no_report=False, save=None)
+
+    config_options = argparse.ArgumentParser(add_help=False)
+    config_options.add_argument('--config', metavar='PATH', help="配置文件 (.py 或 .json)，默认为 config.py")
+    config_options.add_argument('--set', dest='overrides', action='append', default=[], metavar='KEY=VALUE',
+                                help="覆盖配置项，可重复，例如 --set MONTE_CARLO.enabled=true")
+    config_options.add_argument('--start', help="开始日期 (START_DATE)")
+    config_options.add_argument('--end', help="结束日期 (END_DATE)")
+    config_options.add_argument('--provider', choices=['yfinance', 'local', 'fake'], help="数据源类型 (DATA_PROVIDER.type)")
+    config_options.add_argument('--engine', choices=['loop', 'vectorized'], help="回测引擎模式 (ENGINE_MODE)")
+
+    subparsers = parser.add_subparsers(dest='command', metavar='{' + ','.join(COMMANDS) + '}')
+    run_parser = subparsers.add_parser('run', parents=[config_options], help="运行回测并生成报告")
+    run_parser.add_argument('--no-report', action='store_true', help="不生成图表和 HTML 报告，只在终端输出结果")
+    run_parser.add_argument('--save', nargs='?', const='', default=None, metavar='PATH',
+                            help="保存回测结果供 report 子命令使用 (默认 results/run_{时间}.pkl)")
+    subparsers.add_parser('batch', parents=[config_options], help="批量回测多个组合 (BATCH_PORTFOLIOS)")
+    subparsers.add_parser('sweep', parents=[config_options], help="策略参数扫描 (SWEEP_GRID)")
+    scan_parser = subparsers.add_parser('scan', parents=[config_options],
+                                        help="大规模标的筛选 (UNIVERSE_SCAN)，价格矩阵以内存映射方式按列块计算")
+    scan_parser.add_argument('tickers', nargs='*', help="股票池，默认读取 UNIVERSE_SCAN")
+    scan_parser.add_argument('--top', type=int, default=20, help="终端显示的行数")
+    fetch_parser = subparsers.add_parser('fetch', parents=[config_options], help="只下载/更新行情缓存")
+    fetch_parser.add_argument('tickers', nargs='*', help="标的代码，默认为回测和参数扫描用到的全部标的")
+    serve_parser = subparsers.add_parser('serve', parents=[config_options], help="启动本地回测服务 (HTTP + JSON)")
+    serve_parser.add_argument('--host', default='127.0.0.1', help="监听地址 (默认只接受本机连接)")
+    serve_parser.add_argument('--port', type=int, default=8765)
+    serve_parser.add_argument('--workers', type=int, help="工作进程数，默认等于 CPU 核数")
+    report_parser = subparsers.add_parser('report', help="用 run --save 保存的结果生成报告")
+    report_parser.add_argument('run_path', help="run --save 保存的文件")
+    report_parser.add_argument('--set', dest='overrides', action='append', default=[], metavar='KEY=VALUE',
+                               help="覆盖保存时的配置项，例如 --set REPORT_CONFIG.plotlyjs=inline")
+    report_parser.add_argument('--output-dir', help="报告输出目录")
+    return parser
+
+
+def config_from_args(args):
+    """由 --config / --set 和快捷选项得到配置对象，快捷选项优先。"""
+    overrides = dict(parse_override(text) for text in args.overrides)
+    shortcuts = {'START_DATE': args.start, 'END_DATE': args.end, 'DATA_PROVIDER.type': args.provider,
+                 'ENGINE_MODE': args.engine}
+    overrides.update({key: value for key, value in shortcuts.items() if value is not None})
+    return load_config(args.config, overrides)
+
+
+def run_command(args):
+    if args.command == 'report':
+        overrides = dict(parse_override(text) for text in args.overrides)
+        return lambda: report(args.run_path, overrides, args.output_dir)
+
+    config = config_from_args(args)
+    if args.command == 'sweep':
+        import sweep
+        return lambda: sweep.sweep(config)
+    if args.command == 'batch':
+        return lambda: batch(config)
+    if args.command == 'scan':
+        return lambda: scan(config, args.tickers, args.top)
+    if args.command == 'fetch':
+        return lambda: fetch(config, args.tickers)
+    if args.command == 'serve':
+        return lambda: serve(config, args.host, args.port, args.workers)
+
+    save_path = args.save
+    if save_path == '':
+        save_path = os.path.join("results", f"run_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.pkl")
+    return lambda: main(config, report=not args.no_report, save_path=save_path)
+
+
+def cli(argv=None):
+    """
+    命令行入口。
+    :param argv: 命令行参数，默认为 sys.argv[1:]
+    """
+    args = build_parser().parse_args(argv)
+    command = run_command(args)
+    if args.profile is not None or args.cprofile:
+        profiled_main(args.profile or None, args.cprofile, args.profile_memory, func=command)
+    else:
+        command()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    cli()
@@ -0,0 +1,45 @@
+from tabulate import tabulate
+from utils.metrics import METRIC_ORDER, OUTCOME_METRICS, format_metric
+
+# 终端输出只依赖 tabulate，不生成图表的运行 (--no-report) 不需要导入 plotly / jinja2
+
+def print_metrics_summary(metrics_summary):
+    """在终端打印各账户的回测指标表。"""
+    headers = ["指标"] + list(metrics_summary.keys())
+    table = []
+    for metric_name in METRIC_ORDER:
+        row = [metric_name]
+        for name in headers[1:]:
+            row.append(format_metric(metric_name, metrics_summary[name][metric_name]))
+        table.append(row)
+    
+    print("\n" + "="*20 + " 回测结果摘要 " + "="*20)
+    print(tabulate(table, headers=headers, tablefmt="grid"))
+    print("="*54)
+
+
+def outcome_table_rows(table, metric_name):
+    return [[label] + [format_metric(metric_name, float(v)) for v in row] for label, row in zip(table.index, table.to_numpy())]
+
+
+def print_outcome_summary(title, tables):
+    """在终端打印结果分布 (滚动分析、蒙特卡洛模拟) 的分位数表。"""
+    print("\n" + "="*20 + f" {title} (分位数) " + "="*20)
+    for metric_name in OUTCOME_METRICS:
+        table = tables[metric_name]
+        print(f"\n{metric_name}:")
+        print(tabulate(outcome_table_rows(table, metric_name), headers=["分位数"] + list(table.columns), tablefmt="grid"))
+
+
+def print_metrics_table(table, title="回测结果摘要"):
+    """
+    在终端打印 (账户 x 指标) 的指标表，每个账户一行，适合账户较多的批量回测。
+
+    :param table: metrics.calculate_metrics_table 的结果
+    """
+    rows = [
+        [name] + [format_metric(metric_name, table.at[name, metric_name]) for metric_name in METRIC_ORDER]
+        for name in table.index
+    ]
+    print("\n" + "="*20 + f" {title} " + "="*20)
+    print(tabulate(rows, headers=["账户"] + list(METRIC_ORDER), tablefmt="grid"))
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+def lttb_indices(x, y, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets 降采样，返回保留的数据点位置。
+
+    把中间的数据点均分为 n_out - 2 个桶，每个桶保留与“上一个保留点”和“下一个桶的均值点”
+    构成三角形面积最大的点，首尾两点总是保留。峰值、谷底等视觉特征基本不会丢失。
+
+    y 为二维时，各列共用同一个 x，按列独立选点，但桶的循环只执行一次。
+
+    :param x: 升序的横坐标 (数值)，长度为 n
+    :param y: 纵坐标，形状 (n,) 或 (n, 列数)；NaN 点只有在整个桶都缺失时才会被选中
+    :param n_out: 保留的点数，不小于 n 或小于 3 时不做降采样
+    :return: 保留点的位置，形状 (n_out,) 或 (n_out, 列数)，每列升序
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    one_d = y.ndim == 1
+    if one_d:
+        y = y[:, None]
+    n, n_cols = y.shape
+
+    if n_out >= n or n_out < 3:
+        selected = np.repeat(np.arange(n)[:, None], n_cols, axis=1)
+        return selected[:, 0] if one_d else selected
+
+    # 中间桶 b 的范围为 [bounds[b], bounds[b + 1])，最后一个中间桶结束于最后一个点之前
+    every = (n - 2) / (n_out - 2)
+    bounds = (np.floor(np.arange(n_out - 1) * every) + 1).astype(np.intp)
+
+    # 每个桶的均值点 (忽略 NaN)，最后一个“桶”是最后一个点本身
+    valid = ~np.isnan(y)
+    # reduceat 的最后一段是 [n - 1, n)，即最后一个点，不属于任何中间桶
+    counts = np.add.reduceat(valid.astype(float), bounds, axis=0)[:-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_y = np.add.reduceat(np.where(valid, y, 0.0), bounds, axis=0)[:-1] / counts
+    mean_x = np.add.reduceat(x, bounds)[:-1] / np.diff(bounds)
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.vstack([mean_y[1:], y[-1:]])
+
+    columns = np.arange(n_cols)
+    selected = np.empty((n_out, n_cols), dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = selected[0].copy()
+    for b in range(n_out - 2):
+        lo, hi = bounds[b], bounds[b + 1]
+        ax, ay = x[previous], y[previous, columns]
+        area = np.abs(
+            (ax - next_x[b]) * (y[lo:hi] - ay) - (ax - x[lo:hi, None]) * (next_y[b] - ay)
+        )
+        area[np.isnan(area)] = -1.0
+        previous = lo + area.argmax(axis=0)
+        selected[b + 1] = previous
+
+    return selected[:, 0] if one_d else selected
+
+def downsample_frame(df: pd.DataFrame, max_points: int = None) -> dict:
+    """
+    对 DataFrame 的每一列做 LTTB 降采样，用于图表显示。
+
+    :param df: 以日期 (或数值) 为索引的数据
+    :param max_points: 每列最多保留的点数，为 None 时不降采样
+    :return: {列名: (横坐标, 纵坐标)}
+    """
+    if max_points is None or len(df.index) <= max_points:
+        return {col: (df.index, df[col].to_numpy()) for col in df.columns}
+
+    if isinstance(df.index, pd.DatetimeIndex):
+        x = df.index.as_unit('ns').asi8
+    else:
+        x = df.index.to_numpy()
+    values = df.to_numpy(dtype=float)
+    selected = lttb_indices(x, values, max_points)
+    return {col: (df.index[selected[:, i]], values[selected[:, i], i]) for i, col in enumerate(df.columns)}
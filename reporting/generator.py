@@ -1,72 +1,149 @@
+import html
 import os
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import plotly.graph_objects as go
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
 from plotly.subplots import make_subplots
 from jinja2 import Environment, FileSystemLoader
 from datetime import datetime
 from tabulate import tabulate
+from strategies import DEFAULT_SCHEDULE, signal_tickers
+from utils import profiling
+from utils.metrics import METRIC_ORDER, OUTCOME_METRICS, format_metric, outcome_percentiles
+from .console import outcome_table_rows, print_metrics_summary, print_outcome_summary
+from .downsample import downsample_frame
 
-def generate_report(results_df, prices_df, metrics_summary, config):
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+# 报告的默认显示配置，可在 config.REPORT_CONFIG 中覆盖
+DEFAULT_REPORT_CONFIG = {
+    'max_points': 2000,          # 每条曲线最多显示的点数 (LTTB 降采样)，None 为显示全部数据
+    'webgl': False,              # 使用 WebGL (Scattergl) 绘制折线，数据量大时渲染更快
+    'plotlyjs': 'cdn',           # 'cdn': 从 CDN 加载 plotly.js; 'inline': 内嵌到报告中，可离线打开
+    'max_price_tickers': 30,     # 价格走势图最多显示的标的个数，None 为不限制
+    'max_workers': 4,            # 并行构建图表的线程数
+}
+
+def generate_report(results_df, prices_df, metrics_summary, config, rolling_results=None, simulation_results=None,
+                    output_dir=None):
     """
     生成所有输出文件的主函数。
+
+    :param rolling_results: 可选，滚动起始日分析的结果 (backtesting.rolling.run_rolling_analysis)
+    :param simulation_results: 可选，蒙特卡洛模拟的结果 (backtesting.montecarlo.run_simulation)
+    :param output_dir: 输出目录，默认为 results/report_{组合}_{时间}
+    :return: 输出目录
     """
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    portfolio_name = "_".join(config.PORTFOLIO.keys())
-    output_dir = os.path.join("results", f"report_{portfolio_name}_{timestamp}")
+    if output_dir is None:
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        portfolio_name = "_".join(config.PORTFOLIO.keys())
+        output_dir = os.path.join("results", f"report_{portfolio_name}_{timestamp}")
     os.makedirs(output_dir, exist_ok=True)
     
     print(f"\n报告生成中，文件将保存在: {output_dir}")
 
-    _generate_console_output(metrics_summary)
+    print_metrics_summary(metrics_summary)
 
     csv_path = os.path.join(output_dir, 'daily_results.csv')
     results_df.to_csv(csv_path)
     print(f"每日数据已保存到: {csv_path}")
 
+    # 结果分布 (滚动起始日分析、蒙特卡洛模拟): 分位数表 + 图表 + 每个样本的明细 CSV
+    outcome_sections = []
+    if rolling_results is not None:
+        rolling_conf = getattr(config, 'ROLLING_ANALYSIS', None) or {}
+        outcome_sections.append({
+            'title': f"滚动起始日分析 (期限 {rolling_conf.get('horizon_years', 5)} 年)",
+            'tables': outcome_percentiles(rolling_results, rolling_conf.get('percentiles', [5, 25, 50, 75, 95])),
+            'chart_html': _generate_rolling_chart(rolling_results, _report_options(config)),
+            'results': rolling_results,
+            'csv_name': 'rolling_start_dates.csv',
+        })
+    if simulation_results is not None:
+        simulation_conf = getattr(config, 'MONTE_CARLO', None) or {}
+        outcome_sections.append({
+            'title': f"蒙特卡洛模拟 ({len(simulation_results)} 条路径)",
+            'tables': outcome_percentiles(simulation_results, simulation_conf.get('percentiles', [5, 25, 50, 75, 95])),
+            'chart_html': _generate_simulation_chart(simulation_results),
+            'results': simulation_results,
+            'csv_name': 'monte_carlo_paths.csv',
+        })
+    for section in outcome_sections:
+        print_outcome_summary(section['title'], section['tables'])
+        section_csv_path = os.path.join(output_dir, section['csv_name'])
+        section['results'].to_csv(section_csv_path)
+        print(f"{section['title']} 数据已保存到: {section_csv_path}")
+
     # 生成 Plotly 图表的 HTML 代码片段
     charts_html = _generate_interactive_charts(results_df, prices_df, config)
     print("交互式图表已生成。")
 
     html_path = os.path.join(output_dir, 'summary_report.html')
-    _generate_html_report(metrics_summary, charts_html, config, html_path)
+    with profiling.span('report.html'):
+        _generate_html_report(metrics_summary, charts_html, config, html_path, outcome_sections)
     print(f"HTML报告已生成: {html_path}")
+    return output_dir
 
 
-def _generate_console_output(metrics_summary):
-    # 此函数无变化
-    headers = ["指标"] + list(metrics_summary.keys())
-    table = []
-    metric_order = ['最终市值', '总投入本金', '总收益率', '年化收益率(CAGR)', '最大回撤']
-    for metric_name in metric_order:
-        row = [metric_name]
-        for name in headers[1:]:
-            value = metrics_summary[name][metric_name]
-            if isinstance(value, float) and "率" in metric_name or "回撤" in metric_name:
-                row.append(f"{value:.2%}")
-            elif isinstance(value, float):
-                row.append(f"${value:,.2f}")
-            else:
-                row.append(value)
-        table.append(row)
-    
-    print("\n" + "="*20 + " 回测结果摘要 " + "="*20)
-    print(tabulate(table, headers=headers, tablefmt="grid"))
-    print("="*54)
+def _report_options(config):
+    return {**DEFAULT_REPORT_CONFIG, **(getattr(config, 'REPORT_CONFIG', None) or {})}
 
 
 def _generate_interactive_charts(results_df, prices_df, config):
     """
     使用 Plotly 生成所有交互式图表，并返回其HTML代码。
+    各图表在线程池中并行构建；图表 HTML 不包含 plotly.js，由报告模板统一引入一次。
     """
-    charts_html = {}
-    
+    options = _report_options(config)
+    builders = {
+        'growth': _generate_growth_chart,
+        'drawdown': _generate_drawdown_chart,
+        'price_performance': _generate_price_chart,
+    }
+    with ThreadPoolExecutor(max_workers=options['max_workers']) as pool:
+        futures = {
+            name: pool.submit(_build_chart, name, build, results_df, prices_df, config, options)
+            for name, build in builders.items()
+        }
+        charts_html = {name: future.result() for name, future in futures.items()}
+    return {name: html for name, html in charts_html.items() if html is not None}
+
+
+def _build_chart(name, build, *args):
+    with profiling.span('report.chart', chart=name):
+        return build(*args)
+
+
+def _add_line_traces(fig, frame, options):
+    """
+    按报告配置降采样后，把 frame 的每一列作为一条折线加入图表。
+
+    日期以毫秒时间戳、数值以 float32 传给 Plotly，会被编码为二进制数组，
+    比逐点写出日期字符串小得多。
+    """
+    trace_type = go.Scattergl if options['webgl'] else go.Scatter
+    is_date = isinstance(frame.index, pd.DatetimeIndex)
+    for name, (x, y) in downsample_frame(frame, options['max_points']).items():
+        if is_date:
+            x = x.as_unit('ms').asi8.astype(float)
+        fig.add_trace(trace_type(x=x, y=y.astype('float32'), mode='lines', name=name))
+    if is_date:
+        fig.update_xaxes(type='date')
+
+
+def _figure_html(fig):
+    return fig.to_html(full_html=False, include_plotlyjs=False)
+
+
+def _generate_growth_chart(results_df, prices_df, config, options):
     # --- 图表1: 资产增长曲线 ---
     fig_growth = go.Figure()
-    for col in results_df.columns:
-        if '_Value' in col or 'Invested' in col:
-            label = 'Portfolio' if col == 'Portfolio_Value' else col.replace('_Value', '').replace('Total_Invested', 'Total Invested')
-            fig_growth.add_trace(go.Scatter(x=results_df.index, y=results_df[col], mode='lines', name=label))
-            
+    columns = [col for col in results_df.columns if '_Value' in col or 'Invested' in col]
+    frame = results_df[columns].rename(columns={'Portfolio_Value': 'Portfolio', 'Total_Invested': 'Total Invested'})
+    frame.columns = [col.replace('_Value', '') for col in frame.columns]
+    _add_line_traces(fig_growth, frame, options)
+
     fig_growth.update_layout(
         title_text='<b>Asset Growth Curve</b>',
         xaxis_title='Date',
@@ -74,17 +151,17 @@ def _generate_interactive_charts(results_df, prices_df, config):
         legend_title_text='Legend',
         hovermode='x unified' # 统一的X轴悬停效果
     )
-    charts_html['growth'] = fig_growth.to_html(full_html=False, include_plotlyjs='cdn')
+    return _figure_html(fig_growth)
 
-    # --- 图表2: 回撤曲线 ---
+
+def _generate_drawdown_chart(results_df, prices_df, config, options):
+    # --- 图表2: 回撤曲线 (在完整数据上计算，再对回撤序列降采样) ---
     fig_drawdown = go.Figure()
-    for col in results_df.columns:
-        if '_Value' in col:
-            label = 'Portfolio' if col == 'Portfolio_Value' else col.replace('_Value', '')
-            cumulative_max = results_df[col].cummax()
-            drawdown = (results_df[col] - cumulative_max) / cumulative_max
-            fig_drawdown.add_trace(go.Scatter(x=drawdown.index, y=drawdown, mode='lines', name=label))
-            
+    values = results_df[[col for col in results_df.columns if '_Value' in col]]
+    drawdown = (values - values.cummax()) / values.cummax()
+    drawdown.columns = ['Portfolio' if col == 'Portfolio_Value' else col.replace('_Value', '') for col in drawdown.columns]
+    _add_line_traces(fig_drawdown, drawdown, options)
+
     fig_drawdown.update_layout(
         title_text='<b>Drawdown Curve</b>',
         xaxis_title='Date',
@@ -92,34 +169,77 @@ def _generate_interactive_charts(results_df, prices_df, config):
         yaxis_tickformat='.0%', # Y轴格式化为百分比
         hovermode='x unified'
     )
-    charts_html['drawdown'] = fig_drawdown.to_html(full_html=False, include_plotlyjs='cdn')
+    return _figure_html(fig_drawdown)
 
+
+def _generate_price_chart(results_df, prices_df, config, options):
     # --- 图表3: 各投资标的价格走势 (归一化) ---
+    # 组合标的按权重从大到小排列，其后是基准和信号标的；标的过多时只显示前 max_price_tickers 个
+    all_tickers = [t for t, _ in sorted(config.PORTFOLIO.items(), key=lambda item: -item[1])] + list(config.BENCHMARKS)
+    all_tickers += signal_tickers(config.STRATEGY_CONFIG)
+    valid_tickers = [t for t in dict.fromkeys(all_tickers) if t in prices_df.columns]
+    if not valid_tickers:
+        return None
+
+    max_tickers = options['max_price_tickers']
+    if max_tickers is not None and len(valid_tickers) > max_tickers:
+        print(f"价格走势图只显示前 {max_tickers} 个标的 (共 {len(valid_tickers)} 个)。")
+        valid_tickers = valid_tickers[:max_tickers]
+
     fig_price = go.Figure()
-    all_tickers = sorted(list(set(list(config.PORTFOLIO.keys()) + config.BENCHMARKS)))
-    if config.STRATEGY_CONFIG['type'] == 'sma_crossover':
-        all_tickers = sorted(list(set(all_tickers + [config.STRATEGY_CONFIG['ticker_for_signal']])))
-
-    valid_tickers = [t for t in all_tickers if t in prices_df.columns]
-    if valid_tickers:
-        normalized_prices = (prices_df[valid_tickers] / prices_df[valid_tickers].iloc[0]) * 100
-        for ticker in valid_tickers:
-            fig_price.add_trace(go.Scatter(x=normalized_prices.index, y=normalized_prices[ticker], mode='lines', name=ticker))
-            
-        fig_price.update_layout(
-            title_text='<b>Normalized Price Performance of All Assets</b>',
-            xaxis_title='Date',
-            yaxis_title='Normalized Price (Start = 100)',
-            hovermode='x unified'
-        )
-        charts_html['price_performance'] = fig_price.to_html(full_html=False, include_plotlyjs='cdn')
-
-    return charts_html
-
-
-def _get_strategy_description(config):
-    # 此函数无变化
-    strategy_conf = config.STRATEGY_CONFIG
+    normalized_prices = (prices_df[sorted(valid_tickers)] / prices_df[sorted(valid_tickers)].iloc[0]) * 100
+    _add_line_traces(fig_price, normalized_prices, options)
+
+    fig_price.update_layout(
+        title_text='<b>Normalized Price Performance of All Assets</b>',
+        xaxis_title='Date',
+        yaxis_title='Normalized Price (Start = 100)',
+        hovermode='x unified'
+    )
+    return _figure_html(fig_price)
+
+
+def _generate_rolling_chart(rolling_results, options):
+    """
+    滚动起始日分析图表: 各账户的年化收益率随起始日的变化。
+    """
+    fig = go.Figure()
+    _add_line_traces(fig, rolling_results.xs('年化收益率(CAGR)', axis=1, level=1), options)
+
+    fig.update_layout(
+        title_text='<b>CAGR by Start Date (Fixed Horizon)</b>',
+        xaxis_title='Start Date',
+        yaxis_title='CAGR',
+        yaxis_tickformat='.0%',
+        hovermode='x unified'
+    )
+    return _figure_html(fig)
+
+
+def _generate_simulation_chart(simulation_results):
+    """
+    蒙特卡洛模拟图表: 各账户年化收益率在所有路径上的分布。
+    """
+    fig = go.Figure()
+    cagr = simulation_results.xs('年化收益率(CAGR)', axis=1, level=1)
+    for name in cagr.columns:
+        fig.add_trace(go.Histogram(x=cagr[name], name=name, opacity=0.6, nbinsx=60))
+
+    fig.update_layout(
+        title_text='<b>Distribution of Simulated CAGR</b>',
+        xaxis_title='CAGR',
+        yaxis_title='Paths',
+        xaxis_tickformat='.0%',
+        barmode='overlay'
+    )
+    return _figure_html(fig)
+
+
+def _get_strategy_description(config, strategy_conf=None):
+    """
+    :param strategy_conf: 要描述的策略配置，默认为 config.STRATEGY_CONFIG (用于描述嵌套的 schedule)
+    """
+    strategy_conf = strategy_conf or config.STRATEGY_CONFIG
     strategy_type = strategy_conf.get('type')
     amount = config.INVESTMENT_AMOUNT
 
@@ -142,35 +262,63 @@ def _get_strategy_description(config):
         short = strategy_conf.get('short_window')
         long = strategy_conf.get('long_window')
         return f"基于 {ticker} 的 {short}/{long}日均线金叉策略，每次买入 ${amount:,.2f}"
+
+    elif strategy_type == 'expression':
+        # 表达式中的比较运算符需要转义后才能放进 HTML
+        desc = f"表达式策略: 满足 {html.escape(str(strategy_conf.get('buy')))} 时买入 ${amount:,.2f}"
+        if str(strategy_conf.get('amount', 1.0)) not in ('1', '1.0'):
+            desc += f" x ({html.escape(str(strategy_conf['amount']))})"
+        return desc
+
+    elif strategy_type in ('value_averaging', 'rebalance', 'drawdown_scaling'):
+        schedule = _get_strategy_description(config, strategy_conf.get('schedule', DEFAULT_SCHEDULE))
+        if strategy_type == 'value_averaging':
+            rule = (f"价值平均: 目标市值每期增长 {strategy_conf.get('growth', 0.0):.2%}，"
+                    f"单次最多 {strategy_conf.get('max_multiple', 3.0):g} 倍")
+        elif strategy_type == 'rebalance':
+            rule = (f"每 {strategy_conf.get('every', 4)} 个定投日再平衡 "
+                    f"(偏离阈值 {strategy_conf.get('threshold', 0.0):.0%})")
+        else:
+            rule = (f"按组合回撤加仓: 系数 {strategy_conf.get('scale', 5.0):g}，"
+                    f"单次最多 {strategy_conf.get('max_multiple', 3.0):g} 倍")
+        return f"{schedule}；{rule}"
         
     else:
         return f"自定义策略, 每次买入 ${amount:,.2f}"
 
 
-def _generate_html_report(metrics_summary, charts_html, config, output_path):
+def _generate_html_report(metrics_summary, charts_html, config, output_path, outcome_sections=None):
     """
     将图表的HTML代码嵌入到Jinja2模板中。
     """
-    env = Environment(loader=FileSystemLoader(os.path.join('reporting', 'templates')))
+    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
     template = env.get_template('report_template.html')
 
     headers = ["指标"] + list(metrics_summary.keys())
     rows = []
-    metric_order = ['最终市值', '总投入本金', '总收益率', '年化收益率(CAGR)', '最大回撤']
-    for metric_name in metric_order:
+    for metric_name in METRIC_ORDER:
         row = [metric_name]
         for name in headers[1:]:
-            value = metrics_summary[name][metric_name]
-            if isinstance(value, float) and "率" in metric_name or "回撤" in metric_name:
-                row.append(f"{value:.2%}")
-            elif isinstance(value, float):
-                row.append(f"${value:,.2f}")
-            else:
-                row.append(value)
+            row.append(format_metric(metric_name, metrics_summary[name][metric_name]))
         rows.append(row)
 
     html_table = tabulate(rows, headers=headers, tablefmt="html")
-    
+
+    outcome_html_sections = [
+        {
+            'title': section['title'],
+            'chart_html': section['chart_html'],
+            'tables': {
+                metric_name: tabulate(
+                    outcome_table_rows(section['tables'][metric_name], metric_name),
+                    headers=["分位数"] + list(section['tables'][metric_name].columns), tablefmt="html"
+                )
+                for metric_name in OUTCOME_METRICS
+            },
+        }
+        for section in outcome_sections or []
+    ]
+
     template_vars = {
         "portfolio_name": " / ".join(config.PORTFOLIO.keys()),
         "start_date": config.START_DATE,
@@ -181,9 +329,18 @@ def _generate_html_report(metrics_summary, charts_html, config, output_path):
         "growth_chart_html": charts_html.get('growth'),
         "drawdown_chart_html": charts_html.get('drawdown'),
         "price_performance_chart_html": charts_html.get('price_performance'),
+        "outcome_sections": outcome_html_sections,
+        "plotlyjs_html": _plotlyjs_html(_report_options(config)['plotlyjs']),
         "report_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     }
 
     html_out = template.render(template_vars)
     with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(html_out)
\ No newline at end of file
+        f.write(html_out)
+
+
+def _plotlyjs_html(mode):
+    """所有图表共用的 plotly.js，只在报告中引入一次。"""
+    if mode == 'inline':
+        return f'<script type="text/javascript">{get_plotlyjs()}</script>'
+    return f'<script charset="utf-8" src="https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"></script>'
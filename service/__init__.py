@@ -0,0 +1,2 @@
+# This file can be empty.
+# It marks the 'service' directory as a Python package.
\ No newline at end of file
@@ -0,0 +1,338 @@
+import asyncio
+import copy
+import json
+import math
+import multiprocessing
+import os
+import time
+import types
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+import numpy as np
+import pandas as pd
+from backtesting.result_cache import prices_fingerprint, result_key
+from backtesting.sweep import expand_grid, rank_results
+from strategies import signal_tickers
+from utils.config_loader import apply_override
+from . import worker
+
+REPORT_DIR = os.path.join("results", "service")
+# 请求体大小上限，防止误发的大文件占满内存
+MAX_BODY_BYTES = 1024 * 1024
+# 工作进程由 forkserver 启动，不从服务进程 fork: 进程池在请求处理过程中才启动工作进程，
+# 直接 fork 会让工作进程继承监听套接字和当前请求的连接，服务端关闭连接后客户端收不到 EOF
+MP_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+)
+if MP_CONTEXT.get_start_method() == 'forkserver':
+    # forkserver 预先导入工作进程用到的模块，之后启动的工作进程不再重复导入
+    MP_CONTEXT.set_forkserver_preload(['service.worker'])
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+               500: 'Internal Server Error'}
+
+class BacktestService:
+    """
+    常驻的本地回测服务。
+
+    价格矩阵只在启动时加载一次 (请求用到新标的时再补充)，CPU 密集的回测在常驻的进程池中运行，
+    工作进程保留价格矩阵和指标缓存；asyncio 前端负责并发连接，完全相同且仍在运行中的请求
+    只计算一次，所有等待者共享同一个结果。
+    """
+    def __init__(self, config, prices_df=None, max_workers=None, report_dir=REPORT_DIR):
+        """
+        :param config: 基础配置，请求中的大写键会覆盖其中的配置项
+        :param prices_df: 可选，预先加载的价格矩阵；为 None 时在 start 中按配置加载
+        :param max_workers: 工作进程数，默认等于 CPU 核数
+        :param report_dir: 报告的输出根目录
+        """
+        self.config = config
+        self.prices_df = prices_df
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.report_dir = report_dir
+        self.pool = None
+        self._data_fingerprint = None
+        self._inflight = {}
+        self._load_lock = asyncio.Lock()
+        self.stats = {'requests': 0, 'coalesced': 0, 'jobs': 0, 'errors': 0, 'job_seconds': 0.0}
+
+    async def start(self):
+        """加载价格矩阵 (未预先提供时) 并启动进程池。"""
+        if self.prices_df is None:
+            await self._load_prices(_config_tickers(self.config))
+        else:
+            self._reset_pool()
+
+    async def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+
+    async def backtest(self, request: dict) -> dict:
+        """
+        运行一次回测。
+
+        :param request: 大写键为配置覆盖项 (与 config.py 同名，可用 'A.b' 指定字典字段)；
+                        'report': 是否生成 HTML 报告；'daily': 是否返回每日数据
+        :return: {'metrics': ..., 'report': 报告地址 (如果生成), 'daily': ... (如果请求)}
+        """
+        config = await self._request_config(request)
+        options = {'report': bool(request.get('report')), 'daily': bool(request.get('daily'))}
+        key = result_key(config, self._data_fingerprint, extra={'kind': 'backtest', **options})
+        report_dir = os.path.join(self.report_dir, key[:16]) if options['report'] else None
+
+        response = await self._coalesce(key, worker.run_backtest_job, config, options['report'], options['daily'],
+                                        report_dir)
+        if options['report']:
+            response = dict(response, report=f"/reports/{key[:16]}")
+        return response
+
+    async def sweep(self, request: dict) -> dict:
+        """
+        参数扫描: 'grid' 与 config.SWEEP_GRID 格式相同 (默认使用配置中的网格)，
+        'rank_by' 为排序指标，'top' 为返回的行数。各参数组合分块在进程池中并行。
+        """
+        grid = request.get('grid') or getattr(self.config, 'SWEEP_GRID', None)
+        if not grid:
+            raise ValueError("请求中缺少参数网格 (grid)。")
+        strategy_configs = expand_grid(grid)
+        extra_tickers = [t for c in strategy_configs for t in signal_tickers(c)]
+        config = await self._request_config(request, extra_tickers=extra_tickers)
+        rank_by = request.get('rank_by', '年化收益率(CAGR)')
+        key = result_key(config, self._data_fingerprint, extra={'kind': 'sweep', 'grid': strategy_configs})
+
+        rows = await self._coalesce(key, self._run_sweep, config, strategy_configs)
+        results = rank_results(rows, rank_by)
+        top = request.get('top')
+        if top:
+            results = results.head(int(top))
+        return {'count': len(strategy_configs), 'results': results.to_dict(orient='records')}
+
+    def status(self) -> dict:
+        index = self.prices_df.index if self.prices_df is not None else pd.DatetimeIndex([])
+        return {
+            'status': 'ok',
+            'workers': self.max_workers,
+            'tickers': list(self.prices_df.columns) if self.prices_df is not None else [],
+            'start': f"{index[0]:%Y-%m-%d}" if len(index) else None,
+            'end': f"{index[-1]:%Y-%m-%d}" if len(index) else None,
+            'inflight': len(self._inflight),
+            **self.stats,
+        }
+
+    async def _coalesce(self, key, func, *args):
+        """
+        相同的键在运行中时直接等待已有的任务，否则提交到进程池。
+        等待者被取消 (例如客户端断开) 不会取消共享的任务。
+        """
+        self.stats['requests'] += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats['coalesced'] += 1
+        else:
+            task = asyncio.ensure_future(self._run_job(func, *args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _run_job(self, func, *args):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        self.stats['jobs'] += 1
+        try:
+            if asyncio.iscoroutinefunction(func):
+                return await func(*args)
+            return await loop.run_in_executor(self.pool, func, *args)
+        except Exception:
+            self.stats['errors'] += 1
+            raise
+        finally:
+            self.stats['job_seconds'] += time.perf_counter() - start
+
+    async def _run_sweep(self, config, strategy_configs):
+        loop = asyncio.get_running_loop()
+        chunks = [strategy_configs[i::self.max_workers] for i in range(min(self.max_workers, len(strategy_configs)))]
+        parts = await asyncio.gather(*(
+            loop.run_in_executor(self.pool, worker.run_sweep_job, config, chunk) for chunk in chunks
+        ))
+        return [row for part in parts for row in part]
+
+    async def _request_config(self, request: dict, extra_tickers=()):
+        """合并请求中的配置覆盖项，检查日期区间，并确保用到的标的已加载。"""
+        settings = copy.deepcopy(vars(self.config))
+        for key, value in request.items():
+            if key.split('.')[0].isupper():
+                apply_override(settings, key, value)
+        config = types.SimpleNamespace(**settings)
+
+        start, end = pd.Timestamp(config.START_DATE), pd.Timestamp(config.END_DATE)
+        loaded_start, loaded_end = pd.Timestamp(self.config.START_DATE), pd.Timestamp(self.config.END_DATE)
+        if start < loaded_start or end > loaded_end or start >= end:
+            raise ValueError(
+                f"日期区间必须在服务加载的范围内: {loaded_start:%Y-%m-%d} 至 {loaded_end:%Y-%m-%d}"
+            )
+
+        tickers = set(_config_tickers(config)) | set(extra_tickers)
+        missing = tickers - set(self.prices_df.columns)
+        if missing:
+            async with self._load_lock:
+                missing = tickers - set(self.prices_df.columns)
+                if missing:
+                    await self._load_prices(sorted(set(self.prices_df.columns) | missing))
+        return config
+
+    async def _load_prices(self, tickers):
+        """在线程中加载价格 (不阻塞事件循环)，然后用新的价格矩阵重建进程池。"""
+        from data import loader
+        from data.providers import create_provider
+
+        loop = asyncio.get_running_loop()
+        print(f"服务加载 {len(tickers)} 个标的的价格...")
+        prices_df = await loop.run_in_executor(None, lambda: loader.get_data(
+            tickers, self.config.START_DATE, self.config.END_DATE,
+            provider=create_provider(getattr(self.config, 'DATA_PROVIDER', None)),
+            **getattr(self.config, 'DATA_FETCH', {})
+        ))
+        missing = set(tickers) - set(prices_df.columns)
+        if missing:
+            raise ValueError(f"无法获取标的的行情: {sorted(missing)}")
+        self.prices_df = prices_df
+        self._reset_pool()
+
+    def _reset_pool(self):
+        # 旧进程池中已提交的任务会继续完成
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+        self._data_fingerprint = prices_fingerprint(self.prices_df)
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=MP_CONTEXT, initializer=worker.init_worker,
+            initargs=(self.prices_df,)
+        )
+
+    # --- HTTP ---
+
+    async def handle_connection(self, reader, writer):
+        """
+        处理一个 HTTP/1.1 连接，支持 keep-alive。只实现本服务需要的最小子集。
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY_BYTES:
+                    status, content_type, body = _json_response(413, {'error': "请求体过大"})
+                    keep_alive = False
+                else:
+                    payload = await reader.readexactly(length) if length else b''
+                    status, content_type, body = await self.dispatch(method, target, payload)
+                    keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+
+                head = (
+                    f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                )
+                writer.write(head.encode('latin-1') + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            # 服务停止时仍在等待下一个请求的空闲连接
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target, payload):
+        """
+        路由请求，返回 (状态码, Content-Type, 响应体)。
+
+        GET  /health            服务状态和统计
+        POST /backtest          回测 (JSON 请求体)
+        POST /sweep             参数扫描 (JSON 请求体)
+        GET  /reports/{id}      返回 /backtest 生成的 HTML 报告
+        """
+        path = urlsplit(target).path.rstrip('/') or '/'
+        try:
+            if path == '/health':
+                return _json_response(200, self.status())
+            if path.startswith('/reports/'):
+                return self._report_response(path[len('/reports/'):])
+            handlers = {'/backtest': self.backtest, '/sweep': self.sweep}
+            if path not in handlers:
+                return _json_response(404, {'error': f"未知的路径: {path}"})
+            if method != 'POST':
+                return _json_response(405, {'error': "请使用 POST"})
+            request = json.loads(payload or b'{}')
+            if not isinstance(request, dict):
+                raise ValueError("请求体必须是 JSON 对象。")
+            return _json_response(200, await handlers[path](request))
+        except (ValueError, KeyError, TypeError) as e:
+            return _json_response(400, {'error': str(e)})
+        except Exception as e:
+            return _json_response(500, {'error': f"{type(e).__name__}: {e}"})
+
+    def _report_response(self, report_id):
+        if not report_id.isalnum():
+            return _json_response(404, {'error': "报告不存在"})
+        html_path = os.path.join(self.report_dir, report_id, 'summary_report.html')
+        if not os.path.exists(html_path):
+            return _json_response(404, {'error': "报告不存在"})
+        with open(html_path, 'rb') as f:
+            return 200, 'text/html; charset=utf-8', f.read()
+
+
+async def serve(config, host='127.0.0.1', port=8765, max_workers=None, prices_df=None, ready=None):
+    """
+    启动服务并一直运行，直到被取消。
+
+    :param ready: 可选的回调，服务开始监听后以 (service, server) 调用 (用于测试和基准测试)
+    """
+    service = BacktestService(config, prices_df=prices_df, max_workers=max_workers)
+    await service.start()
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    address = server.sockets[0].getsockname()
+    print(f"回测服务已启动: http://{address[0]}:{address[1]} ({service.max_workers} 个工作进程)")
+    if ready is not None:
+        ready(service, server)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+def _config_tickers(config):
+    tickers = set(config.PORTFOLIO.keys()) | set(config.BENCHMARKS) | set(signal_tickers(config.STRATEGY_CONFIG))
+    return sorted(tickers)
+
+def _json_response(status, data):
+    body = json.dumps(_jsonable(data), ensure_ascii=False).encode('utf-8')
+    return status, 'application/json; charset=utf-8', body
+
+def _jsonable(value):
+    """把 NumPy/pandas 类型转换为 JSON 可表示的值，NaN 和无穷大转换为 null。"""
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, (np.integer, np.bool_)):
+        return value.item()
+    if isinstance(value, (float, np.floating)):
+        value = float(value)
+        return value if math.isfinite(value) else None
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%Y-%m-%d')
+    return value
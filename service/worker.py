@@ -0,0 +1,63 @@
+import contextlib
+import io
+import pandas as pd
+from backtesting import engine
+from backtesting.sweep import evaluate_strategy
+from strategies import create_strategy
+from utils import metrics
+
+# 工作进程中的全局状态，由 init_worker 设置。
+# 进程在服务的整个生命周期内复用，价格矩阵和策略的指标缓存 (strategies.indicators.DEFAULT_CACHE) 一直保持在内存中。
+_worker_state = {}
+
+def init_worker(prices_df):
+    """
+    :param prices_df: 服务加载的完整价格矩阵，各请求按自己的日期区间和标的切片使用
+    """
+    _worker_state['prices_df'] = prices_df
+
+def run_backtest_job(config, report=False, daily=False, report_dir=None) -> dict:
+    """
+    在工作进程中运行一次回测。
+
+    :param config: 合并了请求参数的完整配置
+    :param report: 是否生成 HTML 报告 (写入 report_dir)
+    :param daily: 是否在结果中包含每日数据
+    :return: {'metrics': {账户: {指标: 数值}}, 'report_dir': ..., 'daily': ...}
+    """
+    prices_df = _request_prices(config)
+    results_df = engine.backtest_strategy(config, prices_df, create_strategy(config.STRATEGY_CONFIG), verbose=False)
+    if results_df.empty:
+        raise ValueError("回测没有产生任何结果，请检查日期范围或输入。")
+    metrics_summary = metrics.build_metrics_summary(
+        results_df, config.BENCHMARKS, risk_free_rate=getattr(config, 'RISK_FREE_RATE', 0.0)
+    )
+
+    response = {'metrics': metrics_summary, 'days': len(results_df)}
+    if report:
+        from reporting import generator
+
+        # 报告生成过程中的终端输出对服务没有意义
+        with contextlib.redirect_stdout(io.StringIO()):
+            generator.generate_report(results_df, prices_df, metrics_summary, config, output_dir=report_dir)
+        response['report_dir'] = report_dir
+    if daily:
+        response['daily'] = {
+            'dates': results_df.index.strftime('%Y-%m-%d').tolist(),
+            **{column: results_df[column].tolist() for column in results_df.columns},
+        }
+    return response
+
+def run_sweep_job(config, strategy_configs) -> list:
+    """
+    在工作进程中回测一批策略参数，返回 evaluate_strategy 的结果行。
+    """
+    prices_df = _request_prices(config)
+    return [evaluate_strategy(config, prices_df, strategy_config) for strategy_config in strategy_configs]
+
+def _request_prices(config):
+    """按请求的日期区间 [START_DATE, END_DATE) 切片价格矩阵。"""
+    prices_df = _worker_state['prices_df']
+    index = prices_df.index
+    mask = (index >= pd.Timestamp(config.START_DATE)) & (index < pd.Timestamp(config.END_DATE))
+    return prices_df[mask]
@@ -1,13 +1,18 @@
 from .base import BaseStrategy
-from .time_strategy import TimeBasedStrategy
+from .time_strategy import TimeBasedStrategy, schedule_signal_matrix
 from .technical_strategy import SMACrossoverStrategy
+from .expression import ExpressionGraph, ExpressionStrategy
+from .stateful import DrawdownScalingStrategy, RebalancingStrategy, StatefulStrategy, ValueAveragingStrategy, require_stateless
+
+# 依赖账户状态的策略未指定 schedule 时的定投日: 每周一
+DEFAULT_SCHEDULE = {'type': 'time_based', 'frequency': 'weekly', 'day': 0}
 
 def create_strategy(strategy_config: dict) -> BaseStrategy:
     """
     策略工厂，根据配置创建并返回一个策略实例。
     """
     strategy_type = strategy_config.get('type')
-    
+
     if strategy_type == 'time_based':
         return TimeBasedStrategy(
             frequency=strategy_config['frequency'],
@@ -19,5 +24,39 @@ def create_strategy(strategy_config: dict) -> BaseStrategy:
             short_window=strategy_config['short_window'],
             long_window=strategy_config['long_window']
         )
+    elif strategy_type == 'expression':
+        return ExpressionStrategy(
+            buy=strategy_config['buy'],
+            amount=strategy_config.get('amount', 1.0)
+        )
+    elif strategy_type == 'value_averaging':
+        return ValueAveragingStrategy(
+            schedule=create_strategy(strategy_config.get('schedule', DEFAULT_SCHEDULE)),
+            growth=strategy_config.get('growth', 0.0),
+            max_multiple=strategy_config.get('max_multiple', 3.0)
+        )
+    elif strategy_type == 'rebalance':
+        return RebalancingStrategy(
+            schedule=create_strategy(strategy_config.get('schedule', DEFAULT_SCHEDULE)),
+            every=strategy_config.get('every', 4),
+            threshold=strategy_config.get('threshold', 0.0)
+        )
+    elif strategy_type == 'drawdown_scaling':
+        return DrawdownScalingStrategy(
+            schedule=create_strategy(strategy_config.get('schedule', DEFAULT_SCHEDULE)),
+            scale=strategy_config.get('scale', 5.0),
+            max_multiple=strategy_config.get('max_multiple', 3.0)
+        )
     else:
-        raise ValueError(f"未知的策略类型: '{strategy_type}'")
\ No newline at end of file
+        raise ValueError(f"未知的策略类型: '{strategy_type}'")
+
+def signal_tickers(strategy_config: dict) -> list:
+    """
+    策略配置中用于生成信号的标的 (包括嵌套的 schedule)，用于确定需要加载哪些价格。
+    """
+    tickers = [strategy_config['ticker_for_signal']] if 'ticker_for_signal' in strategy_config else []
+    if strategy_config.get('type') == 'expression':
+        tickers += create_strategy(strategy_config).tickers
+    if isinstance(strategy_config.get('schedule'), dict):
+        tickers += signal_tickers(strategy_config['schedule'])
+    return list(dict.fromkeys(tickers))
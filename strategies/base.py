@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+import numpy as np
 import pandas as pd
 
 class BaseStrategy(ABC):
@@ -16,4 +17,65 @@ class BaseStrategy(ABC):
         :return: 一个以日期为索引的Pandas Series，1代表买入信号，0代表无操作。
                  该Series的索引应覆盖整个回测周期。
         """
-        pass
\ No newline at end of file
+        pass
+
+    def generate_amounts(self, prices_df: pd.DataFrame, investment_amount: float) -> pd.Series:
+        """
+        每日的投入金额，回测引擎按此金额投入。默认在信号日投入固定的 investment_amount，
+        子类可以按日调整金额 (例如条件满足时加倍)。
+
+        :param investment_amount: 每次的基准投入金额 (INVESTMENT_AMOUNT)
+        :return: 以日期为索引的投入金额 Series，0 代表当日不投入
+        """
+        signals = self.generate_signals(prices_df).reindex(prices_df.index).fillna(0)
+        return (signals == 1) * float(investment_amount)
+
+    def generate_signals_incremental(self, prices_df: pd.DataFrame, state: dict = None):
+        """
+        增量生成交易信号，用于在已有回测结果之后追加新的交易日。
+
+        :param prices_df: 上一次状态的封存日 (state['sealed_date']) 之后的价格数据；
+                          state 为 None 时为完整历史。
+        :param state: 上一次调用返回的状态，首次调用时为 None。
+        :return: (signals, new_state)。signals 覆盖 prices_df 的全部日期；
+                 new_state['sealed_date'] 是信号不会再因后续数据而改变的最后一天，
+                 其后的信号是暂定的，下次调用时会重新计算。
+        """
+        raise NotImplementedError(f"策略 {type(self).__name__} 不支持增量信号生成。")
+
+    def rebase_state(self, state: dict, ratios: pd.Series) -> dict:
+        """
+        调整后价格的基准变化时 (例如出现新的分红)，按比例换算状态中保存的价格。
+
+        :param state: generate_signals_incremental 返回的状态
+        :param ratios: 以股票代码为索引，新价格 / 旧价格的比例
+        :return: 换算后的状态，默认不保存价格，原样返回
+        """
+        return state
+
+    def generate_signals_paths(self, index: pd.DatetimeIndex, paths: np.ndarray, columns: list) -> np.ndarray:
+        """
+        在多条模拟价格路径上生成交易信号，用于蒙特卡洛模拟。
+        默认逐条路径调用 generate_signals，子类可以提供数组化的实现。
+
+        :param index: 所有路径共用的交易日索引
+        :param paths: 形状为 (路径数, 天数, 标的数) 的价格数组
+        :param columns: 与 paths 最后一维对齐的股票代码
+        :return: 形状为 (路径数, 天数) 的布尔数组，True 代表买入
+        """
+        signals = np.zeros(paths.shape[:2], dtype=bool)
+        for i in range(paths.shape[0]):
+            prices_df = pd.DataFrame(paths[i], index=index, columns=columns)
+            signals[i] = self.generate_signals(prices_df).reindex(index).fillna(0).to_numpy() == 1
+        return signals
+
+    def generate_amounts_paths(self, index: pd.DatetimeIndex, paths: np.ndarray, columns: list,
+                               investment_amount: float) -> np.ndarray:
+        """
+        在多条模拟价格路径上生成每日投入金额，与 generate_amounts 对应。
+        默认在 generate_signals_paths 的买入日投入固定的 investment_amount，按日调整金额的子类需要重写。
+
+        :return: 形状为 (路径数, 天数) 的投入金额数组，0 代表当日不投入
+        """
+        signals = np.asarray(self.generate_signals_paths(index, paths, columns), dtype=bool)
+        return np.where(signals, float(investment_amount), 0.0)
@@ -0,0 +1,283 @@
+import ast
+import numpy as np
+import pandas as pd
+from .base import BaseStrategy
+from .indicators import DEFAULT_CACHE, sma_family
+from .technical_strategy import weekly_first_day_signals
+from .time_strategy import schedule_signal_matrix
+
+# 可用的函数: 名称 -> (序列参数, 常量参数及默认值)。序列参数可以是任意表达式，写成字符串时表示该标的的价格
+FUNCTIONS = {
+    'close': ((), (('ticker', None),)),
+    'sma': (('x',), (('window', None),)),
+    'ema': (('x',), (('window', None),)),
+    'rsi': (('x',), (('window', 14),)),
+    'drawdown': (('x',), ()),
+    'change': (('x',), (('periods', 1),)),
+    'weekly': ((), (('day', None),)),
+    'biweekly': ((), (('day', None),)),
+    'monthly': ((), (('day', None),)),
+    'week_start': (('cond',), ()),
+    'where': (('cond', 'a', 'b'), ()),
+    'min': (('a', 'b'), ()),
+    'max': (('a', 'b'), ()),
+    'clip': (('x',), (('lo', None), ('hi', None))),
+}
+_BINARY_OPS = {ast.Add: 'add', ast.Sub: 'sub', ast.Mult: 'mul', ast.Div: 'div', ast.BitAnd: 'and', ast.BitOr: 'or'}
+_COMPARE_OPS = {ast.Lt: 'lt', ast.LtE: 'le', ast.Gt: 'gt', ast.GtE: 'ge', ast.Eq: 'eq', ast.NotEq: 'ne'}
+# 交换律成立的运算，输入排序后 a & b 与 b & a 是同一个节点
+_COMMUTATIVE = {'add', 'mul', 'and', 'or', 'eq', 'ne', 'min', 'max'}
+
+class ExpressionGraph:
+    """
+    表达式编译后的有向无环图。
+
+    每个节点是 (运算, 输入节点序号, 常量参数)，按拓扑顺序保存；添加节点时完全相同的子表达式
+    (例如两处用到的 sma('SPY', 200)) 返回已有的节点，求值时只计算一次。
+    每个节点都在整列数组上计算，不逐日循环。
+    """
+    def __init__(self):
+        self.nodes = []
+        self._ids = {}
+
+    def add(self, op: str, inputs=(), params=()) -> int:
+        inputs = tuple(sorted(inputs)) if op in _COMMUTATIVE else tuple(inputs)
+        key = (op, inputs, tuple(params))
+        if key not in self._ids:
+            self._ids[key] = len(self.nodes)
+            self.nodes.append(key)
+        return self._ids[key]
+
+    def compile(self, text) -> int:
+        """
+        把表达式文本 (Python 语法的一个子集) 加入图中。
+
+        :param text: 例如 "weekly(0) and close('SPY') > sma('SPY', 200)"；也可以是数字常量
+        :return: 表达式结果所在的节点序号
+        """
+        if isinstance(text, (bool, int, float)):
+            return self.add('const', params=(float(text),))
+        try:
+            tree = ast.parse(str(text), mode='eval')
+        except SyntaxError as e:
+            raise ValueError(f"无法解析策略表达式 '{text}': {e.msg}") from None
+        return self._compile_node(tree.body, text)
+
+    def tickers(self) -> list:
+        """表达式中用到的全部标的。"""
+        return list(dict.fromkeys(params[0] for op, _, params in self.nodes if op == 'close'))
+
+    def evaluate(self, prices_df: pd.DataFrame, cache=None) -> list:
+        """
+        按拓扑顺序计算所有节点。
+
+        :param cache: 指标缓存 (IndicatorCache)，价格的移动平均与其他策略共享
+        :return: 与 nodes 对齐的数组列表 (每个数组与 prices_df 的索引等长)
+        """
+        context = {'prices_df': prices_df, 'cache': cache or DEFAULT_CACHE}
+        values = []
+        for op, inputs, params in self.nodes:
+            args = [values[i] for i in inputs]
+            if op in _ARITHMETIC:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    values.append(_ARITHMETIC[op](*[_float(a) for a in args]))
+            elif op in _LOGIC:
+                values.append(_LOGIC[op](*[_as_bool(a) for a in args]))
+            else:
+                values.append(_OPERATIONS[op](context, self.nodes, inputs, *args, *params))
+        return values
+
+    def _compile_node(self, node, text) -> int:
+        if isinstance(node, ast.Constant) and isinstance(node.value, (bool, int, float)):
+            return self.add('const', params=(float(node.value),))
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            # 字符串表示标的的价格
+            return self.add('close', params=(node.value,))
+        if isinstance(node, ast.BoolOp):
+            op = 'and' if isinstance(node.op, ast.And) else 'or'
+            result = self._compile_node(node.values[0], text)
+            for value in node.values[1:]:
+                result = self.add(op, (result, self._compile_node(value, text)))
+            return result
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+            return self.add(_BINARY_OPS[type(node.op)],
+                            (self._compile_node(node.left, text), self._compile_node(node.right, text)))
+        if isinstance(node, ast.UnaryOp):
+            operand = self._compile_node(node.operand, text)
+            if isinstance(node.op, (ast.Not, ast.Invert)):
+                return self.add('not', (operand,))
+            if isinstance(node.op, ast.USub):
+                return self.add('neg', (operand,))
+            if isinstance(node.op, ast.UAdd):
+                return operand
+        if isinstance(node, ast.Compare):
+            # a < b < c 等价于 (a < b) and (b < c)
+            operands = [self._compile_node(n, text) for n in [node.left] + node.comparators]
+            result = None
+            for op, left, right in zip(node.ops, operands, operands[1:]):
+                if type(op) not in _COMPARE_OPS:
+                    break
+                comparison = self.add(_COMPARE_OPS[type(op)], (left, right))
+                result = comparison if result is None else self.add('and', (result, comparison))
+            else:
+                return result
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS:
+            return self._compile_call(node, text)
+        raise ValueError(f"策略表达式 '{text}' 中不支持的写法: {ast.unparse(node)}")
+
+    def _compile_call(self, node, text) -> int:
+        name = node.func.id
+        series_args, param_specs = FUNCTIONS[name]
+        if node.keywords:
+            raise ValueError(f"策略表达式 '{text}' 中的函数 {name} 只接受位置参数。")
+        if not len(series_args) <= len(node.args) <= len(series_args) + len(param_specs):
+            raise ValueError(f"策略表达式 '{text}' 中函数 {name} 的参数个数不正确。")
+
+        inputs = [self._compile_node(arg, text) for arg in node.args[:len(series_args)]]
+        params = []
+        for (param, default), arg in zip(param_specs, node.args[len(series_args):] + [None] * len(param_specs)):
+            if arg is None:
+                if default is None:
+                    raise ValueError(f"策略表达式 '{text}' 中函数 {name} 缺少参数 {param}。")
+                params.append(default)
+            elif isinstance(arg, ast.Constant):
+                params.append(arg.value)
+            elif isinstance(arg, ast.UnaryOp) and isinstance(arg.op, ast.USub) and isinstance(arg.operand, ast.Constant):
+                params.append(-arg.operand.value)
+            else:
+                raise ValueError(f"策略表达式 '{text}' 中函数 {name} 的参数 {param} 必须是常量。")
+        return self.add(name, inputs, params)
+
+
+class ExpressionStrategy(BaseStrategy):
+    """
+    由表达式组合而成的策略: buy 决定哪些交易日投入，amount 决定投入金额是 INVESTMENT_AMOUNT 的几倍。
+
+    两个表达式编译进同一个图，共用的子表达式 (例如相同的指标) 只计算一次。
+    """
+    def __init__(self, buy, amount=1.0, cache=None):
+        """
+        :param buy: 买入条件表达式，例如 "weekly(0) and close('SPY') > sma('SPY', 200)"
+        :param amount: 投入倍数表达式，例如 "where(rsi('SPY') < 30, 2, 1)"，默认为 1
+        :param cache: 指标缓存 (IndicatorCache)，默认使用进程内共享的缓存
+        """
+        self.graph = ExpressionGraph()
+        self.buy_node = self.graph.compile(buy)
+        self.amount_node = self.graph.compile(amount)
+        self.cache = cache or DEFAULT_CACHE
+
+    @property
+    def tickers(self) -> list:
+        return self.graph.tickers()
+
+    def generate_signals(self, prices_df: pd.DataFrame) -> pd.Series:
+        multiples = self._multiples(prices_df)
+        return pd.Series((multiples > 0).astype(int), index=prices_df.index)
+
+    def generate_amounts(self, prices_df: pd.DataFrame, investment_amount: float) -> pd.Series:
+        return pd.Series(self._multiples(prices_df) * float(investment_amount), index=prices_df.index)
+
+    def generate_amounts_paths(self, index: pd.DatetimeIndex, paths: np.ndarray, columns: list,
+                               investment_amount: float) -> np.ndarray:
+        amounts = np.zeros(paths.shape[:2])
+        for i in range(paths.shape[0]):
+            amounts[i] = self._multiples(pd.DataFrame(paths[i], index=index, columns=columns)) * float(investment_amount)
+        return amounts
+
+    def _multiples(self, prices_df) -> np.ndarray:
+        """每日的投入倍数: 满足买入条件的日期为 amount 表达式的值 (缺失或为负时不投入)，其余为 0。"""
+        missing = [t for t in self.tickers if t not in prices_df.columns]
+        if missing:
+            raise ValueError(f"策略表达式用到的标的 {missing} 不在价格数据中。")
+        values = self.graph.evaluate(prices_df, self.cache)
+        buy = _as_bool(values[self.buy_node])
+        multiples = np.broadcast_to(np.asarray(values[self.amount_node], dtype=float), buy.shape)
+        return np.where(buy & (multiples > 0), multiples, 0.0)
+
+
+def _as_bool(values) -> np.ndarray:
+    values = np.asarray(values)
+    return values if values.dtype == bool else np.nan_to_num(values.astype(float)) != 0
+
+def _float(values) -> np.ndarray:
+    return np.asarray(values, dtype=float)
+
+def _close(context, nodes, inputs, ticker):
+    return context['prices_df'][ticker].to_numpy(dtype=float)
+
+def _sma(context, nodes, inputs, x, window):
+    source = nodes[inputs[0]]
+    if source[0] == 'close':
+        # 标的价格的均线与 SMACrossoverStrategy 共用指标缓存
+        ticker = source[2][0]
+        return context['cache'].sma(ticker, context['prices_df'][ticker], [int(window)])[int(window)]
+    return sma_family(_float(x), [int(window)])[int(window)]
+
+def _ema(context, nodes, inputs, x, window):
+    return pd.Series(_float(x)).ewm(span=int(window), adjust=False).mean().to_numpy()
+
+def _rsi(context, nodes, inputs, x, window):
+    # Wilder 平滑的相对强弱指数 (0-100)，第一天为 NaN
+    delta = np.diff(_float(x), prepend=np.nan)
+    smooth = lambda v: pd.Series(v).ewm(alpha=1.0 / int(window), adjust=False).mean().to_numpy()
+    gains, losses = smooth(np.clip(delta, 0, None)), smooth(np.clip(-delta, 0, None))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(losses > 0, 100.0 - 100.0 / (1.0 + gains / losses), np.where(gains > 0, 100.0, np.nan))
+
+def _drawdown(context, nodes, inputs, x):
+    # 相对历史最高点的回撤 (0 或负数)
+    x = _float(x)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return x / np.fmax.accumulate(x) - 1.0
+
+def _change(context, nodes, inputs, x, periods):
+    x = _float(x)
+    shifted = np.full_like(x, np.nan)
+    periods = int(periods)
+    if 0 < periods < len(x):
+        shifted[periods:] = x[:-periods]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return x / shifted - 1.0
+
+def _schedule(frequency):
+    def evaluate(context, nodes, inputs, day):
+        matrix = schedule_signal_matrix(context['prices_df'].index, frequency, cache=context['cache'])
+        return matrix[day].to_numpy() if day in matrix.columns else np.zeros(len(matrix), dtype=bool)
+    return evaluate
+
+def _const(context, nodes, inputs, value):
+    return np.full(len(context['prices_df'].index), value)
+
+def _clip(context, nodes, inputs, x, lo, hi):
+    return np.clip(_float(x), lo, hi)
+
+def _week_start(context, nodes, inputs, cond):
+    # 某周最后一个交易日满足条件时在该周第一个交易日买入 (与均线策略的规则相同)
+    return weekly_first_day_signals(context['prices_df'].index, _as_bool(cond))
+
+def _where(context, nodes, inputs, cond, a, b):
+    return np.where(_as_bool(cond), _float(a), _float(b))
+
+# 逐元素运算: 输入先转换为浮点数 (算术和比较) 或布尔值 (逻辑运算)
+_ARITHMETIC = {
+    'add': np.add, 'sub': np.subtract, 'mul': np.multiply, 'div': np.divide, 'neg': np.negative,
+    'min': np.fmin, 'max': np.fmax,
+    'lt': np.less, 'le': np.less_equal, 'gt': np.greater, 'ge': np.greater_equal, 'eq': np.equal, 'ne': np.not_equal,
+}
+_LOGIC = {'and': np.logical_and, 'or': np.logical_or, 'not': np.logical_not}
+
+_OPERATIONS = {
+    'const': _const,
+    'close': _close,
+    'sma': _sma,
+    'ema': _ema,
+    'rsi': _rsi,
+    'drawdown': _drawdown,
+    'change': _change,
+    'weekly': _schedule('weekly'),
+    'biweekly': _schedule('bi-weekly'),
+    'monthly': _schedule('monthly'),
+    'week_start': _week_start,
+    'where': _where,
+    'clip': _clip,
+}
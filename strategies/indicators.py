@@ -0,0 +1,114 @@
+import hashlib
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from utils import profiling
+
+def fingerprint(series: pd.Series) -> str:
+    """
+    计算价格序列 (日期索引 + 数值) 的指纹，数据相同则指纹相同。
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.ascontiguousarray(series.index.asi8).tobytes())
+    digest.update(np.ascontiguousarray(series.to_numpy(dtype=float)).tobytes())
+    return digest.hexdigest()
+
+def index_fingerprint(index: pd.DatetimeIndex) -> str:
+    """
+    计算交易日历 (日期索引) 的指纹，用于缓存只依赖日期的结果。
+    """
+    return hashlib.blake2b(np.ascontiguousarray(index.asi8).tobytes(), digest_size=16).hexdigest()
+
+def sma_family(values: np.ndarray, windows) -> dict:
+    """
+    基于一次累积和同时计算多个窗口的简单移动平均。
+
+    与 pandas 的 rolling(window, min_periods=1).mean() 语义一致：
+    窗口内忽略 NaN，窗口内没有有效值时结果为 NaN。
+
+    :param values: 价格数组，沿最后一维计算 (一维为单个序列，二维为多条路径)
+    :param windows: 窗口长度列表
+    :return: {窗口长度: 移动平均数组}
+    """
+    values = np.asarray(values, dtype=float)
+    if values.shape[-1] == 0:
+        return {window: values.copy() for window in windows}
+    valid = ~np.isnan(values)
+    # 减去一个参考值 (每个序列的第一个有效值) 再累加，降低长序列累积和的数值误差
+    first = np.take_along_axis(values, np.argmax(valid, axis=-1)[..., None], axis=-1)
+    reference = np.where(valid.any(axis=-1, keepdims=True), first, 0.0)
+    pad = np.zeros(values.shape[:-1] + (1,))
+    sums = np.concatenate([pad, np.cumsum(np.where(valid, values - reference, 0.0), axis=-1)], axis=-1)
+    counts = np.concatenate([pad, np.cumsum(valid, axis=-1)], axis=-1)
+
+    ends = np.arange(1, values.shape[-1] + 1)
+    family = {}
+    for window in windows:
+        starts = np.maximum(ends - window, 0)
+        n = counts[..., ends] - counts[..., starts]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            family[window] = np.where(n > 0, (sums[..., ends] - sums[..., starts]) / n + reference, np.nan)
+    return family
+
+class IndicatorCache:
+    """
+    指标缓存，键为 (股票代码, 指标名, 窗口, 数据指纹)，超过容量时淘汰最久未使用的条目。
+
+    同一标的上运行多个均线参数组合时，相同窗口的指标只计算一次。
+    """
+    def __init__(self, maxsize: int = 256):
+        """
+        :param maxsize: 最多缓存的指标序列个数
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        """返回缓存的值并标记为最近使用，未命中时返回 None。"""
+        if key not in self._entries:
+            self.misses += 1
+            profiling.count('indicator_cache.misses')
+            return None
+        self.hits += 1
+        profiling.count('indicator_cache.hits')
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def sma(self, ticker: str, series: pd.Series, windows) -> dict:
+        """
+        获取一组窗口的简单移动平均，缺失的窗口通过 sma_family 一次性计算。
+
+        :param ticker: 股票代码
+        :param series: 该标的的价格序列
+        :param windows: 窗口长度列表
+        :return: {窗口长度: 移动平均数组}
+        """
+        data_key = fingerprint(series)
+        result, missing = {}, []
+        for window in dict.fromkeys(windows):
+            cached = self.get((ticker, 'sma', window, data_key))
+            if cached is None:
+                missing.append(window)
+            else:
+                result[window] = cached
+
+        if missing:
+            for window, values in sma_family(series.to_numpy(dtype=float), missing).items():
+                self.put((ticker, 'sma', window, data_key), values)
+                result[window] = values
+        return result
+
+
+# 进程内共享的默认缓存，所有策略实例默认使用它
+DEFAULT_CACHE = IndicatorCache()
@@ -0,0 +1,94 @@
+import pandas as pd
+from .base import BaseStrategy
+
+class StatefulStrategy(BaseStrategy):
+    """
+    依赖账户自身状态 (持仓市值、权重、回撤) 的策略的基类。
+
+    定投日由一个普通策略 (schedule) 决定，每个定投日投入多少、是否调仓则由回测引擎的逐日内核
+    (backtesting.kernel) 根据账户当时的状态计算。子类只声明内核规则 (rule) 和规则参数。
+    generate_signals 返回定投日；不模拟账户状态的流程 (滚动分析、蒙特卡洛模拟、标的筛选、批量回测)
+    通过 require_stateless 拒绝这类策略。
+    """
+    rule = 'fixed'
+
+    def __init__(self, schedule: BaseStrategy):
+        """
+        :param schedule: 决定定投日的策略 (例如 TimeBasedStrategy)
+        """
+        self.schedule = schedule
+
+    def generate_signals(self, prices_df: pd.DataFrame) -> pd.Series:
+        return self.schedule.generate_signals(prices_df)
+
+    def kernel_params(self) -> tuple:
+        """
+        :return: 传给内核的规则参数 (a, b)
+        """
+        return 0.0, 0.0
+
+def require_stateless(strategy: BaseStrategy, purpose: str):
+    """
+    检查策略不依赖账户状态，否则抛出 ValueError，避免不模拟账户状态的流程把它当作固定金额定投计算。
+    :param purpose: 调用的流程名称，用于错误信息
+    """
+    if isinstance(strategy, StatefulStrategy):
+        raise ValueError(f"{purpose}不支持依赖账户状态的策略 ({type(strategy).__name__})："
+                         f"每次投入和调仓的金额取决于账户当时的市值，请使用 run 逐日回测。")
+
+class ValueAveragingStrategy(StatefulStrategy):
+    """
+    价值平均定投: 组合的目标市值每期增加一期投入 (并按 growth 增长)，每个定投日投入目标与当前市值的差额。
+    市值高于目标时不投入，差额过大时最多投入 max_multiple 倍的 INVESTMENT_AMOUNT。
+    """
+    rule = 'value_averaging'
+
+    def __init__(self, schedule: BaseStrategy, growth: float = 0.0, max_multiple: float = 3.0):
+        """
+        :param growth: 目标市值每期的增长率 (例如每周定投时 0.001 约为年化 5%)
+        :param max_multiple: 单次投入的上限，INVESTMENT_AMOUNT 的倍数
+        """
+        super().__init__(schedule)
+        self.growth = growth
+        self.max_multiple = max_multiple
+
+    def kernel_params(self):
+        return self.growth, self.max_multiple
+
+class RebalancingStrategy(StatefulStrategy):
+    """
+    定期再平衡: 每个定投日按 PORTFOLIO 权重投入，每隔 every 个定投日检查一次，
+    实际权重偏离目标超过 threshold 时把整个组合 (连同本次投入) 调回目标权重，调仓交易同样计算交易成本。
+    """
+    rule = 'rebalance'
+
+    def __init__(self, schedule: BaseStrategy, every: int = 4, threshold: float = 0.0):
+        """
+        :param every: 每隔多少个定投日检查一次
+        :param threshold: 触发调仓的最大权重偏离 (例如 0.05 为 5 个百分点)，0 表示每次检查都调仓
+        """
+        super().__init__(schedule)
+        self.every = every
+        self.threshold = threshold
+
+    def kernel_params(self):
+        return self.every, self.threshold
+
+class DrawdownScalingStrategy(StatefulStrategy):
+    """
+    回撤加仓: 投入金额随组合自身的回撤 (按剔除投入后的单位净值计算) 放大，
+    金额 = INVESTMENT_AMOUNT * (1 + scale * 回撤)，最多 max_multiple 倍。
+    """
+    rule = 'drawdown'
+
+    def __init__(self, schedule: BaseStrategy, scale: float = 5.0, max_multiple: float = 3.0):
+        """
+        :param scale: 放大系数，例如 5 表示回撤 20% 时投入 2 倍
+        :param max_multiple: 单次投入的上限，INVESTMENT_AMOUNT 的倍数
+        """
+        super().__init__(schedule)
+        self.scale = scale
+        self.max_multiple = max_multiple
+
+    def kernel_params(self):
+        return self.scale, self.max_multiple
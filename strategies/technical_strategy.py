@@ -1,46 +1,106 @@
+import numpy as np
 import pandas as pd
 from .base import BaseStrategy
+from .indicators import DEFAULT_CACHE, sma_family
 
 class SMACrossoverStrategy(BaseStrategy):
     """
     简单移动平均线 (SMA) 交叉策略。
     """
-    def __init__(self, ticker_for_signal: str, short_window: int, long_window: int):
+    def __init__(self, ticker_for_signal: str, short_window: int, long_window: int, cache=None):
+        """
+        :param cache: 指标缓存 (IndicatorCache)，默认使用进程内共享的缓存
+        """
         self.ticker = ticker_for_signal
         self.short_window = short_window
         self.long_window = long_window
+        self.cache = cache or DEFAULT_CACHE
 
     def generate_signals(self, prices_df: pd.DataFrame) -> pd.Series:
         if self.ticker not in prices_df.columns:
             raise ValueError(f"用于生成信号的标的'{self.ticker}'不在价格数据中。")
 
-        signals = pd.Series(0, index=prices_df.index)
-        
-        # 计算短期和长期SMA
-        short_sma = prices_df[self.ticker].rolling(window=self.short_window, min_periods=1).mean()
-        long_sma = prices_df[self.ticker].rolling(window=self.long_window, min_periods=1).mean()
+        # 计算短期和长期SMA (相同数据上的相同窗口会直接命中缓存)
+        smas = self.cache.sma(self.ticker, prices_df[self.ticker], [self.short_window, self.long_window])
 
         # 生成一个布尔序列：当短期线上穿长期线时为True
         # 我们用 .diff() > 0 来捕捉“上穿”的瞬间，而不是持续在上方
         # 但根据用户要求“只要满足条件，每周都买”，我们先标记所有金叉状态
-        golden_cross_status = short_sma > long_sma
-
-        # 根据规则“每周最多买一次”进行处理
-        # 我们将每日的状态重采样到每周，并取每周的最后一个状态
-        # 如果一周的最后一天是金叉状态，我们就认为这周可以买
-        weekly_buy_signal = golden_cross_status.resample('W').last()
-
-        # 找到那些需要买入的周
-        weeks_to_buy = weekly_buy_signal[weekly_buy_signal].index
-
-        # 在每周的开始（通常是周一）生成买入信号
-        for week_end_date in weeks_to_buy:
-            # 找到该周的开始日期
-            start_of_week = week_end_date - pd.Timedelta(days=6)
-            # 找到该周在我们的交易日历中的第一个交易日
-            buy_date_candidate = prices_df.index[(prices_df.index >= start_of_week) & (prices_df.index <= week_end_date)]
-            if not buy_date_candidate.empty:
-                # 在第一个交易日设置买入信号
-                signals.loc[buy_date_candidate[0]] = 1
-                
-        return signals
\ No newline at end of file
+        golden_cross_status = smas[self.short_window] > smas[self.long_window]
+
+        # 根据规则“每周最多买一次”进行处理：
+        # 如果一周的最后一个交易日是金叉状态，就在该周的第一个交易日买入
+        signals = weekly_first_day_signals(prices_df.index, golden_cross_status)
+        return pd.Series(signals.astype(int), index=prices_df.index)
+
+    def generate_signals_incremental(self, prices_df: pd.DataFrame, state: dict = None):
+        """
+        状态中保存封存日之前最近 (最长窗口 - 1) 天的价格，新数据接在其后计算均线。
+        每周的信号取决于该周最后一个交易日，因此只封存到最后一个完整周为止。
+        """
+        if self.ticker not in prices_df.columns:
+            raise ValueError(f"用于生成信号的标的'{self.ticker}'不在价格数据中。")
+
+        tail = state['tail'] if state else prices_df[self.ticker].iloc[:0]
+        sealed_date = state['sealed_date'] if state else None
+        series = pd.concat([tail, prices_df[self.ticker]])
+
+        smas = sma_family(series.to_numpy(dtype=float), [self.short_window, self.long_window])
+        golden_cross_status = (smas[self.short_window] > smas[self.long_window])[len(tail):]
+
+        # 封存日之后的数据总是从新的一周开始，可以直接按周分组
+        signals = weekly_first_day_signals(prices_df.index, golden_cross_status)
+
+        if len(prices_df.index) > 0:
+            week_start = (prices_df.index.normalize() - pd.to_timedelta(prices_df.index.weekday, unit='D'))
+            last_week_pos = int(np.searchsorted(week_start.asi8, week_start.asi8[-1]))
+            if last_week_pos > 0:
+                sealed_date = prices_df.index[last_week_pos - 1]
+
+        window = max(self.short_window, self.long_window) - 1
+        sealed = series.iloc[:0] if sealed_date is None else series[series.index <= sealed_date]
+        new_state = {
+            'sealed_date': sealed_date,
+            'tail': sealed.iloc[max(len(sealed) - window, 0):] if window > 0 else sealed.iloc[:0],
+        }
+        return pd.Series(signals.astype(int), index=prices_df.index), new_state
+
+    def rebase_state(self, state, ratios):
+        if self.ticker in ratios.index:
+            state = dict(state, tail=state['tail'] * ratios[self.ticker])
+        return state
+
+    def generate_signals_paths(self, index: pd.DatetimeIndex, paths: np.ndarray, columns: list) -> np.ndarray:
+        """
+        所有路径的均线在一次累积和中计算，按周分组也对所有路径同时进行。
+        """
+        if self.ticker not in columns:
+            raise ValueError(f"用于生成信号的标的'{self.ticker}'不在价格数据中。")
+
+        series = paths[:, :, list(columns).index(self.ticker)]
+        smas = sma_family(series, [self.short_window, self.long_window])
+        return weekly_first_day_signals(index, smas[self.short_window] > smas[self.long_window])
+
+
+def weekly_first_day_signals(index: pd.DatetimeIndex, status: np.ndarray) -> np.ndarray:
+    """
+    按自然周 (周一至周日) 分组：若某周最后一个交易日的状态为 True，
+    则在该周第一个交易日产生信号。一次分组运算完成，不逐周扫描索引。
+
+    :param index: 升序的交易日索引
+    :param status: 每日布尔状态，最后一维与索引等长 (二维时每行是一条价格路径)
+    :return: 与 status 形状相同的布尔信号数组
+    """
+    status = np.asarray(status, dtype=bool)
+    if len(index) == 0:
+        return np.zeros(status.shape, dtype=bool)
+
+    # 每个交易日所在周的周一，作为分组键
+    week_start = (index.normalize() - pd.to_timedelta(index.weekday, unit='D')).asi8
+    first_of_week = np.concatenate([[True], week_start[1:] != week_start[:-1]])
+
+    week_id = np.cumsum(first_of_week) - 1
+    last_of_week = np.append(np.flatnonzero(first_of_week)[1:] - 1, len(index) - 1)
+    week_status = status[..., last_of_week]
+
+    return first_of_week & week_status[..., week_id]
@@ -1,64 +1,112 @@
+import numpy as np
 import pandas as pd
 from .base import BaseStrategy
+from .indicators import DEFAULT_CACHE, index_fingerprint
+
+FREQUENCIES = ['weekly', 'bi-weekly', 'monthly']
+# 双周定投的间隔
+_BIWEEKLY_PERIOD_NS = pd.Timedelta(days=14).value
 
 class TimeBasedStrategy(BaseStrategy):
     """
     基于固定时间周期的投资策略。
     """
-    def __init__(self, frequency: str, day: int):
+    def __init__(self, frequency: str, day: int, cache=None):
         """
         :param frequency: 投资频率 ('weekly', 'bi-weekly', 'monthly')
         :param day: 对于 weekly/bi-weekly, 是星期几 (0=周一); 对于 monthly, 是日期.
+        :param cache: 指标缓存 (IndicatorCache)，默认使用进程内共享的缓存
         """
         self.frequency = frequency.lower()
         self.day = day
-        
-        if self.frequency not in ['weekly', 'bi-weekly', 'monthly']:
+        self.cache = cache or DEFAULT_CACHE
+
+        if self.frequency not in FREQUENCIES:
             raise ValueError("频率(frequency)必须是 'weekly', 'bi-weekly', 或 'monthly'")
 
     def generate_signals(self, prices_df: pd.DataFrame) -> pd.Series:
-        # 创建一个覆盖整个价格数据周期的信号序列，并初始化为0
-        signals = pd.Series(0, index=prices_df.index)
-        
-        if self.frequency == 'weekly':
-            # 每周的指定星期几买入
-            buy_dates = signals.index[signals.index.weekday == self.day]
-            signals.loc[buy_dates] = 1
-            
-        elif self.frequency == 'bi-weekly':
-            # 每隔一周的指定星期几买入
-            # 找到第一个符合条件的日期
-            first_buy_date = None
-            for date in signals.index:
-                if date.weekday() == self.day:
-                    first_buy_date = date
-                    break
-            
-            if first_buy_date:
-                # 以第一个购买日为起点，每隔14天标记一次
-                date_range = pd.date_range(start=first_buy_date, end=signals.index.max(), freq='14D')
-                # 筛选出真实存在的交易日
-                buy_dates = signals.index.intersection(date_range)
-                signals.loc[buy_dates] = 1
-
-        elif self.frequency == 'monthly':
-            # 每月的指定日期买入
-            # 我们先标记出所有可能的日历日，后续引擎的顺延逻辑会自动处理非交易日
-            date_range_full = pd.date_range(start=signals.index.min(), end=signals.index.max())
-            signals_full = pd.Series(0, index=date_range_full)
-
-            for year in range(signals_full.index.min().year, signals_full.index.max().year + 1):
-                for month in range(1, 13):
-                    try:
-                        # 尝试创建指定日期的Timestamp
-                        target_date = pd.Timestamp(year=year, month=month, day=self.day)
-                        if target_date in signals_full.index:
-                            signals_full.loc[target_date] = 1
-                    except ValueError:
-                        # 如果日期不存在 (如2月30日)，则跳过
-                        continue
-            
-            # 只保留原始交易日索引中的信号
-            signals = signals_full[signals.index]
-
-        return signals
\ No newline at end of file
+        matrix = schedule_signal_matrix(prices_df.index, self.frequency, cache=self.cache)
+        if self.day not in matrix.columns:
+            # 不存在的星期几或日期 (如 32 号) 不会产生任何信号
+            return pd.Series(0, index=prices_df.index)
+        return matrix[self.day].astype(int).rename(None)
+
+    def generate_signals_incremental(self, prices_df: pd.DataFrame, state: dict = None):
+        """
+        每周/每月定投的信号只取决于当天的日期，新数据可以全部封存；
+        双周定投在状态中记住第一次买入的日期，作为之后每隔 14 天的起点。
+        """
+        index = prices_df.index
+        anchor = state.get('anchor') if state else None
+
+        if self.frequency == 'bi-weekly':
+            if anchor is None:
+                matches = index[index.weekday == self.day]
+                anchor = matches[0] if len(matches) > 0 else None
+            if anchor is None:
+                signals = pd.Series(0, index=index)
+            else:
+                delta = index.as_unit('ns').asi8 - pd.Timestamp(anchor).as_unit('ns').value
+                buy = (delta >= 0) & (delta % _BIWEEKLY_PERIOD_NS == 0)
+                signals = pd.Series(buy.astype(int), index=index)
+        else:
+            signals = self.generate_signals(prices_df)
+
+        sealed_date = index[-1] if len(index) > 0 else (state['sealed_date'] if state else None)
+        return signals, {'sealed_date': sealed_date, 'anchor': anchor}
+
+    def generate_signals_paths(self, index: pd.DatetimeIndex, paths: np.ndarray, columns: list) -> np.ndarray:
+        # 定投信号只取决于日期，所有路径共用同一组信号
+        signals = self.generate_signals(pd.DataFrame(index=index)).to_numpy() == 1
+        return np.broadcast_to(signals, paths.shape[:2])
+
+
+def schedule_signal_matrix(index: pd.DatetimeIndex, frequency: str, cache=None) -> pd.DataFrame:
+    """
+    一次性计算某个频率下所有可选日期的定投信号，便于做定投日敏感性分析。
+
+    - weekly: 每周的指定星期几买入，列为 0-6 (0=周一)
+    - bi-weekly: 从第一个符合条件的交易日起，每隔 14 天买入，列为 0-6
+    - monthly: 每月的指定日期买入 (当天不是交易日则跳过)，列为 1-31
+
+    :param index: 交易日索引
+    :param frequency: 投资频率 ('weekly', 'bi-weekly', 'monthly')
+    :param cache: 指标缓存，传入时相同日历和频率的结果只计算一次
+    :return: 布尔 DataFrame (交易日 x 可选日期)，True 代表买入
+    """
+    frequency = frequency.lower()
+    if frequency not in FREQUENCIES:
+        raise ValueError("频率(frequency)必须是 'weekly', 'bi-weekly', 或 'monthly'")
+
+    key = ('__calendar__', 'schedule', frequency, index_fingerprint(index))
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    if frequency == 'weekly':
+        options = np.arange(7)
+        matrix = index.weekday.to_numpy()[:, None] == options
+
+    elif frequency == 'bi-weekly':
+        options = np.arange(7)
+        weekdays = index.weekday.to_numpy()
+        timestamps = index.as_unit('ns').asi8
+        # 每个星期几在索引中第一次出现的位置，作为该列的起点
+        present, first_pos = np.unique(weekdays, return_index=True)
+        first = np.zeros(7, dtype=np.int64)
+        has_first = np.zeros(7, dtype=bool)
+        first[present] = timestamps[first_pos]
+        has_first[present] = True
+
+        delta = timestamps[:, None] - first[None, :]
+        matrix = has_first & (delta >= 0) & (delta % _BIWEEKLY_PERIOD_NS == 0)
+
+    else:
+        options = np.arange(1, 32)
+        matrix = index.day.to_numpy()[:, None] == options
+
+    result = pd.DataFrame(matrix, index=index, columns=options)
+    if cache is not None:
+        cache.put(key, result)
+    return result
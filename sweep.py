@@ -0,0 +1,44 @@
+import os
+import sys
+from datetime import datetime
+from utils.config_loader import load_config
+
+def sweep(config=None):
+    """
+    对 config.SWEEP_GRID 中的所有策略参数组合运行回测并按指标排名。
+
+    :param config: 配置对象，默认读取项目根目录下的 config.py
+    """
+    from tabulate import tabulate
+    from backtesting.sweep import expand_grid, run_sweep
+    from main import load_prices, required_tickers
+
+    config = config or load_config()
+    print("开始执行策略参数扫描...")
+
+    strategy_configs = expand_grid(config.SWEEP_GRID)
+
+    try:
+        # 价格只加载一次，所有参数组合共享；与 run 相同，启用 INTRADAY_PRICES 时使用日内成交价
+        prices_df = load_prices(config, required_tickers(config, include_sweep=True))
+    except Exception as e:
+        print(f"数据加载失败: {e}")
+        return
+
+    results = run_sweep(config, prices_df, strategy_configs)
+
+    print("\n" + "="*20 + " 参数扫描结果 (前 20 名) " + "="*20)
+    print(tabulate(results.head(20), headers='keys', tablefmt='grid', showindex=False, floatfmt='.4f'))
+
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    output_dir = "results"
+    os.makedirs(output_dir, exist_ok=True)
+    csv_path = os.path.join(output_dir, f"sweep_{timestamp}.csv")
+    results.to_csv(csv_path, index=False)
+    print(f"完整结果已保存到: {csv_path}")
+
+
+if __name__ == "__main__":
+    # 等同于 python3 main.py sweep，命令行选项 (--config / --set / --start 等) 相同
+    from main import cli
+    cli(['sweep', *sys.argv[1:]])
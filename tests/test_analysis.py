@@ -0,0 +1,77 @@
+import types
+import numpy as np
+import pandas as pd
+import pytest
+from backtesting import engine, montecarlo, rolling, scan
+from data.synthetic import synthetic_market
+from strategies import create_strategy
+from utils.price_adjuster import calculate_adjusted_price_frame
+
+# 按条件调整投入金额的表达式策略: 每周一投入，价格低于 50 日均线时投入 3 倍
+EXPRESSION = {'type': 'expression', 'buy': "weekly(0)", 'amount': "where(close('T0000') < sma('T0000', 50), 3, 1)"}
+
+@pytest.fixture(scope='module')
+def prices_df():
+    raw = synthetic_market(3, 4, seed=11)
+    return calculate_adjusted_price_frame(raw['close'], raw['dividends'], raw['splits'])
+
+@pytest.fixture(scope='module')
+def config():
+    return types.SimpleNamespace(
+        PORTFOLIO={'T0000': 0.7, 'T0001': 0.3},
+        BENCHMARKS=['T0002'],
+        INVESTMENT_AMOUNT=100.0,
+        TRANSACTION_COST={'type': 'percentage', 'value': 0.001},
+        STRATEGY_CONFIG=EXPRESSION,
+    )
+
+def test_expression_amounts_vary(prices_df, config):
+    amounts = create_strategy(EXPRESSION).generate_amounts(prices_df, config.INVESTMENT_AMOUNT)
+    assert set(np.unique(amounts)) == {0.0, 100.0, 300.0}
+
+def test_rolling_uses_amounts(prices_df, config):
+    """滚动分析的每个窗口与在该窗口上按相同的每日金额回测的结果一致。"""
+    strategy = create_strategy(EXPRESSION)
+    amounts = strategy.generate_amounts(prices_df, config.INVESTMENT_AMOUNT)
+    results = rolling.run_rolling_analysis(config, prices_df, None, horizon_years=1, step=200, amounts=amounts)
+    assert len(results) > 1
+    for start in results.index:
+        window = prices_df.loc[start:start + pd.DateOffset(years=1)]
+        expected = engine.run_backtest(config, window, None, mode='vectorized', verbose=False,
+                                       amounts=amounts.loc[window.index])
+        row = results.loc[start]
+        assert row[('Portfolio', '总投入本金')] == pytest.approx(expected['Total_Invested'].iloc[-1])
+        assert row[('Portfolio', '最终市值')] == pytest.approx(expected['Portfolio_Value'].iloc[-1])
+        assert row[('T0002', '最终市值')] == pytest.approx(expected['T0002_Value'].iloc[-1])
+
+def test_paths_use_amounts(prices_df, config):
+    """在历史价格本身这一条路径上，蒙特卡洛的评估与回测引擎一致 (包括按条件加倍的金额)。"""
+    strategy = create_strategy(EXPRESSION)
+    columns = list(prices_df.columns)
+    paths = prices_df.to_numpy()[None]
+    amounts = strategy.generate_amounts_paths(prices_df.index, paths, columns, config.INVESTMENT_AMOUNT)
+    expected_amounts = strategy.generate_amounts(prices_df, config.INVESTMENT_AMOUNT)
+    np.testing.assert_array_equal(amounts[0], expected_amounts.to_numpy())
+
+    final_values, total_invested, _ = montecarlo.evaluate_paths(config, paths, columns, amounts)
+    expected = engine.run_backtest(config, prices_df, None, mode='vectorized', verbose=False, amounts=expected_amounts)
+    assert total_invested[0] == pytest.approx(expected['Total_Invested'].iloc[-1])
+    np.testing.assert_allclose(final_values[0], expected[['Portfolio_Value', 'T0002_Value']].iloc[-1], rtol=1e-10)
+
+def test_default_amounts_paths(prices_df, config):
+    """不按日调整金额的策略: 买入日投入固定金额。"""
+    strategy = create_strategy({'type': 'time_based', 'frequency': 'weekly', 'day': 2})
+    paths = prices_df.to_numpy()[None]
+    amounts = strategy.generate_amounts_paths(prices_df.index, paths, list(prices_df.columns), 100.0)
+    np.testing.assert_array_equal(amounts[0], strategy.generate_amounts(prices_df, 100.0).to_numpy())
+
+@pytest.mark.parametrize('analysis', [
+    lambda config, prices_df: rolling.run_rolling_analysis(config, prices_df, None, horizon_years=1),
+    lambda config, prices_df: montecarlo.run_simulation(config, prices_df, n_paths=2, max_workers=1),
+    lambda config, prices_df: scan.scan_universe(config, None, max_workers=1),
+])
+def test_stateful_rejected(prices_df, config, analysis):
+    """不模拟账户状态的流程拒绝依赖账户状态的策略，而不是按固定金额定投计算。"""
+    stateful = types.SimpleNamespace(**{**vars(config), 'STRATEGY_CONFIG': {'type': 'rebalance', 'every': 4}})
+    with pytest.raises(ValueError, match='依赖账户状态'):
+        analysis(stateful, prices_df)
@@ -0,0 +1,77 @@
+import types
+import numpy as np
+import pandas as pd
+import pytest
+from backtesting import engine
+from backtesting.batch import run_batch
+from data.synthetic import synthetic_market
+from utils.price_adjuster import calculate_adjusted_price_frame
+
+def make_config(cost):
+    return types.SimpleNamespace(
+        PORTFOLIO={'T0000': 0.6, 'T0001': 0.3, 'T0002': 0.1},
+        BENCHMARKS=['T0003', 'T0000'],
+        INVESTMENT_AMOUNT=100.0,
+        TRANSACTION_COST=cost,
+    )
+
+@pytest.fixture(scope='module')
+def prices_df():
+    raw = synthetic_market(4, 3, seed=7)
+    prices = calculate_adjusted_price_frame(raw['close'], raw['dividends'], raw['splits'])
+    # 部分日期缺少价格 (尚未上市)，两种引擎都不应在这些日期买入
+    prices.iloc[:40, 2] = np.nan
+    return prices
+
+@pytest.fixture(scope='module')
+def signals(prices_df):
+    # 每周三买入
+    return pd.Series((prices_df.index.dayofweek == 2).astype(int), index=prices_df.index)
+
+@pytest.mark.parametrize('cost', [
+    {'type': 'fixed', 'value': 0.25},
+    {'type': 'percentage', 'value': 0.001},
+    # 固定成本超过单次投入金额 (净投入为负)
+    {'type': 'fixed', 'value': 150.0},
+])
+def test_vectorized_matches_loop(prices_df, signals, cost):
+    """向量化引擎与逐日循环引擎的结果一致。"""
+    config = make_config(cost)
+    loop = engine.run_backtest(config, prices_df, signals, mode='loop', verbose=False)
+    vectorized = engine.run_backtest(config, prices_df, signals, mode='vectorized', verbose=False)
+    pd.testing.assert_frame_equal(vectorized, loop, rtol=1e-10, atol=1e-8)
+
+def test_vectorized_matches_loop_with_amounts(prices_df, signals):
+    """按日给出投入金额 (表达式、状态策略) 时两种引擎也一致。"""
+    config = make_config({'type': 'percentage', 'value': 0.002})
+    amounts = signals * np.where(prices_df.index.month % 2 == 0, 2.0, 0.5) * config.INVESTMENT_AMOUNT
+    loop = engine.run_backtest(config, prices_df, signals, mode='loop', verbose=False, amounts=amounts)
+    vectorized = engine.run_backtest(config, prices_df, signals, mode='vectorized', verbose=False, amounts=amounts)
+    pd.testing.assert_frame_equal(vectorized, loop, rtol=1e-10, atol=1e-8)
+
+@pytest.mark.parametrize('cost', [
+    {'type': 'fixed', 'value': 0.25},
+    {'type': 'percentage', 'value': 0.001},
+    {'type': 'fixed', 'value': 150.0},
+])
+def test_batch_matches_loop(prices_df, signals, cost):
+    """批量回测中每个组合和基准的结果与逐个组合用逐日循环引擎回测的结果一致 (包括缺少价格的标的)。"""
+    config = make_config(cost)
+    portfolios = {
+        'Growth': {'T0000': 0.6, 'T0001': 0.3, 'T0002': 0.1},
+        'Late': {'T0002': 1.0},
+        'Mixed': {'T0001': 0.5, 'T0003': 0.5},
+    }
+    batch = run_batch(config, prices_df, signals, portfolios, verbose=False)
+    for name, weights in portfolios.items():
+        loop = engine.run_backtest(types.SimpleNamespace(**{**vars(config), 'PORTFOLIO': weights}), prices_df, signals,
+                                   mode='loop', verbose=False)
+        pd.testing.assert_series_equal(batch[f'{name}_Value'], loop['Portfolio_Value'], check_names=False,
+                                       rtol=1e-10, atol=1e-8)
+        pd.testing.assert_series_equal(batch['Total_Invested'], loop['Total_Invested'], rtol=1e-12)
+        for bm in config.BENCHMARKS:
+            pd.testing.assert_series_equal(batch[f'{bm}_Value'], loop[f'{bm}_Value'], rtol=1e-10, atol=1e-8)
+
+def test_unknown_mode(prices_df, signals):
+    with pytest.raises(ValueError):
+        engine.run_backtest(make_config({'type': 'fixed', 'value': 0.0}), prices_df, signals, mode='gpu', verbose=False)
@@ -0,0 +1,45 @@
+import os
+import types
+import pytest
+from backtesting import engine, incremental
+from data.synthetic import synthetic_market
+from strategies import create_strategy
+from utils.price_adjuster import calculate_adjusted_price_frame
+
+@pytest.fixture(scope='module')
+def prices_df():
+    raw = synthetic_market(2, 2, seed=5)
+    return calculate_adjusted_price_frame(raw['close'], raw['dividends'], raw['splits'])
+
+@pytest.fixture(scope='module')
+def config():
+    return types.SimpleNamespace(
+        PORTFOLIO={'T0000': 1.0},
+        BENCHMARKS=['T0001'],
+        INVESTMENT_AMOUNT=100.0,
+        TRANSACTION_COST={'type': 'fixed', 'value': 1.0},
+    )
+
+def test_resume_matches_full_backtest(prices_df, config, tmp_path):
+    """分两次增量回测的结果与一次完整回测一致。"""
+    strategy = create_strategy({'type': 'time_based', 'frequency': 'weekly', 'day': 0})
+    path = str(tmp_path / 'checkpoint.pkl')
+    incremental.resume_backtest(config, prices_df.iloc[:300], strategy, path)
+    results = incremental.resume_backtest(config, prices_df, strategy, path)
+    expected = engine.backtest_strategy(config, prices_df, strategy, verbose=False)
+    assert os.path.exists(path)
+    assert results['Portfolio_Value'].to_numpy() == pytest.approx(expected['Portfolio_Value'].to_numpy())
+
+@pytest.mark.parametrize('strategy_config', [
+    {'type': 'expression', 'buy': "weekly(0)", 'amount': "where(close('T0000') < sma('T0000', 50), 3, 1)"},
+    {'type': 'value_averaging'},
+])
+def test_unsupported_strategy_falls_back(prices_df, config, tmp_path, strategy_config):
+    """不支持增量信号的策略改为完整回测，不写检查点。"""
+    strategy = create_strategy(strategy_config)
+    assert not incremental.supports_incremental(strategy)
+    path = str(tmp_path / 'checkpoint.pkl')
+    results = incremental.resume_backtest(config, prices_df, strategy, path)
+    expected = engine.backtest_strategy(config, prices_df, strategy, verbose=False)
+    assert not os.path.exists(path)
+    assert results['Portfolio_Value'].to_numpy() == pytest.approx(expected['Portfolio_Value'].to_numpy())
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+from data.intraday import execution_prices
+
+@pytest.fixture(scope='module')
+def bars():
+    """
+    6 个交易日的 30 分钟 K 线，每天的根数不同: 一天从午后才开始 (10:30 之前没有 K 线)，一天全天无成交量。
+    """
+    rng = np.random.default_rng(4)
+    frames = []
+    for i, day in enumerate(pd.bdate_range('2024-01-02', periods=6)):
+        first = '13:00' if i == 2 else '09:30'
+        stamps = pd.date_range(f"{day:%Y-%m-%d} {first}", f"{day:%Y-%m-%d} 16:00", freq='30min')
+        volume = np.zeros(len(stamps)) if i == 4 else rng.integers(1, 1000, len(stamps)).astype(float)
+        frames.append(pd.DataFrame({'Datetime': stamps, 'Close': 100 + rng.normal(0, 1, len(stamps)).cumsum(),
+                                    'Volume': volume}))
+    return pd.concat(frames, ignore_index=True)
+
+@pytest.fixture(scope='module')
+def bar_file(bars, tmp_path_factory):
+    path = tmp_path_factory.mktemp('bars') / 'SPY.csv'
+    bars.to_csv(path, index=False)
+    return str(path)
+
+def reference(bars, price):
+    """用 pandas 分组计算的每日成交价。"""
+    day = bars['Datetime'].dt.normalize().rename('Date')
+    grouped = bars.groupby(day)
+    if price == 'close':
+        return grouped['Close'].last()
+    if price == 'vwap':
+        notional = (bars['Close'] * bars['Volume']).groupby(day).sum()
+        volume = grouped['Volume'].sum()
+        return (notional / volume).where(volume > 0, grouped['Close'].last())
+    cutoff = pd.Timestamp(price).time()
+    before = bars[bars['Datetime'].dt.time <= cutoff].groupby(day)['Close'].last()
+    return before.reindex(grouped['Close'].first().index).fillna(grouped['Close'].first())
+
+@pytest.mark.parametrize('price', ['close', 'vwap', '10:30'])
+def test_matches_daily_reference(bars, bar_file, price):
+    result = execution_prices(bar_file, price)
+    expected = reference(bars, price)
+    assert len(result) == 6
+    np.testing.assert_allclose(result.to_numpy(), expected.to_numpy(), rtol=1e-12)
+    assert (result.index == expected.index).all()
+
+@pytest.mark.parametrize('price', ['close', 'vwap', '10:30'])
+def test_independent_of_chunk_size(bar_file, price):
+    """交易日跨越块边界时结果与一次读入整个文件相同。"""
+    pd.testing.assert_series_equal(execution_prices(bar_file, price, chunk_rows=7),
+                                   execution_prices(bar_file, price, chunk_rows=10 ** 6))
+
+def test_date_range(bar_file):
+    result = execution_prices(bar_file, 'close', start='2024-01-03', end='2024-01-08', chunk_rows=5)
+    assert [f"{d:%Y-%m-%d}" for d in result.index] == ['2024-01-03', '2024-01-04', '2024-01-05']
+
+def test_timezones(bars, bar_file, tmp_path):
+    """UTC 时间按交易所时区划分交易日，带偏移的时间按其本地时间解析，结果都与本地时间的文件相同。"""
+    local = bars['Datetime'].dt.tz_localize('America/New_York')
+    utc_path, offset_path = tmp_path / 'utc.csv', tmp_path / 'offset.csv.gz'
+    bars.assign(Datetime=local.dt.tz_convert('UTC').dt.strftime('%Y-%m-%d %H:%M:%S')).to_csv(utc_path, index=False)
+    bars.assign(Datetime=local.dt.strftime('%Y-%m-%dT%H:%M:%S%z')).to_csv(offset_path, index=False)
+
+    expected = execution_prices(bar_file, 'vwap')
+    for path, timezone in ((utc_path, 'America/New_York'), (offset_path, None), (offset_path, 'America/New_York')):
+        pd.testing.assert_series_equal(execution_prices(str(path), 'vwap', chunk_rows=7, timezone=timezone), expected)
+    # 不指定时区时直接使用文件中的 UTC 时间，10:30 的价格按 UTC 时刻取值 (当天第一根)，与当地时间的结果不同
+    assert not execution_prices(str(utc_path), '10:30').equals(execution_prices(bar_file, '10:30'))
+
+def test_unsorted_rejected(bars, tmp_path):
+    path = tmp_path / 'unsorted.csv'
+    bars.iloc[::-1].to_csv(path, index=False)
+    with pytest.raises(ValueError, match='排序'):
+        execution_prices(str(path), 'close')
@@ -0,0 +1,130 @@
+import time
+import pandas as pd
+import pytest
+from data import loader
+from data.providers import BaseProvider, FakeProvider, LocalDirectoryProvider, YFinanceProvider
+from data.store import PriceStore
+
+START, END = '2020-01-01', '2021-01-01'
+
+class FailingProvider(BaseProvider):
+    """每次请求都失败的数据源。"""
+    def fetch(self, ticker, start, end, timeout=None):
+        raise ConnectionError("网络不可用")
+
+class FlakyProvider(FakeProvider):
+    """前 failures 次请求失败，之后返回模拟行情。"""
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+        self.calls = 0
+
+    def fetch(self, ticker, start, end, timeout=None):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("连接被重置")
+        return super().fetch(ticker, start, end, timeout=timeout)
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(loader, 'STORE_DIR', str(tmp_path / 'prices'))
+    return tmp_path / 'prices'
+
+def test_store_keys_differ(tmp_path):
+    keys = {YFinanceProvider().store_key(), FakeProvider(seed=0).store_key(), FakeProvider(seed=1).store_key(),
+            LocalDirectoryProvider(str(tmp_path / 'a')).store_key(), LocalDirectoryProvider(str(tmp_path / 'b')).store_key()}
+    assert len(keys) == 5
+    # 延迟不影响行情
+    assert FakeProvider(latency=0.5).store_key() == FakeProvider().store_key()
+
+def test_fake_data_not_reused_by_other_provider(store_dir):
+    """模拟数据写入的存储不会被其他数据源当作缓存命中。"""
+    prices = loader.get_data(['SPY'], START, END, provider=FakeProvider(), retries=0)
+    assert not prices.empty
+    with pytest.raises(ValueError, match='未能加载任何股票数据'):
+        loader.get_data(['SPY'], START, END, provider=FailingProvider(), retries=0)
+    # 同一数据源再次读取时命中存储，不重新请求
+    again = loader.get_data(['SPY'], START, END, provider=FakeProvider(latency=10.0), retries=0, timeout=0.01)
+    pd.testing.assert_frame_equal(prices, again)
+
+def test_store_refuses_other_source(tmp_path):
+    history = FakeProvider().fetch('SPY', START, END)
+    PriceStore(str(tmp_path), source='fake-seed0').update('SPY', history, START, END)
+    with pytest.raises(ValueError, match="数据源 'fake-seed0'"):
+        PriceStore(str(tmp_path), source='yfinance').coverage('SPY')
+
+def test_fingerprint_includes_provider(store_dir):
+    for provider in (FakeProvider(seed=0), FakeProvider(seed=1)):
+        loader.get_data(['SPY'], START, END, provider=provider, retries=0)
+    fingerprints = {loader.data_fingerprint(['SPY'], START, END, provider=FakeProvider(seed=s)) for s in (0, 1)}
+    assert None not in fingerprints and len(fingerprints) == 2
+
+def test_price_matrix_per_provider(store_dir, tmp_path):
+    """价格矩阵的指纹包含数据源，换数据源后重新构建而不是复用。"""
+    path = str(tmp_path / 'matrix')
+    first = loader.get_price_matrix(['SPY'], START, END, path=path, provider=FakeProvider(seed=0), retries=0)
+    fingerprint = first.meta['fingerprint']
+    second = loader.get_price_matrix(['SPY'], START, END, path=path, provider=FakeProvider(seed=1), retries=0)
+    assert second.meta['fingerprint'] != fingerprint
+    expected = loader.get_data(['SPY'], START, END, provider=FakeProvider(seed=1), retries=0)
+    assert second.frame()['SPY'].to_numpy() == pytest.approx(expected['SPY'].to_numpy())
+
+def test_result_cache_keyed_by_provider(store_dir, tmp_path, capsys):
+    """结果缓存的键包含数据源: 模拟数据的结果不会被其他数据源的运行命中。"""
+    import main
+    from utils.config_loader import load_config
+
+    def run(seed):
+        config = load_config(overrides={
+            'START_DATE': START, 'END_DATE': END, 'DATA_PROVIDER': {'type': 'fake', 'seed': seed},
+            'RESULT_CACHE.directory': str(tmp_path / 'results'), 'RESULT_CACHE.enabled': True,
+            'ROLLING_ANALYSIS.enabled': False, 'MONTE_CARLO.enabled': False, 'CHECKPOINT_PATH': None,
+            'INTRADAY_PRICES.enabled': False, 'TAX_LOTS.enabled': False,
+        })
+        results = main.main(config, report=False)
+        return results['results_df'], '命中结果缓存' in capsys.readouterr().out
+
+    first, hit = run(0)
+    assert not hit
+    other, hit = run(1)
+    assert not hit
+    assert not other['Portfolio_Value'].equals(first['Portfolio_Value'])
+    again, hit = run(0)
+    assert hit
+    pd.testing.assert_frame_equal(again, first)
+
+def test_concurrent_fetch_faster(tmp_path, monkeypatch):
+    """注入延迟后，并发下载的耗时接近单次延迟，逐个下载的耗时与标的数成正比，两者结果相同。"""
+    tickers = [f'T{i}' for i in range(8)]
+    provider = FakeProvider(latency=0.05)
+    timings, frames = [], []
+    for max_workers in (1, 8):
+        monkeypatch.setattr(loader, 'STORE_DIR', str(tmp_path / f'prices_{max_workers}'))
+        start = time.perf_counter()
+        frames.append(loader.get_data(tickers, START, END, provider=provider, max_workers=max_workers))
+        timings.append(time.perf_counter() - start)
+    serial, concurrent = timings
+    assert serial >= len(tickers) * provider.latency
+    assert concurrent < serial / 3
+    pd.testing.assert_frame_equal(*frames)
+
+def test_fetch_retries(store_dir, capsys):
+    provider = FlakyProvider(failures=2)
+    prices = loader.get_data(['SPY'], START, END, provider=provider, retries=2, backoff=0.0)
+    assert provider.calls == 3 and not prices.empty
+    assert capsys.readouterr().out.count('后重试') == 2
+
+def test_fetch_gives_up_after_retries(store_dir, capsys):
+    provider = FlakyProvider(failures=3)
+    with pytest.raises(ValueError, match='未能加载任何股票数据'):
+        loader.get_data(['SPY'], START, END, provider=provider, retries=2, backoff=0.0)
+    assert provider.calls == 3
+    assert '下载 SPY 失败' in capsys.readouterr().out
+
+def test_fetch_timeout(store_dir, capsys):
+    """超过 timeout 的请求按失败处理并重试，不会一直等待。"""
+    start = time.perf_counter()
+    with pytest.raises(ValueError, match='未能加载任何股票数据'):
+        loader.get_data(['SPY'], START, END, provider=FakeProvider(latency=5.0), retries=1, backoff=0.0, timeout=0.05)
+    assert time.perf_counter() - start < 1.0
+    assert '超时' in capsys.readouterr().out
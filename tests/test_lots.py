@@ -0,0 +1,122 @@
+import types
+import numpy as np
+import pytest
+from backtesting import engine
+from backtesting.lots import LOT_METHODS, LotLedger, ledger_from_trades
+from data.synthetic import synthetic_market
+from strategies import create_strategy
+from utils.price_adjuster import calculate_adjusted_price_frame
+
+def reference_sell(lots, day, shares, method):
+    """逐个批次扣减的参考实现，lots 为 [买入日, 股数, 成本, 剩余股数] 的列表 (按买入顺序)，返回消耗的成本基础。"""
+    candidates = [lot for lot in lots if lot[0] <= day and lot[3] > 0]
+    if method == 'lifo':
+        candidates = candidates[::-1]
+    elif method == 'hifo':
+        candidates = sorted(candidates, key=lambda lot: -lot[2] / lot[1])
+    basis = 0.0
+    for lot in candidates:
+        taken = min(lot[3], shares)
+        basis += taken / lot[1] * lot[2]
+        lot[3] -= taken
+        shares -= taken
+    return basis
+
+@pytest.mark.parametrize('method', LOT_METHODS)
+def test_interleaved_matches_reference(method):
+    """
+    买入和卖出交替进行 (每次买入后索引重建)，每列数百个批次，容量从 1 开始增长，
+    卖出的成本基础和已实现盈亏与参考实现一致。
+    """
+    rng = np.random.default_rng(1)
+    n_columns, n_days = 3, 600
+    ledger = LotLedger(n_columns, method=method, capacity=1)
+    reference = [[] for _ in range(n_columns)]
+    realized = np.zeros(n_columns)
+    for day in range(n_days):
+        shares = rng.uniform(0.5, 2.0, n_columns)
+        costs = shares * rng.uniform(50, 150, n_columns)
+        ledger.buy(day, np.arange(n_columns), shares, costs)
+        for column in range(n_columns):
+            reference[column].append([day, shares[column], costs[column], shares[column]])
+
+        if day % 5 == 4:
+            column = int(rng.integers(n_columns))
+            held = sum(lot[3] for lot in reference[column])
+            # 偶尔卖出几乎全部持仓，使先进先出的窗口跨越大量批次
+            sold = held * (0.95 if day % 100 == 99 else rng.uniform(0.05, 0.3))
+            proceeds = sold * 100.0
+            gain = ledger.sell(day, column, sold, proceeds)
+            expected_basis = reference_sell(reference[column], day, sold, method)
+            assert gain == pytest.approx(proceeds - expected_basis, rel=1e-9)
+            realized[column] += gain
+
+    assert ledger.n_lots == n_days * n_columns and len(ledger.lots) >= ledger.n_lots
+    lots = ledger.lots[:ledger.n_lots]
+    for column in range(n_columns):
+        np.testing.assert_allclose(lots['remaining'][lots['column'] == column],
+                                   [lot[3] for lot in reference[column]], atol=1e-9)
+    np.testing.assert_allclose(ledger.daily_realized(n_days)[-1], realized, rtol=1e-12)
+    open_cost = [sum(lot[2] * lot[3] / lot[1] for lot in reference[column]) for column in range(n_columns)]
+    np.testing.assert_allclose(ledger.daily_cost_basis(n_days)[-1], open_cost, rtol=1e-9)
+
+@pytest.mark.parametrize('method', LOT_METHODS)
+def test_sell_ignores_later_lots(method):
+    """卖出只消耗买入日不晚于卖出日的批次。"""
+    ledger = LotLedger(1, method=method)
+    ledger.buy([0, 1, 5], 0, [1.0, 1.0, 1.0], [10.0, 30.0, 50.0])
+    gain = ledger.sell(2, 0, 1.0, 20.0)
+    sold_day = 0 if method == 'fifo' else 1
+    assert gain == pytest.approx(20.0 - {0: 10.0, 1: 30.0}[sold_day])
+    assert ledger.open_lots(0)['day'].tolist() == [d for d in (0, 1, 5) if d != sold_day]
+    with pytest.raises(ValueError, match='超过可卖出'):
+        ledger.sell(2, 0, 1.5, 30.0)
+
+def test_specific_lots():
+    """指定批次时按给出的顺序消耗，不使用 method。"""
+    ledger = LotLedger(2, method='fifo')
+    ledger.buy([0, 0, 1, 2], [0, 1, 0, 0], [2.0, 1.0, 2.0, 2.0], [20.0, 5.0, 40.0, 30.0])
+    gain = ledger.sell(3, 0, 3.0, 90.0, lots=[3, 2])
+    assert gain == pytest.approx(90.0 - (30.0 + 20.0))
+    assert ledger.lots['remaining'][:4].tolist() == [2.0, 1.0, 1.0, 0.0]
+    # 之后按先进先出继续卖出，从第一个批次开始
+    assert ledger.sell(4, 0, 2.5, 50.0) == pytest.approx(50.0 - (20.0 + 10.0))
+
+def test_ledger_from_trades():
+    trades = np.array([[2.0, 1.0], [1.0, 0.0], [-2.5, 1.0], [0.0, -1.5]])
+    cash = np.array([[20.0, 10.0], [15.0, 0.0], [-40.0, 12.0], [0.0, -30.0]])
+    ledger = ledger_from_trades(trades, cash, method='fifo')
+    np.testing.assert_allclose(ledger.daily_shares(4), np.cumsum(trades, axis=0))
+    np.testing.assert_allclose(ledger.daily_cost_basis(4)[-1], [7.5, 6.0])
+    np.testing.assert_allclose(ledger.daily_realized(4)[-1], [40.0 - 27.5, 30.0 - 16.0])
+
+@pytest.fixture(scope='module')
+def prices_df():
+    raw = synthetic_market(3, 4, seed=13)
+    return calculate_adjusted_price_frame(raw['close'], raw['dividends'], raw['splits'])
+
+def lots_config(method):
+    return types.SimpleNamespace(
+        PORTFOLIO={'T0000': 0.5, 'T0001': 0.5}, BENCHMARKS=['T0002'], INVESTMENT_AMOUNT=100.0,
+        TRANSACTION_COST={'type': 'percentage', 'value': 0.001}, TAX_LOTS={'enabled': True, 'method': method},
+    )
+
+@pytest.mark.parametrize('method', LOT_METHODS)
+def test_engine_lot_columns(prices_df, method):
+    """只买入时成本基础等于投入本金；市值 - 投入本金 = 未实现盈亏 + 已实现盈亏 (包括再平衡时的卖出)。"""
+    config = lots_config(method)
+    schedule = {'type': 'time_based', 'frequency': 'weekly', 'day': 0}
+    fixed = engine.backtest_strategy(config, prices_df, create_strategy(schedule), verbose=False)
+    for name in ('Portfolio', 'T0002'):
+        np.testing.assert_allclose(fixed[f'{name}_Cost_Basis'], fixed['Total_Invested'], rtol=1e-12)
+        np.testing.assert_allclose(fixed[f'{name}_Realized_PnL'], 0.0)
+
+    rebalance = engine.backtest_strategy(
+        config, prices_df, create_strategy({'type': 'rebalance', 'schedule': schedule, 'every': 4}), verbose=False
+    )
+    assert (rebalance['Portfolio_Realized_PnL'].diff().fillna(0) != 0).any()
+    for name in ('Portfolio', 'T0002'):
+        np.testing.assert_allclose(
+            rebalance[f'{name}_Value'] - rebalance['Total_Invested'],
+            rebalance[f'{name}_Unrealized_PnL'] + rebalance[f'{name}_Realized_PnL'], atol=1e-6,
+        )
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+from data.synthetic import synthetic_market
+from utils.price_adjuster import (adjustment_factors, calculate_adjusted_price_frame, calculate_adjusted_prices,
+                                  event_factors)
+
+def loop_adjusted(prices: pd.Series, dividends: pd.Series, splits: pd.Series) -> pd.Series:
+    """
+    原来逐日循环版本的中间结果 (最后缩放之前的 adj_prices): 从最后一天的原始收盘价开始向前继承，
+    遇到拆分除以比例，遇到股息乘以 (1 - 股息 / 前一日原始收盘价)。
+    """
+    adj_prices = prices.copy()
+    for i in range(len(adj_prices) - 2, -1, -1):
+        today = adj_prices.index[i]
+        prev_day = adj_prices.index[i + 1]
+        adj_prices.iloc[i] = adj_prices.iloc[i + 1]
+        if prev_day in splits.index and splits[prev_day] != 0:
+            adj_prices.iloc[i] /= splits[prev_day]
+        if prev_day in dividends.index and dividends[prev_day] != 0:
+            adj_prices.iloc[i] *= (1 - dividends[prev_day] / prices.loc[today])
+    return adj_prices
+
+@pytest.fixture(scope='module')
+def market():
+    # 6 年模拟行情，包含季度股息和拆分
+    return synthetic_market(3, 6, seed=3)
+
+def test_market_has_events(market):
+    assert (market['dividends'] != 0).any().all()
+    assert (market['splits'] != 0).any().any()
+
+def test_factors_match_loop(market):
+    """累积调整因子与原循环累积的因子 (adj_prices / 最后一天的原始收盘价) 相同。"""
+    for ticker in market['close'].columns:
+        close, divs, splits = (market[f][ticker] for f in ('close', 'dividends', 'splits'))
+        expected = loop_adjusted(close, divs, splits) / close.iloc[-1]
+        factors = adjustment_factors(close.to_numpy()[:, None], divs.to_numpy()[:, None], splits.to_numpy()[:, None])
+        np.testing.assert_allclose(factors[:, 0], expected.to_numpy(), rtol=1e-12)
+
+def test_event_factors_cumprod(market):
+    """正向累积的事件因子换算出的相对因子与反向累积因子相同 (PriceStore 保存的形式)。"""
+    close, divs, splits = (market[f]['T0001'].to_numpy() for f in ('close', 'dividends', 'splits'))
+    forward = np.cumprod(event_factors(close, divs, splits))
+    np.testing.assert_allclose(forward[-1] / forward, adjustment_factors(close[:, None], divs[:, None],
+                                                                         splits[:, None])[:, 0], rtol=1e-12)
+
+def test_adjusted_prices(market):
+    """
+    调整后价格 = 原始收盘价 x 累积因子，最后一天等于原始收盘价。
+    (原循环最后一步 prices * ratio.iloc[-1] 的比例恒为 1，返回的是未调整的原始收盘价。)
+    """
+    close, divs, splits = (market[f]['T0000'] for f in ('close', 'dividends', 'splits'))
+    adjusted = calculate_adjusted_prices(close, divs, splits)
+    expected = close * loop_adjusted(close, divs, splits) / close.iloc[-1]
+    pd.testing.assert_series_equal(adjusted, expected, check_names=False, rtol=1e-12)
+    assert adjusted.iloc[-1] == close.iloc[-1]
+    assert not np.allclose(adjusted.to_numpy(), close.to_numpy())
+
+def test_frame_matches_per_ticker(market):
+    """宽表版本与逐个标的调用的结果相同，包括尚未上市 (前段为 NaN) 的标的。"""
+    close = market['close'].copy()
+    close.iloc[:300, 1] = np.nan
+    frame = calculate_adjusted_price_frame(close, market['dividends'], market['splits'])
+    for ticker in close.columns:
+        single = calculate_adjusted_prices(close[ticker], market['dividends'][ticker], market['splits'][ticker])
+        pd.testing.assert_series_equal(frame[ticker], single, check_names=False, rtol=1e-12)
+
+def test_frame_aligns_sparse_events(market):
+    """股息、拆分宽表只包含有事件的日期时，按收盘价的索引对齐，缺失视为 0。"""
+    close = market['close']
+    divs, splits = market['dividends'], market['splits']
+    sparse_divs = divs[(divs != 0).any(axis=1)]
+    sparse_splits = splits[(splits != 0).any(axis=1)]
+    pd.testing.assert_frame_equal(calculate_adjusted_price_frame(close, sparse_divs, sparse_splits),
+                                  calculate_adjusted_price_frame(close, divs, splits))
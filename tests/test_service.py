@@ -0,0 +1,73 @@
+import asyncio
+import json
+import socket
+import threading
+import types
+import pytest
+from data.synthetic import synthetic_market
+from service.server import serve
+from utils.price_adjuster import calculate_adjusted_price_frame
+
+@pytest.fixture(scope='module')
+def service(tmp_path_factory):
+    """在后台线程中启动本机回测服务，返回端口。"""
+    raw = synthetic_market(3, 2, seed=3)
+    prices_df = calculate_adjusted_price_frame(raw['close'], raw['dividends'], raw['splits'])
+    config = types.SimpleNamespace(
+        START_DATE=f"{prices_df.index[0]:%Y-%m-%d}", END_DATE=f"{prices_df.index[-1]:%Y-%m-%d}",
+        PORTFOLIO={'T0000': 0.6, 'T0001': 0.4}, BENCHMARKS=['T0002'], INVESTMENT_AMOUNT=100.0,
+        TRANSACTION_COST={'type': 'fixed', 'value': 1.0}, RISK_FREE_RATE=0.0,
+        STRATEGY_CONFIG={'type': 'time_based', 'frequency': 'weekly', 'day': 0},
+    )
+    started = threading.Event()
+    handles = {}
+
+    def ready(service, server):
+        handles.update(server=server, loop=asyncio.get_running_loop(), port=server.sockets[0].getsockname()[1])
+        started.set()
+
+    def run():
+        try:
+            asyncio.run(serve(config, port=0, max_workers=1, prices_df=prices_df, ready=ready))
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert started.wait(60)
+    yield handles['port']
+    handles['loop'].call_soon_threadsafe(handles['server'].close)
+    thread.join(60)
+
+def request(port, method, path, body=None):
+    """发送一个 Connection: close 的请求并读到 EOF，返回 (状态码, JSON)。"""
+    payload = json.dumps(body).encode('utf-8') if body is not None else b''
+    with socket.create_connection(('127.0.0.1', port), timeout=30) as sock:
+        sock.sendall(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+                     f"Content-Length: {len(payload)}\r\n\r\n".encode('latin-1') + payload)
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    head, _, body = b''.join(chunks).partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body)
+
+def test_first_backtest_closes_connection(service):
+    """第一个请求启动工作进程后，服务端关闭连接时客户端能读到 EOF (工作进程不持有连接)。"""
+    status, data = request(service, 'POST', '/backtest', {'INVESTMENT_AMOUNT': 200.0})
+    assert status == 200
+    assert data['metrics']['Portfolio']['总投入本金'] > 0
+
+def test_coalesced_results_match(service):
+    first = request(service, 'POST', '/backtest', {'INVESTMENT_AMOUNT': 150.0})
+    second = request(service, 'POST', '/backtest', {'INVESTMENT_AMOUNT': 150.0})
+    assert first == second
+
+def test_health_and_errors(service):
+    status, data = request(service, 'GET', '/health')
+    assert status == 200 and data['status'] == 'ok' and data['jobs'] >= 1
+    assert request(service, 'GET', '/missing')[0] == 404
+    assert request(service, 'GET', '/backtest')[0] == 405
+    assert request(service, 'POST', '/backtest', {'START_DATE': '1900-01-01'})[0] == 400
@@ -0,0 +1,111 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from data.store import ROW_ARRAYS, PriceStore, _write_rows
+from data.synthetic import synthetic_history
+from utils.price_adjuster import calculate_adjusted_price_frame
+
+# SPY 在 2000-2020 年间有两次拆分，QQQ 没有拆分
+TICKERS = ['SPY', 'QQQ']
+START, MIDDLE, END = '2000-01-01', '2010-01-01', '2020-01-01'
+# 完整区间和若干子区间 (子区间的第一行可能恰好是事件日)
+RANGES = [(None, None), ('2003-02-10', '2012-06-01'), ('2011-03-01', None), (None, '2001-01-01')]
+
+def assert_consistent(store):
+    """各区间的 load_adjusted 与对 load_matrix 的原始行情重新调整的结果一致。"""
+    for start, end in RANGES:
+        raw = store.load_matrix(TICKERS, start, end)
+        expected = calculate_adjusted_price_frame(raw['close'], raw['dividends'], raw['splits'])
+        pd.testing.assert_frame_equal(store.load_adjusted(TICKERS, start, end), expected, rtol=1e-12)
+
+def assert_same_as_full(store, tmp_path):
+    """与一次写入完整区间的存储相比，原始行情、累积因子和调整后价格都相同。"""
+    full = PriceStore(str(tmp_path / 'full'))
+    for ticker in TICKERS:
+        full.update(ticker, synthetic_history(ticker, START, END), START, END)
+    for ticker in TICKERS:
+        pd.testing.assert_frame_equal(store.read(ticker), full.read(ticker))
+        np.testing.assert_allclose(store._load_arrays(ticker)['factors'], full._load_arrays(ticker)['factors'],
+                                   rtol=1e-12)
+        assert store.coverage(ticker) == full.coverage(ticker)
+    pd.testing.assert_frame_equal(store.load_adjusted(TICKERS), full.load_adjusted(TICKERS), rtol=1e-12)
+    assert_consistent(store)
+
+def test_full_save(tmp_path):
+    store = PriceStore(str(tmp_path / 'store'))
+    for ticker in TICKERS:
+        history = synthetic_history(ticker, START, END)
+        store.update(ticker, history, START, END)
+        read = store.read(ticker)
+        np.testing.assert_array_equal(read['close'], history['Close'])
+        np.testing.assert_array_equal(read['dividends'], history['Dividends'])
+        np.testing.assert_array_equal(read['splits'], history['Stock Splits'])
+    assert (store.read('SPY')['splits'] != 0).sum() == 2
+    assert_consistent(store)
+
+def test_tail_append_with_overlap(tmp_path):
+    """末尾追加并重新下载已保存的最后一天 (上次未收盘的价格)，原地改写数组文件而不是整体重写。"""
+    store = PriceStore(str(tmp_path / 'store'))
+    inodes = {}
+    for ticker in TICKERS:
+        head = synthetic_history(ticker, START, MIDDLE)
+        head.iloc[-1, head.columns.get_loc('Close')] *= 1.01
+        store.update(ticker, head, START, MIDDLE)
+        inodes[ticker] = [os.stat(os.path.join(store.root, ticker, f'{name}.npy')).st_ino for name in ROW_ARRAYS]
+
+    for ticker in TICKERS:
+        last_day = store.dates(ticker)[-1]
+        store.update(ticker, synthetic_history(ticker, last_day, END), last_day, END)
+        assert [os.stat(os.path.join(store.root, ticker, f'{name}.npy')).st_ino for name in ROW_ARRAYS] == inodes[ticker]
+        assert store.version(ticker) == 2
+    assert_same_as_full(store, tmp_path)
+
+def test_prepend(tmp_path):
+    store = PriceStore(str(tmp_path / 'store'))
+    for ticker in TICKERS:
+        store.update(ticker, synthetic_history(ticker, MIDDLE, END), MIDDLE, END)
+        store.update(ticker, synthetic_history(ticker, START, MIDDLE), START, MIDDLE)
+    assert_same_as_full(store, tmp_path)
+
+def test_uncommitted_rows_ignored(tmp_path):
+    """数组文件末尾未写入 meta.json 的行 (中途失败的写入) 不会被读到，之后的追加会覆盖它们。"""
+    store = PriceStore(str(tmp_path / 'store'))
+    for ticker in TICKERS:
+        store.update(ticker, synthetic_history(ticker, START, MIDDLE), START, MIDDLE)
+        before = store.read(ticker)
+        rows = len(before)
+        ticker_dir = os.path.join(store.root, ticker)
+        garbage = {'dates': np.array(['2030-01-01'], dtype='datetime64[ns]'), 'close': np.array([-1.0]),
+                   'factors': np.array([-1.0])}
+        for name in ROW_ARRAYS:
+            _write_rows(os.path.join(ticker_dir, f'{name}.npy'), rows, garbage[name])
+        assert len(np.load(os.path.join(ticker_dir, 'close.npy'), mmap_mode='r')) == rows + 1
+        pd.testing.assert_frame_equal(store.read(ticker), before)
+
+        store.update(ticker, synthetic_history(ticker, MIDDLE, END), MIDDLE, END)
+    assert_same_as_full(store, tmp_path)
+
+def test_legacy_format_update(tmp_path):
+    """旧格式 (按行保存股息、拆分，没有累积因子) 的目录可以直接读取，更新后整体改写为新格式。"""
+    store = PriceStore(str(tmp_path / 'store'))
+    for ticker in TICKERS:
+        history = synthetic_history(ticker, START, MIDDLE)
+        ticker_dir = os.path.join(store.root, ticker)
+        os.makedirs(ticker_dir)
+        arrays = {'dates': history.index.to_numpy(dtype='datetime64[ns]'), 'close': history['Close'].to_numpy(),
+                  'dividends': history['Dividends'].to_numpy(), 'splits': history['Stock Splits'].to_numpy()}
+        for name, values in arrays.items():
+            np.save(os.path.join(ticker_dir, f'{name}.npy'), values)
+        with open(os.path.join(ticker_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'start': START, 'end': MIDDLE, 'rows': len(history), 'version': 1}, f)
+    assert_consistent(store)
+
+    for ticker in TICKERS:
+        last_day = store.dates(ticker)[-1]
+        store.update(ticker, synthetic_history(ticker, last_day, END), last_day, END)
+        ticker_dir = os.path.join(store.root, ticker)
+        assert os.path.exists(os.path.join(ticker_dir, 'factors.npy'))
+        assert not os.path.exists(os.path.join(ticker_dir, 'dividends.npy'))
+    assert_same_as_full(store, tmp_path)
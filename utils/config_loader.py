@@ -0,0 +1,71 @@
+import ast
+import copy
+import json
+import os
+import runpy
+import types
+
+# 默认配置文件: 项目根目录下的 config.py
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config.py')
+
+def load_config(path: str = None, overrides: dict = None) -> types.SimpleNamespace:
+    """
+    从配置文件读取配置，返回与 config 模块用法相同的对象 (大写属性)。
+
+    :param path: 配置文件路径。.py 文件按 config.py 的格式执行后取其中的大写变量；
+                 .json 文件的顶层键即为配置项。默认为项目根目录下的 config.py
+    :param overrides: 覆盖的配置项 {键: 值}，键可以用点号指定字典中的字段，
+                      例如 {'MONTE_CARLO.enabled': True}
+    :return: types.SimpleNamespace
+    """
+    path = path or DEFAULT_CONFIG_PATH
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"配置文件不存在: {path}")
+
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            values = json.load(f)
+    else:
+        values = runpy.run_path(path)
+    settings = {k: copy.deepcopy(v) for k, v in values.items() if k.isupper()}
+
+    for key, value in (overrides or {}).items():
+        apply_override(settings, key, value)
+    return types.SimpleNamespace(**settings)
+
+def apply_override(settings: dict, key: str, value):
+    """
+    把一个覆盖项写入配置字典。'A.b.c' 表示 settings['A']['b']['c']，中间缺失的字典会被创建。
+    """
+    name, *path = key.split('.')
+    name = name.upper()
+    if not path:
+        settings[name] = value
+        return
+
+    target = settings.get(name)
+    if target is None:
+        target = settings[name] = {}
+    for part in path[:-1]:
+        if not isinstance(target, dict):
+            raise ValueError(f"配置项 '{key}' 的上级不是字典")
+        target = target.setdefault(part, {})
+    if not isinstance(target, dict):
+        raise ValueError(f"配置项 '{key}' 的上级不是字典")
+    target[path[-1]] = value
+
+def parse_override(text: str) -> tuple:
+    """
+    解析命令行中的 KEY=VALUE。VALUE 依次尝试按 JSON、Python 字面量解析，都失败时作为字符串。
+
+    例如 'ENGINE_MODE=loop'、'MONTE_CARLO.n_paths=500'、'PORTFOLIO={"QQQ": 1.0}'。
+    """
+    if '=' not in text:
+        raise ValueError(f"配置覆盖项的格式应为 KEY=VALUE: '{text}'")
+    key, raw = text.split('=', 1)
+    for parse in (json.loads, ast.literal_eval):
+        try:
+            return key.strip(), parse(raw)
+        except (ValueError, SyntaxError):
+            continue
+    return key.strip(), raw
@@ -1,6 +1,17 @@
 import pandas as pd
 import numpy as np
 
+# 报告和参数扫描中输出的指标及其顺序
+METRIC_ORDER = [
+    '最终市值', '总投入本金', '总收益率', '年化收益率(CAGR)', '资金加权收益率(XIRR)',
+    '时间加权年化收益率', '年化波动率', '夏普比率', '索提诺比率', '卡玛比率',
+    '最大回撤', '最长回撤天数', '回撤恢复天数',
+]
+# 结果分布 (滚动起始日分析、蒙特卡洛模拟) 中每个样本输出的指标
+OUTCOME_METRICS = ['最终市值', '总投入本金', '总收益率', '年化收益率(CAGR)', '最大回撤']
+# 每年的交易日数，用于把日收益率年化
+TRADING_DAYS_PER_YEAR = 252
+
 def calculate_cagr(end_value, start_value, years):
     """计算年化复合增长率 (CAGR)"""
     if start_value == 0 or years <= 0:
@@ -16,4 +27,241 @@ def calculate_max_drawdown(series):
     # 获取最大回撤值（最小的负数）
     max_drawdown_value = drawdown.min()
     
-    return max_drawdown_value if not pd.isna(max_drawdown_value) else 0.0
\ No newline at end of file
+    return max_drawdown_value if not pd.isna(max_drawdown_value) else 0.0
+
+def calculate_max_drawdown_array(values, axis=0):
+    """
+    沿指定维度批量计算最大回撤，语义与 calculate_max_drawdown 一致 (忽略 NaN，全部缺失时为 0)。
+
+    :param values: 市值数组，例如 (样本数, 天数, 账户数)
+    :param axis: 时间所在的维度
+    :return: 去掉时间维度后的最大回撤数组
+    """
+    values = np.asarray(values, dtype=float)
+    cumulative_max = np.fmax.accumulate(values, axis=axis)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdown = (values - cumulative_max) / cumulative_max
+    drawdown[~np.isfinite(drawdown)] = np.nan
+    all_missing = np.isnan(drawdown).all(axis=axis)
+    drawdown = np.where(np.expand_dims(all_missing, axis), 0.0, drawdown)
+    return np.nanmin(drawdown, axis=axis)
+
+def build_metrics_summary(results_df, benchmarks, risk_free_rate=0.0):
+    """
+    根据回测结果计算组合及各基准的关键指标。
+
+    :param results_df: 回测引擎输出的每日结果，包含 Portfolio_Value / Total_Invested / {bm}_Value 列
+    :param benchmarks: 基准代码列表
+    :param risk_free_rate: 年化无风险利率，用于夏普/索提诺比率
+    :return: {账户名称: {指标名称: 数值}}，指标顺序见 METRIC_ORDER
+    """
+    columns = [('Portfolio', 'Portfolio_Value')] + [(bm, f'{bm}_Value') for bm in benchmarks]
+    values = results_df[[col_name for _, col_name in columns]]
+    values.columns = [name for name, _ in columns]
+
+    table = calculate_metrics_table(values, results_df['Total_Invested'], risk_free_rate=risk_free_rate)
+    return {name: table.loc[name].to_dict() for name in table.index}
+
+def calculate_metrics_table(values, invested, risk_free_rate=0.0) -> pd.DataFrame:
+    """
+    一次性计算多条市值序列的全部指标，所有序列在同一组数组运算中完成，
+    适合参数扫描等需要评估成千上万条结果序列的场景。
+
+    - 年化收益率(CAGR): 以总投入本金为起点的年化收益 (与早期版本一致，不考虑投入时间)
+    - 资金加权收益率(XIRR): 按每笔投入的实际日期计算的内部收益率
+    - 时间加权年化收益率/年化波动率/夏普/索提诺: 基于剔除当日投入后的日收益率
+    - 卡玛比率: 时间加权年化收益率 / |最大回撤|
+    - 最长回撤天数: 从前高到重新创新高 (未恢复时到区间结束) 的最长日历天数
+    - 回撤恢复天数: 最大回撤的谷底到重新回到前高的日历天数，尚未恢复时为 NaN
+
+    :param values: 每日市值，DataFrame (日期 x 序列)
+    :param invested: 累计投入本金，与 values 对齐的 Series (所有序列相同) 或 DataFrame
+    :param risk_free_rate: 年化无风险利率
+    :return: DataFrame (序列 x 指标)，列顺序见 METRIC_ORDER
+    """
+    index = values.index
+    v = values.to_numpy(dtype=float)
+    inv = np.asarray(invested, dtype=float)
+    if inv.ndim == 1:
+        inv = np.broadcast_to(inv[:, None], v.shape)
+    if len(index) == 0:
+        return pd.DataFrame(np.nan, index=values.columns, columns=METRIC_ORDER)
+
+    days = ((index - index[0]) / pd.Timedelta(days=1)).to_numpy(dtype=float)
+    years = days[-1] / 365.25
+    final_value, total_invested = v[-1], inv[-1]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        total_return = np.where(total_invested > 0, (final_value - total_invested) / total_invested, 0.0)
+        cagr = np.where(
+            (total_invested > 0) & (years > 0), (final_value / total_invested) ** (1 / years) - 1, 0.0
+        )
+
+        # 剔除当日新投入后的日收益率 (时间加权)
+        contributions = np.diff(inv, axis=0, prepend=0.0)
+        daily_returns = (v[1:] - contributions[1:]) / v[:-1] - 1
+        daily_returns[~np.isfinite(daily_returns)] = np.nan
+        excess = daily_returns - risk_free_rate / TRADING_DAYS_PER_YEAR
+        n_returns = np.sum(~np.isnan(daily_returns), axis=0)
+
+        volatility = np.nanstd(daily_returns, axis=0, ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR)
+        growth = np.exp(np.nansum(np.log1p(daily_returns), axis=0))
+        twr = np.where(n_returns > 0, growth ** (TRADING_DAYS_PER_YEAR / n_returns) - 1, np.nan)
+        mean_excess = np.nanmean(excess, axis=0) * TRADING_DAYS_PER_YEAR
+        sharpe = mean_excess / volatility
+        downside = np.sqrt(np.nanmean(np.minimum(excess, 0.0) ** 2, axis=0)) * np.sqrt(TRADING_DAYS_PER_YEAR)
+        sortino = mean_excess / downside
+
+    max_drawdown = calculate_max_drawdown_array(v, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        calmar = np.where(max_drawdown < 0, twr / np.abs(max_drawdown), np.nan)
+    longest_drawdown, recovery = _drawdown_durations(v, days)
+
+    table = {
+        '最终市值': final_value,
+        '总投入本金': total_invested,
+        '总收益率': total_return,
+        '年化收益率(CAGR)': cagr,
+        '资金加权收益率(XIRR)': calculate_xirr(contributions, final_value, days),
+        '时间加权年化收益率': twr,
+        '年化波动率': volatility,
+        '夏普比率': np.where(np.isfinite(sharpe), sharpe, np.nan),
+        '索提诺比率': np.where(np.isfinite(sortino), sortino, np.nan),
+        '卡玛比率': calmar,
+        '最大回撤': max_drawdown,
+        '最长回撤天数': longest_drawdown,
+        '回撤恢复天数': recovery,
+    }
+    return pd.DataFrame(table, index=values.columns, columns=METRIC_ORDER)
+
+def calculate_xirr(contributions, final_value, days, max_iterations=100, tol=1e-10):
+    """
+    批量计算资金加权收益率 (XIRR)：求 r 使得每笔投入按 r 复利到期末的终值之和等于期末市值。
+
+    对每条序列同时做牛顿迭代。以 x = ln(1 + r) 为变量时终值之和是 x 的单调递增凸函数，
+    牛顿法从任意起点都能收敛。
+
+    :param contributions: 每日新增投入，形状 (天数, 序列数)
+    :param final_value: 期末市值，形状 (序列数,)
+    :param days: 每个日期距第一天的日历天数，形状 (天数,)
+    :return: 年化收益率数组，无法计算时为 NaN
+    """
+    contributions = np.asarray(contributions, dtype=float)
+    final_value = np.asarray(final_value, dtype=float)
+    # 只保留有投入的日期，定投序列的投入日通常远少于交易日
+    active = np.flatnonzero(np.any(contributions != 0, axis=1))
+    flows = contributions[active]
+    horizons = ((days[-1] - days[active]) / 365.25)[:, None]
+
+    x = np.zeros(final_value.shape)
+    for _ in range(max_iterations):
+        growth = np.exp(horizons * x)
+        f = (flows * growth).sum(axis=0) - final_value
+        slope = (flows * horizons * growth).sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = np.where(slope > 0, f / slope, 0.0)
+        x = np.clip(x - step, -20.0, 20.0)
+        if np.all(np.abs(step) < tol):
+            break
+
+    xirr = np.expm1(x)
+    total = flows.sum(axis=0)
+    valid = (total > 0) & np.isfinite(final_value) & ((flows * horizons).sum(axis=0) > 0)
+    xirr = np.where(valid, xirr, np.nan)
+    return np.where(valid & (final_value <= 0), -1.0, xirr)
+
+def _drawdown_durations(values, days):
+    """
+    :return: (最长回撤天数, 最大回撤的恢复天数)，均为日历天数
+    """
+    n_days = values.shape[0]
+    positions = np.arange(n_days)[:, None]
+    cumulative_max = np.fmax.accumulate(values, axis=0)
+    underwater = values < cumulative_max
+
+    # 每天之前 (含当天) 最近一次处于高点的位置
+    peak_pos = np.maximum.accumulate(np.where(underwater, 0, positions), axis=0)
+    peak_days = days[peak_pos]
+
+    # 回撤结束于重新回到高点的那一天；区间结束时仍在回撤中的按结束日计算
+    ended = np.zeros_like(underwater)
+    ended[1:] = underwater[:-1] & ~underwater[1:]
+    durations = np.zeros(values.shape)
+    durations[1:] = np.where(ended[1:], days[1:, None] - peak_days[:-1], 0.0)
+    still_open = np.where(underwater[-1], days[-1] - peak_days[-1], 0.0)
+    longest = np.maximum(durations.max(axis=0), still_open)
+
+    # 最大回撤的谷底，以及之后第一次回到该段前高的日期
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdown = np.where(cumulative_max > 0, values / cumulative_max - 1, 0.0)
+    drawdown[np.isnan(drawdown)] = 0.0
+    trough = drawdown.argmin(axis=0)
+    columns = np.arange(values.shape[1])
+    peak_value = cumulative_max[trough, columns]
+    recovered = (positions > trough) & (values >= peak_value)
+    first_recovery = recovered.argmax(axis=0)
+    recovery = np.where(
+        recovered[first_recovery, columns], days[first_recovery] - days[trough], np.nan
+    )
+    recovery = np.where(drawdown[trough, columns] < 0, recovery, 0.0)
+    return longest, recovery
+
+def format_metric(metric_name, value):
+    """
+    按指标类型格式化数值: 比率类为百分比，金额类为美元，天数为整数，其余保留两位小数。
+    """
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "N/A"
+    if metric_name in ('最终市值', '总投入本金'):
+        return f"${value:,.2f}"
+    if metric_name.endswith('天数'):
+        return f"{int(value)} 天"
+    if metric_name.endswith('比率'):
+        return f"{value:.2f}"
+    return f"{value:.2%}"
+
+def outcome_frame(account_names, final_values, total_invested, years, max_drawdowns, index) -> pd.DataFrame:
+    """
+    由一批样本的期末市值等数组构造结果分布表，指标定义与 build_metrics_summary 一致。
+
+    :param account_names: 账户名称列表
+    :param final_values: 期末市值，形状 (样本数, 账户数)
+    :param total_invested: 总投入本金，形状 (样本数,)
+    :param years: 每个样本的投资年数，形状 (样本数,)
+    :param max_drawdowns: 最大回撤，形状 (样本数, 账户数)
+    :param index: 样本的索引 (起始日或路径编号)
+    :return: 列为 (账户名称, 指标) 二级列的 DataFrame
+    """
+    invested = np.asarray(total_invested, dtype=float)[:, None]
+    years = np.asarray(years, dtype=float)[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        total_return = np.where(invested > 0, (final_values - invested) / invested, 0.0)
+        cagr = np.where((invested > 0) & (years > 0), (final_values / invested) ** (1 / years) - 1, 0.0)
+
+    values = {
+        '最终市值': final_values,
+        '总投入本金': np.repeat(invested, len(account_names), axis=1),
+        '总收益率': total_return,
+        '年化收益率(CAGR)': cagr,
+        '最大回撤': max_drawdowns,
+    }
+    return pd.DataFrame(
+        {(name, metric): values[metric][:, i] for i, name in enumerate(account_names) for metric in OUTCOME_METRICS},
+        index=index,
+    )
+
+def outcome_percentiles(outcomes, percentiles=(5, 25, 50, 75, 95)) -> dict:
+    """
+    把结果分布汇总为分位数表。
+
+    :param outcomes: 每行一个样本 (起始日或模拟路径)、列为 (账户名称, 指标) 二级列的 DataFrame
+    :param percentiles: 分位数 (0-100)
+    :return: {指标: DataFrame (分位数 x 账户)}
+    """
+    tables = {}
+    for metric in OUTCOME_METRICS:
+        values = outcomes.xs(metric, axis=1, level=1)
+        table = values.quantile(np.asarray(percentiles) / 100.0)
+        table.index = [f'P{p:g}' for p in percentiles]
+        tables[metric] = table
+    return tables
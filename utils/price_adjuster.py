@@ -1,40 +1,96 @@
+import numpy as np
 import pandas as pd
 
 def calculate_adjusted_prices(prices: pd.Series, dividends: pd.Series, splits: pd.Series) -> pd.Series:
     """
     根据原始收盘价、股息和拆分数据，从后向前计算调整后收盘价。
-    
+
     :param prices: 原始收盘价序列
     :param dividends: 股息序列
     :param splits: 股票拆分序列
     :return: 调整后收盘价序列
     """
-    # 复制价格序列，避免修改原始数据
-    adj_prices = prices.copy()
-
-    # 从后向前遍历日期
-    for i in range(len(adj_prices) - 2, -1, -1):
-        # 当前日期和前一天的日期
-        today = adj_prices.index[i]
-        prev_day = adj_prices.index[i+1]
-        
-        # 继承前一天的调整后价格
-        adj_prices.iloc[i] = adj_prices.iloc[i+1]
-
-        # 检查在前一天是否有拆分事件
-        if prev_day in splits.index and splits[prev_day] != 0:
-            split_ratio = splits[prev_day]
-            adj_prices.iloc[i] /= split_ratio
-        
-        # 检查在前一天是否有股息事件
-        if prev_day in dividends.index and dividends[prev_day] != 0:
-            dividend = dividends[prev_day]
-            # 用“今天”的原始价格来计算调整因子
-            # 这是因为除息日的股价下跌是基于当天的价格
-            price_on_ex_div = prices.loc[today]
-            adj_prices.iloc[i] *= (1 - dividend / price_on_ex_div)
-
-    # 将调整后的序列与原始价格序列的比例应用到整个序列
-    # 这确保了调整后的价格与原始价格的相对关系是正确的
-    ratio = adj_prices / prices
-    return prices * ratio.iloc[-1]
\ No newline at end of file
+    closes = prices.to_numpy(dtype=float)[:, None]
+    divs = dividends.reindex(prices.index).fillna(0).to_numpy(dtype=float)[:, None]
+    ratios = splits.reindex(prices.index).fillna(0).to_numpy(dtype=float)[:, None]
+
+    factors = adjustment_factors(closes, divs, ratios)
+    return pd.Series(closes[:, 0] * factors[:, 0], index=prices.index, name=prices.name)
+
+def calculate_adjusted_price_frame(closes: pd.DataFrame, dividends: pd.DataFrame, splits: pd.DataFrame) -> pd.DataFrame:
+    """
+    批量版本：一次性调整一个宽表 (日期 x 股票代码) 中的所有收盘价。
+
+    :param closes: 原始收盘价宽表，缺失的交易日为 NaN
+    :param dividends: 股息宽表，会按 closes 的索引和列对齐，缺失视为 0
+    :param splits: 股票拆分宽表，对齐方式同上
+    :return: 与 closes 形状相同的调整后收盘价宽表
+    """
+    close_values = closes.to_numpy(dtype=float)
+    divs = dividends.reindex(index=closes.index, columns=closes.columns).fillna(0).to_numpy(dtype=float)
+    ratios = splits.reindex(index=closes.index, columns=closes.columns).fillna(0).to_numpy(dtype=float)
+
+    factors = adjustment_factors(close_values, divs, ratios)
+    return pd.DataFrame(close_values * factors, index=closes.index, columns=closes.columns)
+
+def adjustment_factors(closes: np.ndarray, dividends: np.ndarray, splits: np.ndarray) -> np.ndarray:
+    """
+    计算每一行相对于最后一行的累积调整因子 (二维数组，每列一个标的)。
+
+    第 j 行的事件因子为：拆分 1/ratio，股息 (1 - 股息 / 前一日原始收盘价)。
+    第 i 行的累积因子是其后所有事件因子的乘积，通过反向累积乘积一次求出，
+    调整后价格 = 原始收盘价 * 累积因子。
+
+    :param closes: 原始收盘价数组，形状 (天数, 标的数)
+    :param dividends: 股息数组，0 表示当日无股息
+    :param splits: 拆分比例数组，0 表示当日无拆分
+    :return: 与 closes 形状相同的累积调整因子
+    """
+    event_factors = np.ones_like(closes, dtype=float)
+    if len(closes) < 2:
+        return event_factors
+
+    # 宽表中某个标的在部分日期没有行情，用向前填充后的价格作为“前一天”的价格
+    rows = np.arange(len(closes))[:, None]
+    last_valid = np.maximum.accumulate(np.where(np.isfinite(closes), rows, 0), axis=0)
+    prev_closes = np.take_along_axis(closes, last_valid, axis=0)[:-1]
+
+    event_factors[1:] = _event_factors(dividends[1:], splits[1:], prev_closes)
+
+    # 反向累积乘积: 第 i 行 = 第 i+1 行及之后所有事件因子的乘积
+    cumulative = np.ones_like(event_factors)
+    cumulative[:-1] = np.cumprod(event_factors[:0:-1], axis=0)[::-1]
+    return cumulative
+
+def event_factors(closes: np.ndarray, dividends: np.ndarray, splits: np.ndarray, prev_close: float = np.nan) -> np.ndarray:
+    """
+    计算单个标的每一行自身的事件因子 (一维数组)，规则与 adjustment_factors 相同。
+
+    事件因子只依赖当天的事件和前一个有效的原始收盘价，追加新的交易日时只需计算新增的行：
+    PriceStore 保存其正向累积乘积 F，任意区间 [lo, hi) 的调整后价格 = 原始收盘价 * F[hi-1] / F。
+
+    :param closes: 原始收盘价数组
+    :param dividends: 股息数组，0 表示当日无股息
+    :param splits: 拆分比例数组，0 表示当日无拆分
+    :param prev_close: 第一行之前最后一个有效的原始收盘价，NaN 表示没有更早的数据 (第一行按无事件处理)
+    :return: 与 closes 长度相同的事件因子
+    """
+    closes = np.asarray(closes, dtype=float)
+    if not len(closes):
+        return np.ones(0)
+    previous = np.concatenate([[prev_close], closes[:-1]])
+    rows = np.arange(len(previous))
+    last_valid = np.maximum.accumulate(np.where(np.isfinite(previous), rows, 0))
+    return _event_factors(np.asarray(dividends, dtype=float), np.asarray(splits, dtype=float), previous[last_valid])
+
+def _event_factors(dividends: np.ndarray, splits: np.ndarray, prev_closes: np.ndarray) -> np.ndarray:
+    """
+    第 j 行的事件因子：拆分 1/ratio，股息 (1 - 股息 / 前一日原始收盘价)。
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        split_factors = np.where(splits != 0, 1.0 / splits, 1.0)
+        # 用除息日前一天的原始价格来计算股息调整因子
+        dividend_factors = np.where(dividends != 0, 1.0 - dividends / prev_closes, 1.0)
+    step = split_factors * dividend_factors
+    # 前一日无价格 (尚未上市或数据缺口) 时无法计算因子，按无事件处理
+    return np.where(np.isfinite(step), step, 1.0)
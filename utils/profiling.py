@@ -0,0 +1,166 @@
+import contextlib
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# 当前启用的 Profiler，为 None 时 span/count 不做任何事
+_active = None
+_NULL_SPAN = contextlib.nullcontext()
+
+class Profiler:
+    """
+    记录流水线各阶段的耗时 (span)、计数器和内存高水位，导出为 JSON。
+
+    JSON 中的 traceEvents 为 Chrome Trace Event 格式，可直接用 chrome://tracing 或 Perfetto 打开；
+    summary 按 span 名称汇总次数和耗时，便于在多次运行之间比较。
+    """
+    def __init__(self, track_memory: bool = False):
+        """
+        :param track_memory: 是否用 tracemalloc 记录每个阶段的 Python 内存峰值 (会明显变慢)
+        """
+        self.track_memory = track_memory
+        self.counters = {}
+        self.events = []
+        self.started_at = datetime.now()
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self._main_thread = threading.get_ident()
+        # 主线程上尚未结束的 span，用于把内存峰值计入所有外层 span
+        self._open = []
+        self._memory_peak = 0
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attrs):
+        """
+        计时一个阶段。attrs 会记录在事件中 (例如 ticker)。
+
+        在主线程上且启用 track_memory 时，同时记录该阶段的 Python 内存峰值。
+        """
+        on_main = threading.get_ident() == self._main_thread
+        record = {'name': name, 'args': dict(attrs)}
+        if self.track_memory and on_main:
+            self._fold_memory_peak()
+            record['memory_peak'] = tracemalloc.get_traced_memory()[0]
+            self._open.append(record)
+
+        start = time.perf_counter()
+        try:
+            yield record['args']
+        finally:
+            end = time.perf_counter()
+            if self.track_memory and on_main:
+                self._fold_memory_peak()
+                self._open.pop()
+                record['args']['memory_peak_bytes'] = record.pop('memory_peak')
+            rss = _max_rss_bytes()
+            if rss is not None:
+                record['args']['max_rss_bytes'] = rss
+            record.update(ts=(start - self._t0) * 1e6, dur=(end - start) * 1e6, tid=threading.get_ident())
+            with self._lock:
+                self.events.append(record)
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self) -> dict:
+        """按 span 名称汇总: 次数、总耗时、最长耗时 (秒)。"""
+        stats = {}
+        for event in self.events:
+            entry = stats.setdefault(event['name'], {'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+            seconds = event['dur'] / 1e6
+            entry['count'] += 1
+            entry['total_seconds'] += seconds
+            entry['max_seconds'] = max(entry['max_seconds'], seconds)
+        return stats
+
+    def to_dict(self) -> dict:
+        pid = os.getpid()
+        trace_events = [
+            {'name': e['name'], 'ph': 'X', 'ts': e['ts'], 'dur': e['dur'], 'pid': pid, 'tid': e['tid'], 'args': e['args']}
+            for e in sorted(self.events, key=lambda e: e['ts'])
+        ]
+        memory = {'max_rss_bytes': _max_rss_bytes()}
+        if self.track_memory and tracemalloc.is_tracing():
+            memory['python_peak_bytes'] = max(self._memory_peak, tracemalloc.get_traced_memory()[1])
+        return {
+            'traceEvents': trace_events,
+            'displayTimeUnit': 'ms',
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'total_seconds': time.perf_counter() - self._t0,
+            'summary': self.summary(),
+            'counters': dict(self.counters),
+            'memory': memory,
+            'environment': {
+                'python': sys.version.split()[0],
+                'platform': platform.platform(),
+                'argv': sys.argv,
+            },
+        }
+
+    def write_json(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=1, default=str)
+
+    def _fold_memory_peak(self):
+        # 把上次重置以来的峰值计入所有未结束的 span，再重置峰值
+        peak = tracemalloc.get_traced_memory()[1]
+        self._memory_peak = max(self._memory_peak, peak)
+        for record in self._open:
+            record['memory_peak'] = max(record['memory_peak'], peak)
+        tracemalloc.reset_peak()
+
+
+def enable(track_memory: bool = False) -> Profiler:
+    """
+    启用进程内的全局 Profiler，之后 span/count 的调用都会被记录。
+    """
+    global _active
+    _active = Profiler(track_memory=track_memory)
+    return _active
+
+def disable():
+    global _active
+    if _active is not None and _active.track_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _active = None
+
+def get_profiler():
+    """返回当前启用的 Profiler，未启用时为 None。"""
+    return _active
+
+def span(name: str, **attrs):
+    """
+    计时一个阶段: `with profiling.span('loader.fetch', ticker=t): ...`
+    未启用 Profiler 时开销可以忽略。
+    """
+    if _active is None:
+        return _NULL_SPAN
+    return _active.span(name, **attrs)
+
+def count(name: str, n: int = 1):
+    """累加一个计数器 (例如缓存命中次数、处理的行数)。"""
+    if _active is not None:
+        _active.count(name, n)
+
+def _max_rss_bytes():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return rss if sys.platform == 'darwin' else rss * 1024